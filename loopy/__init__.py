@@ -118,7 +118,10 @@ from loopy.transform.privatize import privatize_temporaries_with_inames
 from loopy.transform.batch import to_batched
 from loopy.transform.parameter import assume, fix_parameters
 from loopy.transform.save import save_and_reload_temporaries
-from loopy.transform.add_barrier import add_barrier
+from loopy.transform.storage import share_temporary_storage
+from loopy.transform.hoist import hoist_invariants
+from loopy.transform.jam import unroll_and_jam
+from loopy.transform.add_barrier import add_barrier, minimize_global_barriers
 # }}}
 
 from loopy.type_inference import infer_unknown_types
@@ -137,7 +140,7 @@ from loopy.codegen.result import (
         CodeGenerationResult)
 from loopy.compiled import CompiledKernel
 from loopy.options import Options
-from loopy.auto_test import auto_test_vs_ref
+from loopy.auto_test import auto_test_vs_ref, auto_test_vs_ref_on_cpu
 from loopy.frontend.fortran import (c_preprocess, parse_transformed_fortran,
         parse_fortran)
 
@@ -148,6 +151,7 @@ from loopy.target.opencl import OpenCLTarget
 from loopy.target.pyopencl import PyOpenCLTarget
 from loopy.target.ispc import ISPCTarget
 from loopy.target.numba import NumbaTarget, NumbaCudaTarget
+from loopy.target.bundle import export_bundle, load_bundle
 
 from loopy.tools import Optional
 
@@ -229,8 +233,11 @@ __all__ = [
         "assume", "fix_parameters",
 
         "save_and_reload_temporaries",
+        "share_temporary_storage",
+        "hoist_invariants",
+        "unroll_and_jam",
 
-        "add_barrier",
+        "add_barrier", "minimize_global_barriers",
 
         # }}}
 
@@ -261,7 +268,7 @@ __all__ = [
 
         "CompiledKernel",
 
-        "auto_test_vs_ref",
+        "auto_test_vs_ref", "auto_test_vs_ref_on_cpu",
 
         "Options",
 
@@ -277,6 +284,8 @@ __all__ = [
         "NumbaTarget", "NumbaCudaTarget",
         "ASTBuilderBase",
 
+        "export_bundle", "load_bundle",
+
         "Optional",
 
         # {{{ from this file
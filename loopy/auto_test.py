@@ -75,17 +75,109 @@ class TestArgInfo(Record):
     pass
 
 
-# {{{ "reference" arguments
+# {{{ array allocators
 
-def make_ref_args(kernel, impl_arg_info, queue, parameters):
-    import pyopencl as cl
-    import pyopencl.array as cl_array
+class _CLArrayAllocator(object):
+    """Allocates argument arrays on the device of a
+    :class:`pyopencl.CommandQueue`.
+    """
 
-    from loopy.kernel.data import ValueArg, ArrayArg, ImageArg, \
-            TemporaryVariable, ConstantArg
+    def __init__(self, queue):
+        self.queue = queue
+
+    def rand(self, shape, dtype):
+        import pyopencl.array as cl_array
+        ary = cl_array.empty(self.queue, shape, dtype, order="C")
+        fill_rand(ary)
+        return ary
+
+    def as_strided(self, ary, shape, numpy_strides):
+        import pyopencl.array as cl_array
+        return cl_array.as_strided(ary, shape, numpy_strides)
+
+    def to_host(self, ary):
+        return ary.get()
+
+    def to_device(self, ary):
+        import pyopencl.array as cl_array
+        return cl_array.to_device(self.queue, ary)
+
+    def make_image(self, ary):
+        import pyopencl as cl
+        # must be contiguous
+        return cl.image_from_array(self.queue.context, ary.get())
+
+
+class _HostArrayAllocator(object):
+    """Allocates argument arrays on the host, for use with
+    :class:`loopy.ExecutableCTarget`.
+    """
+
+    def __init__(self, seed=17):
+        self.rng = np.random.RandomState(seed)
+
+    def rand(self, shape, dtype):
+        if dtype.kind in "iu":
+            return self.rng.randint(0, 16, size=shape).astype(dtype)
+        elif dtype.kind == "c":
+            return (
+                    self.rng.random_sample(shape)
+                    + 1j*self.rng.random_sample(shape)).astype(dtype)
+        else:
+            return self.rng.random_sample(shape).astype(dtype)
+
+    def as_strided(self, ary, shape, numpy_strides):
+        from numpy.lib.stride_tricks import as_strided
+        return as_strided(ary, shape, numpy_strides)
+
+    def to_host(self, ary):
+        return ary
+
+    to_device = to_host
+
+    # images are not supported on the host
+    make_image = None
+
+# }}}
+
+
+def _get_value_arg(arg, parameters):
+    arg_value = parameters[arg.name]
 
+    try:
+        argv_dtype = arg_value.dtype
+    except AttributeError:
+        argv_dtype = None
+
+    if argv_dtype != arg.dtype:
+        arg_value = arg.dtype.numpy_dtype.type(arg_value)
+
+    return arg_value
+
+
+def _get_array_layout(arg, dtype, parameters):
+    """
+    :returns: a tuple ``(shape, strides, numpy_strides, alloc_size)`` for the
+        implemented array argument *arg*.
+    """
     from pymbolic import evaluate
 
+    shape = evaluate_shape(arg.unvec_shape, parameters)
+    strides = evaluate(arg.unvec_strides, parameters)
+    numpy_strides = [dtype.itemsize*s for s in strides]
+
+    alloc_size = sum(astrd*(alen-1) if astrd != 0 else alen-1
+            for alen, astrd in zip(shape, strides)) + 1
+
+    return shape, strides, numpy_strides, alloc_size
+
+
+# {{{ "reference" arguments
+
+def _make_ref_args(kernel, impl_arg_info, parameters, allocator):
+    from loopy.kernel.data import ValueArg, ArrayArg, ImageArg, \
+            TemporaryVariable, ConstantArg
+
     ref_args = {}
     ref_arg_data = []
 
@@ -96,72 +188,52 @@ def make_ref_args(kernel, impl_arg_info, queue, parameters):
             if arg.offset_for_name:
                 continue
 
-            arg_value = parameters[arg.name]
-
-            try:
-                argv_dtype = arg_value.dtype
-            except AttributeError:
-                argv_dtype = None
-
-            if argv_dtype != arg.dtype:
-                arg_value = arg.dtype.numpy_dtype.type(arg_value)
-
-            ref_args[arg.name] = arg_value
+            ref_args[arg.name] = _get_value_arg(arg, parameters)
 
             ref_arg_data.append(None)
 
         elif arg.arg_class is ArrayArg or arg.arg_class is ImageArg \
                 or arg.arg_class is ConstantArg:
+            if arg.arg_class is ImageArg and allocator.make_image is None:
+                raise LoopyError("image argument '%s' is not supported in "
+                        "automatic testing on the host" % arg.name)
+
             if arg.shape is None or any(saxis is None for saxis in arg.shape):
                 raise LoopyError("array '%s' needs known shape to use automatic "
                         "testing" % arg.name)
 
-            shape = evaluate_shape(arg.unvec_shape, parameters)
-            dtype = kernel_arg.dtype
+            if kernel_arg.dtype is None:
+                raise LoopyError("dtype for argument '%s' is not yet "
+                        "known. Perhaps you want to use "
+                        "loopy.add_dtypes "
+                        "or loopy.infer_argument_dtypes?"
+                        % arg.name)
+
+            dtype = kernel_arg.dtype.numpy_dtype
 
             is_output = arg.base_name in kernel.get_written_variables()
 
             if arg.arg_class is ImageArg:
-                storage_array = ary = cl_array.empty(
-                        queue, shape, dtype, order="C")
-                numpy_strides = None
-                alloc_size = None
-                strides = None
-            else:
-                strides = evaluate(arg.unvec_strides, parameters)
-
-                alloc_size = sum(astrd*(alen-1) if astrd != 0 else alen-1
-                        for alen, astrd in zip(shape, strides)) + 1
-
-                if dtype is None:
-                    raise LoopyError("dtype for argument '%s' is not yet "
-                            "known. Perhaps you want to use "
-                            "loopy.add_dtypes "
-                            "or loopy.infer_argument_dtypes?"
-                            % arg.name)
+                if is_output:
+                    raise LoopyError("write-mode images not supported in "
+                            "automatic testing")
 
-                itemsize = dtype.itemsize
-                numpy_strides = [itemsize*s for s in strides]
+                shape = evaluate_shape(arg.unvec_shape, parameters)
+                strides = numpy_strides = alloc_size = None
 
-                storage_array = cl_array.empty(queue, alloc_size, dtype)
-
-            if is_output and arg.arg_class is ImageArg:
-                raise LoopyError("write-mode images not supported in "
-                        "automatic testing")
-
-            fill_rand(storage_array)
-
-            if arg.arg_class is ImageArg:
-                # must be contiguous
+                storage_array = ary = allocator.rand(shape, dtype)
                 pre_run_ary = pre_run_storage_array = storage_array.copy()
 
-                ref_args[arg.name] = cl.image_from_array(
-                        queue.context, ary.get())
+                ref_args[arg.name] = allocator.make_image(ary)
             else:
+                shape, strides, numpy_strides, alloc_size = \
+                        _get_array_layout(arg, dtype, parameters)
+
+                storage_array = allocator.rand(alloc_size, dtype)
                 pre_run_storage_array = storage_array.copy()
 
-                ary = cl_array.as_strided(storage_array, shape, numpy_strides)
-                pre_run_ary = cl_array.as_strided(
+                ary = allocator.as_strided(storage_array, shape, numpy_strides)
+                pre_run_ary = allocator.as_strided(
                         pre_run_storage_array, shape, numpy_strides)
                 ref_args[arg.name] = ary
 
@@ -189,71 +261,65 @@ def make_ref_args(kernel, impl_arg_info, queue, parameters):
 
     return ref_args, ref_arg_data
 
+
+def make_ref_args(kernel, impl_arg_info, queue, parameters):
+    return _make_ref_args(kernel, impl_arg_info, parameters,
+            _CLArrayAllocator(queue))
+
 # }}}
 
 
 # {{{ "full-scale" arguments
 
-def make_args(kernel, impl_arg_info, queue, ref_arg_data, parameters):
-    import pyopencl as cl
-    import pyopencl.array as cl_array
-
+def _make_args(kernel, impl_arg_info, ref_arg_data, parameters, allocator):
     from loopy.kernel.data import ValueArg, ArrayArg, ImageArg,\
             TemporaryVariable, ConstantArg
+    from numpy.lib.stride_tricks import as_strided
 
-    from pymbolic import evaluate
+    ref_arg_data = dict(
+            (arg_desc.name, arg_desc)
+            for arg_desc in ref_arg_data
+            if arg_desc is not None)
 
     args = {}
-    for arg, arg_desc in zip(impl_arg_info, ref_arg_data):
+    for arg in impl_arg_info:
         kernel_arg = kernel.impl_arg_to_arg.get(arg.name)
 
         if arg.arg_class is ValueArg:
-            arg_value = parameters[arg.name]
-
-            try:
-                argv_dtype = arg_value.dtype
-            except AttributeError:
-                argv_dtype = None
-
-            if argv_dtype != arg.dtype:
-                arg_value = arg.dtype.numpy_dtype.type(arg_value)
+            if arg.offset_for_name:
+                continue
 
-            args[arg.name] = arg_value
+            args[arg.name] = _get_value_arg(arg, parameters)
 
         elif arg.arg_class is ImageArg:
+            if allocator.make_image is None:
+                raise LoopyError("image argument '%s' is not supported in "
+                        "automatic testing on the host" % arg.name)
+
             if arg.name in kernel.get_written_variables():
                 raise NotImplementedError("write-mode images not supported in "
                         "automatic testing")
 
+            arg_desc = ref_arg_data[arg.name]
+
             shape = evaluate_shape(arg.unvec_shape, parameters)
             assert shape == arg_desc.ref_shape
 
-            # must be contiguous
-            args[arg.name] = cl.image_from_array(
-                    queue.context, arg_desc.ref_pre_run_array.get())
+            args[arg.name] = allocator.make_image(arg_desc.ref_pre_run_array)
 
         elif arg.arg_class is ArrayArg or\
                 arg.arg_class is ConstantArg:
-            shape = evaluate(arg.unvec_shape, parameters)
-            strides = evaluate(arg.unvec_strides, parameters)
-
-            dtype = kernel_arg.dtype
-            itemsize = dtype.itemsize
-            numpy_strides = [itemsize*s for s in strides]
-
-            alloc_size = sum(astrd*(alen-1) if astrd != 0 else alen-1
-                    for alen, astrd in zip(shape, strides)) + 1
+            arg_desc = ref_arg_data[arg.name]
 
-            # use contiguous array to transfer to host
-            host_ref_contig_array = arg_desc.ref_pre_run_storage_array.get()
+            dtype = kernel_arg.dtype.numpy_dtype
+            shape, strides, numpy_strides, alloc_size = \
+                    _get_array_layout(arg, dtype, parameters)
 
-            # use device shape/strides
-            from pyopencl.compyte.array import as_strided
-            host_ref_array = as_strided(host_ref_contig_array,
-                    arg_desc.ref_shape, arg_desc.ref_numpy_strides)
-
-            # flatten the thing
-            host_ref_flat_array = host_ref_array.flatten()
+            # copy the reference data in logical order, and lay it out
+            # like the test kernel expects
+            host_ref_flat_array = as_strided(
+                    allocator.to_host(arg_desc.ref_pre_run_storage_array),
+                    arg_desc.ref_shape, arg_desc.ref_numpy_strides).flatten()
 
             # create host array with test shape (but not strides)
             host_contig_array = np.empty(shape, dtype=dtype)
@@ -270,9 +336,8 @@ def make_args(kernel, impl_arg_info, queue, ref_arg_data, parameters):
                     host_storage_array, shape, numpy_strides)
             host_array[...] = host_contig_array
 
-            host_contig_array = arg_desc.ref_storage_array.get()
-            storage_array = cl_array.to_device(queue, host_storage_array)
-            ary = cl_array.as_strided(storage_array, shape, numpy_strides)
+            storage_array = allocator.to_device(host_storage_array)
+            ary = allocator.as_strided(storage_array, shape, numpy_strides)
 
             args[arg.name] = ary
 
@@ -292,6 +357,11 @@ def make_args(kernel, impl_arg_info, queue, ref_arg_data, parameters):
 
     return args
 
+
+def make_args(kernel, impl_arg_info, queue, ref_arg_data, parameters):
+    return _make_args(kernel, impl_arg_info, ref_arg_data, parameters,
+            _CLArrayAllocator(queue))
+
 # }}}
 
 # }}}
@@ -717,4 +787,333 @@ def auto_test_vs_ref(
 
 # }}}
 
+# {{{ timing on the host
+
+class TimingResult(Record):
+    """The result of timing a kernel with :func:`time_host_calls`.
+
+    .. attribute:: times
+
+        A list of the mean times per call in seconds, one per trial.
+
+    .. attribute:: nrounds
+
+        The number of calls per trial.
+
+    .. attribute:: nwarmup_rounds
+
+        The number of calls before timing started.
+
+    .. attribute:: flops
+
+        The number of floating point operations per call, as counted by
+        :func:`loopy.get_op_map`, or *None*.
+
+    .. attribute:: nbytes
+
+        The number of bytes of global memory accessed per call, as counted by
+        :func:`loopy.get_mem_access_map`, or *None*.
+
+    .. autoattribute:: median
+    .. autoattribute:: iqr
+    .. autoattribute:: min
+    .. autoattribute:: flop_rate
+    .. autoattribute:: byte_rate
+    """
+
+    @property
+    def median(self):
+        """The median of :attr:`times`."""
+        return float(np.median(self.times))
+
+    @property
+    def iqr(self):
+        """The interquartile range of :attr:`times`."""
+        q1, q3 = np.percentile(self.times, [25, 75])
+        return float(q3 - q1)
+
+    @property
+    def min(self):
+        """The minimum of :attr:`times`."""
+        return float(np.min(self.times))
+
+    @property
+    def flop_rate(self):
+        """:attr:`flops` per second at the :attr:`median` time, or *None*."""
+        if self.flops is None:
+            return None
+        return self.flops / self.median
+
+    @property
+    def byte_rate(self):
+        """:attr:`nbytes` per second at the :attr:`median` time, or *None*."""
+        if self.nbytes is None:
+            return None
+        return self.nbytes / self.median
+
+    def __str__(self):
+        result = "median %g s, IQR %g s (%d trials of %d rounds)" % (
+                self.median, self.iqr, len(self.times), self.nrounds)
+
+        if self.flop_rate is not None:
+            result += ", %g GFlop/s" % (self.flop_rate*1e-9)
+        if self.byte_rate is not None:
+            result += ", %g GB/s" % (self.byte_rate*1e-9)
+
+        return result
+
+
+def time_host_calls(run, max_warmup_rounds=20, warmup_tolerance=0.1,
+        ntrials=7, min_trial_time=1e-2):
+    """Time calls to *run*, a function without arguments.
+
+    Calls during warm-up are not timed. Warm-up ends once the times of the
+    last three calls are within *warmup_tolerance* (relative to their
+    median) of each other, or after *max_warmup_rounds* calls. Each of the
+    *ntrials* trials then calls *run* as often as necessary to take at least
+    *min_trial_time* seconds.
+
+    :returns: a :class:`TimingResult` without operation counts.
+    """
+    from time import time
+
+    # {{{ warm-up
+
+    warmup_times = []
+    while len(warmup_times) < max(max_warmup_rounds, 1):
+        start = time()
+        run()
+        warmup_times.append(time() - start)
+
+        if len(warmup_times) >= 4:
+            # the first call is never representative
+            recent = warmup_times[-3:]
+            if (max(recent) - min(recent)) <= warmup_tolerance*np.median(recent):
+                break
+
+    # }}}
+
+    nrounds = 1
+    while True:
+        start = time()
+        for i in range(nrounds):
+            run()
+        elapsed = time() - start
+
+        if elapsed >= min_trial_time:
+            break
+        nrounds *= 2
+
+    times = [elapsed/nrounds]
+    for i in range(ntrials - 1):
+        start = time()
+        for i in range(nrounds):
+            run()
+        times.append((time() - start)/nrounds)
+
+    return TimingResult(
+            times=times,
+            nrounds=nrounds,
+            nwarmup_rounds=len(warmup_times),
+            flops=None,
+            nbytes=None)
+
+
+def get_flop_and_byte_counts(kernel, parameters):
+    """
+    :returns: a tuple ``(flops, nbytes)`` of the number of floating point
+        operations performed by *kernel* and the number of bytes of global
+        memory it accesses, evaluated with *parameters*.
+    """
+    from loopy.statistics import get_op_map, get_mem_access_map
+
+    kernel = kernel.copy(silenced_warnings=kernel.silenced_warnings + [
+        "insn_count_subgroups_upper_bound"])
+
+    op_map = get_op_map(kernel, numpy_types=False, count_redundant_work=True,
+            count_within_subscripts=False, subgroup_size=1)
+    flops = op_map.filter_by_func(
+            lambda op: op.dtype.numpy_dtype.kind in "fc"
+            ).eval_and_sum(parameters)
+
+    mem_map = get_mem_access_map(kernel, numpy_types=False,
+            count_redundant_work=True, subgroup_size=1)
+    nbytes = mem_map.filter_by(mtype=["global"]).to_bytes().eval_and_sum(
+            parameters)
+
+    return flops, nbytes
+
+# }}}
+
+
+# {{{ automatic testing on the CPU
+
+def auto_test_vs_ref_on_cpu(
+        ref_knl, test_knl=None, parameters={}, print_code=False,
+        do_check=True, check_result=None, max_test_kernel_count=1,
+        max_warmup_rounds=20, warmup_tolerance=0.1, ntrials=7,
+        min_trial_time=1e-2, count_ops=True, quiet=True):
+    """Like :func:`auto_test_vs_ref`, but runs the kernels on the host CPU
+    using :class:`loopy.ExecutableCTarget`, without requiring OpenCL.
+    Kernels with other targets are retargeted.
+
+    :arg check_result: see :func:`auto_test_vs_ref`.
+    :arg max_test_kernel_count: Stop testing after this many *test_knl*
+    :arg max_warmup_rounds: see :func:`time_host_calls`.
+    :arg warmup_tolerance: see :func:`time_host_calls`.
+    :arg ntrials: see :func:`time_host_calls`.
+    :arg min_trial_time: see :func:`time_host_calls`.
+    :arg count_ops: whether to count the floating point operations and
+        global memory accesses of the test kernels to report rates.
+    :returns: a list of :class:`TimingResult` instances, one per test kernel.
+    """
+    from loopy.target.c import ExecutableCTarget
+    from time import time
+
+    if test_knl is None:
+        test_knl = ref_knl
+        do_check = False
+
+    if len(ref_knl.args) != len(test_knl.args):
+        raise LoopyError("ref_knl and test_knl do not have the same number "
+                "of arguments")
+
+    for i, (ref_arg, test_arg) in enumerate(zip(ref_knl.args, test_knl.args)):
+        if ref_arg.name != test_arg.name:
+            raise LoopyError("ref_knl and test_knl argument lists disagree at index "
+                    "%d (1-based)" % (i+1))
+
+        if ref_arg.dtype != test_arg.dtype:
+            raise LoopyError("ref_knl and test_knl argument lists disagree at index "
+                    "%d (1-based)" % (i+1))
+
+    if check_result is None:
+        check_result = _default_check_result
+
+    def retarget(knl):
+        if not isinstance(knl.target, ExecutableCTarget):
+            knl = knl.copy(target=ExecutableCTarget())
+        return knl
+
+    # {{{ run reference code
+
+    from loopy.type_inference import infer_unknown_types
+    ref_knl = infer_unknown_types(retarget(ref_knl), expect_completion=True)
+
+    pp_ref_knl = lp.preprocess_kernel(ref_knl)
+    for knl in lp.generate_loop_schedules(pp_ref_knl):
+        ref_sched_kernel = knl
+        break
+
+    ref_executor = ref_sched_kernel.target.get_kernel_executor(ref_sched_kernel)
+    ref_kernel_info = ref_executor.kernel_info(frozenset())
+
+    ref_args, ref_arg_data = _make_ref_args(ref_sched_kernel,
+            ref_kernel_info.implemented_data_info, parameters,
+            _HostArrayAllocator())
+
+    if do_check:
+        logger.info("%s (ref): run" % ref_knl.name)
+
+        ref_start = time()
+        if not AUTO_TEST_SKIP_RUN:
+            ref_executor(**ref_args)
+        ref_elapsed_wall = time() - ref_start
+
+        logger.info("%s (ref): run done, %g s wall"
+                % (ref_knl.name, ref_elapsed_wall))
+
+    # }}}
+
+    # {{{ run test code
+
+    from loopy.kernel import KernelState
+    test_knl = retarget(test_knl)
+    if test_knl.state not in [
+            KernelState.PREPROCESSED,
+            KernelState.LINEARIZED]:
+        test_knl = lp.preprocess_kernel(test_knl)
+
+    if not test_knl.schedule:
+        test_kernels = lp.generate_loop_schedules(test_knl)
+    else:
+        test_kernels = [test_knl]
+
+    results = []
+
+    for i, kernel in enumerate(test_kernels):
+        if i >= max_test_kernel_count:
+            break
+
+        kernel = infer_unknown_types(kernel, expect_completion=True)
+
+        executor = kernel.target.get_kernel_executor(kernel)
+        kernel_info = executor.kernel_info(frozenset())
+
+        args = _make_args(kernel, kernel_info.implemented_data_info,
+                ref_arg_data, parameters, _HostArrayAllocator())
+
+        if not quiet:
+            print(75*"-")
+            print("Kernel #%d:" % i)
+            print(75*"-")
+            if print_code:
+                print(executor.get_highlighted_code())
+                print(75*"-")
+
+        if do_check and not AUTO_TEST_SKIP_RUN:
+            executor(**args)
+
+            from numpy.lib.stride_tricks import as_strided
+            for arg_desc in ref_arg_data:
+                if arg_desc is None or not arg_desc.needs_checking:
+                    continue
+
+                ref_ary = as_strided(
+                        arg_desc.ref_storage_array,
+                        shape=arg_desc.ref_shape,
+                        strides=arg_desc.ref_numpy_strides).flatten()
+                test_ary = as_strided(
+                        arg_desc.test_storage_array,
+                        shape=arg_desc.test_shape,
+                        strides=arg_desc.test_numpy_strides).flatten()
+                common_len = min(len(ref_ary), len(test_ary))
+
+                error_is_small, error = check_result(
+                        test_ary[:common_len], ref_ary[:common_len])
+                if not error_is_small:
+                    raise AutomaticTestFailure(error)
+
+        logger.info("%s: timing run" % kernel.name)
+
+        if AUTO_TEST_SKIP_RUN:
+            def run():
+                pass
+        else:
+            def run():
+                executor(**args)
+
+        result = time_host_calls(run,
+                max_warmup_rounds=max_warmup_rounds,
+                warmup_tolerance=warmup_tolerance,
+                ntrials=ntrials, min_trial_time=min_trial_time)
+
+        if count_ops:
+            flops, nbytes = get_flop_and_byte_counts(kernel, parameters)
+            result = result.copy(flops=flops, nbytes=nbytes)
+
+        logger.info("%s: timing run done: %s" % (kernel.name, result))
+
+        if not quiet:
+            print("elapsed: %s" % result)
+
+        results.append(result)
+
+    # }}}
+
+    return results
+
+# }}}
+
+
 # vim: foldmethod=marker
@@ -0,0 +1,611 @@
+from __future__ import division, absolute_import
+
+__copyright__ = "Copyright (C) 2020 University of Illinois Board of Trustees"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import six
+from six.moves import range
+
+import numpy as np
+from pytools import Record
+from pytools.persistent_dict import PersistentDict
+
+from loopy.diagnostic import LoopyError
+from loopy.tools import LoopyKeyBuilder
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+__doc__ = """
+.. currentmodule:: loopy.autotune
+
+Searching for good transformations of a kernel by timing its variants.
+The best configuration found is recorded in a persistent database, so that
+later processes can apply it using :func:`get_tuned_kernel` without searching
+again.
+
+.. autoclass:: SearchSpace
+
+.. autofunction:: autotune
+
+.. autoclass:: TuningResult
+
+.. autoclass:: CandidateResult
+
+.. autofunction:: get_tuned_kernel
+
+.. autofunction:: get_parameter_bucket
+
+.. autofunction:: get_device_key
+
+.. autofunction:: time_kernel
+"""
+
+
+# {{{ search space
+
+class SearchSpace(object):
+    """A set of configurations of a transformation.
+
+    .. attribute:: transform
+
+        A function ``transform(kernel, **config)`` returning *kernel*
+        transformed according to *config*.
+
+    .. attribute:: parameters
+
+        A mapping from names of the keyword arguments of :attr:`transform` to
+        the sequences of values they may take. The configurations are the
+        elements of the cartesian product of these sequences.
+
+    .. attribute:: constraint
+
+        *None* or a function ``constraint(**config)`` returning whether
+        *config* is valid.
+
+    .. attribute:: name
+
+        A string identifying :attr:`transform`. Results of search spaces with
+        different names are recorded separately. Defaults to the module and
+        qualified name of :attr:`transform`. This should be given explicitly
+        if these do not identify the transformation, e.g. for a
+        :keyword:`lambda`.
+
+    .. automethod:: __iter__
+    .. automethod:: apply
+
+    For example, to search over work-group sizes and whether to prefetch::
+
+        def transform(knl, block_size, prefetch):
+            knl = lp.split_iname(knl, "i", block_size,
+                    outer_tag="g.0", inner_tag="l.0")
+            if prefetch:
+                knl = lp.add_prefetch(knl, "a", ["i_inner"])
+            return knl
+
+        space = SearchSpace(transform, {
+            "block_size": [32, 64, 128],
+            "prefetch": [False, True],
+            })
+    """
+
+    def __init__(self, transform, parameters, constraint=None, name=None):
+        if name is None:
+            name = "%s.%s" % (
+                    getattr(transform, "__module__", None),
+                    getattr(transform, "__qualname__",
+                        getattr(transform, "__name__",
+                            type(transform).__name__)))
+
+        self.transform = transform
+        self.parameters = dict(
+                (param_name, tuple(values))
+                for param_name, values in six.iteritems(parameters))
+        self.constraint = constraint
+        self.name = name
+
+    def __iter__(self):
+        """Yield the valid configurations as :class:`dict` instances, in
+        an order that only depends on :attr:`parameters`.
+        """
+        from itertools import product
+
+        names = sorted(self.parameters)
+        for values in product(*[self.parameters[name] for name in names]):
+            config = dict(zip(names, values))
+
+            if self.constraint is None or self.constraint(**config):
+                yield config
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def apply(self, kernel, config):
+        return self.transform(kernel, **config)
+
+    def update_persistent_hash(self, key_hash, key_builder):
+        """Custom hash computation function for use with
+        :class:`pytools.persistent_dict.PersistentDict`.
+
+        As functions cannot be hashed persistently, :attr:`transform` is
+        represented by :attr:`name`. :attr:`constraint` does not take part in
+        the hash.
+        """
+        key_builder.rec(key_hash, self.name)
+        key_builder.rec(key_hash, tuple(sorted(six.iteritems(self.parameters))))
+
+# }}}
+
+
+# {{{ database keys
+
+def get_parameter_bucket(parameters):
+    """
+    :arg parameters: a mapping from names of kernel parameters to their
+        values.
+    :returns: a hashable representation of *parameters* in which positive
+        integer values are rounded up to the next power of two. Tuning
+        results are shared among parameter values in the same bucket.
+    """
+    def bucket(value):
+        if isinstance(value, (int, np.integer)) and value > 0:
+            return 1 << (int(value) - 1).bit_length()
+        return value
+
+    return tuple(sorted(
+        (name, bucket(value)) for name, value in six.iteritems(parameters)))
+
+
+def get_device_key(kernel, queue=None):
+    """
+    :returns: a string identifying the device *kernel* runs on. For
+        :class:`loopy.PyOpenCLTarget`, this is the device of *queue*.
+        Otherwise, it is the host CPU.
+    """
+    from loopy.target.pyopencl import PyOpenCLTarget
+    if isinstance(kernel.target, PyOpenCLTarget):
+        if queue is None:
+            raise LoopyError("a queue is required for kernels with a "
+                    "PyOpenCLTarget")
+
+        dev = queue.device
+        return "opencl:%s:%s:%s" % (
+                dev.platform.name.strip(), dev.name.strip(),
+                dev.driver_version.strip())
+
+    import platform
+    cpu_name = platform.processor()
+    try:
+        with open("/proc/cpuinfo") as inf:
+            for line in inf:
+                if line.startswith("model name"):
+                    cpu_name = line.split(":", 1)[1]
+                    break
+    except IOError:
+        pass
+
+    return "cpu:%s:%s" % (platform.machine(), cpu_name.strip())
+
+
+def _get_database_key(kernel, space, bucket, device_key):
+    from loopy.preprocess import prepare_for_caching
+    return LoopyKeyBuilder()(
+            (prepare_for_caching(kernel), space, bucket, device_key))
+
+
+tuning_database = PersistentDict("loopy-autotune-results-v1",
+        key_builder=LoopyKeyBuilder())
+
+# }}}
+
+
+# {{{ timing
+
+def make_arguments(kernel, parameters, queue=None, args=None):
+    """
+    :arg args: a mapping of arguments to *kernel* that are passed through
+        unchanged.
+    :returns: a :class:`dict` of arguments for *kernel*, with the integer
+        arguments in *parameters* and random data for the arrays not in
+        *args*. The arrays are laid out as the generated code for *kernel*
+        expects (see :func:`loopy.tag_array_axes`), with shapes and strides
+        evaluated using *parameters*.
+    """
+    from loopy.kernel.data import ValueArg
+    from loopy.auto_test import (
+            _make_ref_args, _CLArrayAllocator, _HostArrayAllocator)
+
+    result = dict(args) if args is not None else {}
+
+    executor = kernel.target.get_kernel_executor(kernel, queue)
+    kernel_info = executor.kernel_info(executor.arg_to_dtype_set(result))
+
+    impl_arg_info = [
+            arg for arg in kernel_info.implemented_data_info
+            if arg.name not in result
+            and arg.base_name not in result
+            and (arg.arg_class is not ValueArg or arg.name in parameters)]
+
+    if queue is not None:
+        allocator = _CLArrayAllocator(queue)
+    else:
+        allocator = _HostArrayAllocator()
+
+    new_args, _ = _make_ref_args(
+            kernel_info.kernel, impl_arg_info, parameters, allocator)
+    result.update(new_args)
+
+    return result
+
+
+def time_kernel(kernel, args, queue=None, max_warmup_rounds=20,
+        warmup_tolerance=0.1, ntrials=5, min_trial_time=1e-3):
+    """Time the execution of *kernel* with
+    :func:`loopy.auto_test.time_host_calls`. If *queue* is given, each call
+    waits for the queue to finish.
+
+    :arg args: a mapping of keyword arguments to *kernel*.
+    :arg max_warmup_rounds: see :func:`loopy.auto_test.time_host_calls`.
+    :arg warmup_tolerance: see :func:`loopy.auto_test.time_host_calls`.
+    :arg ntrials: see :func:`loopy.auto_test.time_host_calls`.
+    :arg min_trial_time: see :func:`loopy.auto_test.time_host_calls`.
+    :returns: a :class:`loopy.auto_test.TimingResult`.
+    """
+    if queue is not None:
+        def run():
+            kernel(queue, **args)
+            queue.finish()
+    else:
+        def run():
+            kernel(**args)
+
+    from loopy.auto_test import time_host_calls
+    return time_host_calls(run,
+            max_warmup_rounds=max_warmup_rounds,
+            warmup_tolerance=warmup_tolerance,
+            ntrials=ntrials, min_trial_time=min_trial_time)
+
+# }}}
+
+
+# {{{ parallel preparation of candidates
+
+# used to share candidates with forked worker processes
+_PREPARATION_STATE = None
+
+
+def _prepare_candidate(i):
+    executors, args = _PREPARATION_STATE
+    executor = executors[i]
+
+    try:
+        from loopy.target.c.c_execution import CKernelExecutor
+        if isinstance(executor, CKernelExecutor):
+            # Also compiles, into the directory of the compiler shared with
+            # the parent.
+            executor.kernel_info(executor.arg_to_dtype_set(args))
+        else:
+            from loopy.codegen import generate_code_for_execution
+            generate_code_for_execution(
+                    executor.get_typed_and_scheduled_kernel(
+                        executor.arg_to_dtype_set(args)))
+    except Exception as e:
+        return str(e)
+
+    return None
+
+
+def _prepare_candidates(kernels, args, queue, nprocesses):
+    """Generate (and, for :class:`loopy.ExecutableCTarget`, compile) code
+    for *kernels* in forked worker processes. The results reach the parent
+    through loopy's persistent caches and the compiler's cache directory.
+
+    :returns: a tuple ``(kernels, errors)`` of the kernels to time and a list
+        of error messages or *None*, one per kernel.
+    """
+    import multiprocessing as mp
+    from loopy import CACHING_ENABLED
+
+    if (not CACHING_ENABLED
+            or nprocesses < 2
+            or len(kernels) < 2
+            or "fork" not in mp.get_all_start_methods()):
+        return kernels, [None] * len(kernels)
+
+    from loopy import set_options
+    from loopy.target.c import ExecutableCTarget
+    # Code compiled from a string holds a lock on the whole cache directory
+    # of the compiler, which would serialize the workers. Code on disk is
+    # compiled without locking.
+    kernels = [
+            set_options(knl, stream_code_to_disk=True)
+            if isinstance(knl.target, ExecutableCTarget) else knl
+            for knl in kernels]
+
+    executors = [
+            knl.target.get_kernel_executor(knl, queue)
+            for knl in kernels]
+
+    global _PREPARATION_STATE
+    _PREPARATION_STATE = (executors, args)
+    try:
+        with mp.get_context("fork").Pool(
+                min(nprocesses, len(kernels))) as pool:
+            return kernels, pool.map(_prepare_candidate, range(len(kernels)))
+    finally:
+        _PREPARATION_STATE = None
+
+# }}}
+
+
+# {{{ autotune
+
+class CandidateResult(Record):
+    """
+    .. attribute:: config
+    .. attribute:: times
+
+        A list of times per call in seconds, one per trial of
+        :func:`time_kernel`, or *None* if the candidate could not be timed.
+
+    .. attribute:: error
+
+        A message describing why the candidate failed, or *None*.
+
+    .. attribute:: predicted_time
+
+        The prediction of the model, if one was used.
+    """
+
+    @property
+    def time(self):
+        """The median of :attr:`times`."""
+        if not self.times:
+            return None
+        return float(np.median(self.times))
+
+
+class TuningResult(Record):
+    """
+    .. attribute:: kernel
+
+        The kernel transformed using :attr:`config`.
+
+    .. attribute:: config
+
+        The best configuration found, a :class:`dict`.
+
+    .. attribute:: time
+
+        The median time per call of :attr:`kernel` in seconds.
+
+    .. attribute:: candidates
+
+        A list of :class:`CandidateResult` instances for the candidates
+        considered, empty if the result was retrieved from the database.
+
+    .. attribute:: from_database
+    """
+
+
+def autotune(kernel, space, parameters, queue=None, args=None,
+        strategy="exhaustive", max_candidates=None, model=None, seed=0,
+        nprocesses=None, max_warmup_rounds=20, warmup_tolerance=0.1,
+        ntrials=5, min_trial_time=1e-3,
+        database=None, force=False):
+    """Search *space* for the configuration in which *kernel* runs fastest.
+
+    :arg kernel: a kernel targeting :class:`loopy.ExecutableCTarget` or
+        :class:`loopy.PyOpenCLTarget`, with all argument types known.
+    :arg space: a :class:`SearchSpace`.
+    :arg parameters: a mapping from names of integer arguments of *kernel* to
+        their values for timing.
+    :arg queue: a :class:`pyopencl.CommandQueue`, required for
+        :class:`loopy.PyOpenCLTarget`.
+    :arg args: a mapping of arguments to *kernel*. Array arguments not given
+        are filled with random data, laid out as each candidate expects.
+    :arg strategy: one of
+
+        * ``"exhaustive"``: time all configurations in *space*.
+        * ``"random"``: time *max_candidates* configurations drawn from
+          *space* at random, using *seed*.
+        * ``"model"``: time the *max_candidates* configurations for which
+          *model* predicts the lowest run time. *model* is called as
+          ``model(transformed_kernel, parameters)`` and returns a
+          prediction of the run time in seconds.
+
+    :arg nprocesses: the number of worker processes in which code for the
+        candidates is generated (and, for :class:`loopy.ExecutableCTarget`,
+        compiled) ahead of timing, defaulting to the number of CPUs. This
+        requires caching to be enabled (see
+        :func:`loopy.set_caching_enabled`).
+    :arg max_warmup_rounds: see :func:`time_kernel`.
+    :arg warmup_tolerance: see :func:`time_kernel`.
+    :arg ntrials: see :func:`time_kernel`.
+    :arg min_trial_time: see :func:`time_kernel`.
+    :arg database: a mapping in which results are recorded, defaulting to
+        a persistent database. Results are keyed by *kernel*, the parameters
+        of *space*, the bucket of *parameters* (see
+        :func:`get_parameter_bucket`) and the device (see
+        :func:`get_device_key`).
+    :arg force: if *True*, search even if a result is recorded in *database*.
+
+    :returns: a :class:`TuningResult`.
+    """
+    if database is None:
+        database = tuning_database
+
+    db_key = _get_database_key(
+            kernel, space, get_parameter_bucket(parameters),
+            get_device_key(kernel, queue))
+
+    if not force:
+        try:
+            config, time = database[db_key]
+        except KeyError:
+            pass
+        else:
+            logger.info("%s: using tuned configuration %s from database"
+                    % (kernel.name, config))
+            return TuningResult(
+                    kernel=space.apply(kernel, config),
+                    config=config,
+                    time=time,
+                    candidates=[],
+                    from_database=True)
+
+    # {{{ select candidates
+
+    configs = list(space)
+
+    if strategy == "exhaustive":
+        pass
+
+    elif strategy == "random":
+        if max_candidates is None:
+            raise LoopyError("strategy 'random' requires max_candidates")
+
+        if max_candidates < len(configs):
+            rng = np.random.RandomState(seed)
+            configs = [
+                    configs[i]
+                    for i in sorted(rng.choice(
+                        len(configs), max_candidates, replace=False))]
+
+    elif strategy == "model":
+        if model is None:
+            raise LoopyError("strategy 'model' requires a model")
+
+    else:
+        raise LoopyError("unknown search strategy '%s'" % strategy)
+
+    candidates = []
+    kernels = []
+    for config in configs:
+        try:
+            cand_kernel = space.apply(kernel, config)
+            predicted_time = (
+                    model(cand_kernel, parameters)
+                    if strategy == "model" else None)
+        except Exception as e:
+            logger.info("%s: configuration %s failed: %s"
+                    % (kernel.name, config, e))
+            candidates.append(CandidateResult(
+                config=config, times=None, error=str(e),
+                predicted_time=None))
+        else:
+            candidates.append(CandidateResult(
+                config=config, times=None, error=None,
+                predicted_time=predicted_time))
+            kernels.append(cand_kernel)
+
+    timed = [cand for cand in candidates if cand.error is None]
+
+    if strategy == "model" and max_candidates is not None:
+        order = sorted(range(len(timed)),
+                key=lambda i: timed[i].predicted_time)[:max_candidates]
+        order.sort()
+        timed = [timed[i] for i in order]
+        kernels = [kernels[i] for i in order]
+
+    # }}}
+
+    # {{{ time candidates
+
+    if args is None:
+        args = {}
+
+    if nprocesses is None:
+        import os
+        nprocesses = os.cpu_count() or 1
+
+    timing_kernels, preparation_errors = _prepare_candidates(
+            kernels, args, queue, nprocesses)
+
+    for cand, timing_kernel, error in zip(
+            timed, timing_kernels, preparation_errors):
+        if error is None:
+            try:
+                # Candidates may lay out their arguments differently.
+                cand_args = make_arguments(
+                        timing_kernel, parameters, queue, args)
+                cand.times = time_kernel(timing_kernel, cand_args, queue=queue,
+                        max_warmup_rounds=max_warmup_rounds,
+                        warmup_tolerance=warmup_tolerance,
+                        ntrials=ntrials, min_trial_time=min_trial_time).times
+            except Exception as e:
+                error = str(e)
+
+        if error is not None:
+            logger.info("%s: configuration %s failed: %s"
+                    % (kernel.name, cand.config, error))
+            cand.error = error
+        else:
+            logger.info("%s: configuration %s: %g s"
+                    % (kernel.name, cand.config, cand.time))
+
+    # }}}
+
+    successful = [
+            (cand, cand_kernel)
+            for cand, cand_kernel in zip(timed, kernels)
+            if cand.times]
+    if not successful:
+        raise LoopyError("no configuration of kernel '%s' could be timed"
+                % kernel.name)
+
+    best, best_kernel = min(successful, key=lambda item: item[0].time)
+
+    database[db_key] = (best.config, best.time)
+
+    return TuningResult(
+            kernel=best_kernel,
+            config=best.config,
+            time=best.time,
+            candidates=candidates,
+            from_database=False)
+
+
+def get_tuned_kernel(kernel, space, parameters, queue=None, database=None):
+    """
+    :returns: *kernel* transformed according to the best configuration of
+        *space* recorded by :func:`autotune`, or *None* if *kernel* has not
+        been tuned for the bucket of *parameters* on the device.
+    """
+    if database is None:
+        database = tuning_database
+
+    db_key = _get_database_key(
+            kernel, space, get_parameter_bucket(parameters),
+            get_device_key(kernel, queue))
+
+    try:
+        config, _ = database[db_key]
+    except KeyError:
+        return None
+
+    return space.apply(kernel, config)
+
+# }}}
+
+# vim: foldmethod=marker
@@ -44,6 +44,8 @@ __doc__ = """
 
 .. autoclass:: VectorizationInfo
 
+.. autoclass:: IndexPointerInfo
+
 .. autoclass:: SeenFunction
 
 .. autoclass:: CodeGenerationState
@@ -121,6 +123,23 @@ class ImplementedDataInfo(ImmutableRecord):
                 allows_offset=allows_offset,
                 is_written=is_written)
 
+    def update_persistent_hash(self, key_hash, key_builder):
+        """Custom hash computation function for use with
+        :class:`pytools.persistent_dict.PersistentDict`.
+        """
+        from loopy.tools import PymbolicExpressionHashWrapper
+
+        for field_name in sorted(self.__class__.fields):
+            value = getattr(self, field_name)
+
+            if field_name == "arg_class":
+                value = "%s.%s" % (value.__module__, value.__name__)
+            elif (field_name in ["shape", "strides", "unvec_shape", "unvec_strides"]
+                    and isinstance(value, tuple)):
+                value = tuple(PymbolicExpressionHashWrapper(v) for v in value)
+
+            key_builder.rec(key_hash, value)
+
 # }}}
 
 
@@ -143,6 +162,29 @@ class VectorizationInfo(object):
         self.space = space
 
 
+class IndexPointerInfo(object):
+    """Describes the pointers into global arrays that are advanced along with
+    the enclosing sequential loops, see
+    :attr:`loopy.Options.strength_reduce_indices`.
+
+    .. attribute:: inames
+
+        A :class:`frozenset` of the inames of the enclosing sequential loops
+        whose contributions to array offsets are folded into the pointers.
+
+    .. attribute:: pointers
+
+        A :class:`dict` mapping a tuple ``(array_name, coefficients)`` to the
+        name of the pointer, where *coefficients* is a :class:`frozenset` of
+        tuples ``(iname, coefficient)`` describing the part of the offset held
+        by the pointer.
+    """
+
+    def __init__(self, inames, pointers):
+        self.inames = inames
+        self.pointers = pointers
+
+
 class SeenFunction(ImmutableRecord):
     """
     .. attribute:: name
@@ -203,6 +245,15 @@ class CodeGenerationState(object):
         generated.
 
     .. attribute:: schedule_index_end
+
+    .. attribute:: pregenerated_subkernels
+
+        *None* or a :class:`loopy.codegen.control.PregeneratedSubkernels`
+        holding device code for subkernels that was generated in parallel.
+
+    .. attribute:: index_pointer_info
+
+        *None* or an instance of :class:`IndexPointerInfo`
     """
 
     def __init__(self, kernel,
@@ -212,7 +263,9 @@ class CodeGenerationState(object):
             vectorization_info=None, var_name_generator=None,
             is_generating_device_code=None,
             gen_program_name=None,
-            schedule_index_end=None):
+            schedule_index_end=None,
+            pregenerated_subkernels=None,
+            index_pointer_info=None):
         self.kernel = kernel
         self.implemented_data_info = implemented_data_info
         self.implemented_domain = implemented_domain
@@ -227,6 +280,8 @@ class CodeGenerationState(object):
         self.is_generating_device_code = is_generating_device_code
         self.gen_program_name = gen_program_name
         self.schedule_index_end = schedule_index_end
+        self.pregenerated_subkernels = pregenerated_subkernels
+        self.index_pointer_info = index_pointer_info
 
     # {{{ copy helpers
 
@@ -235,7 +290,8 @@ class CodeGenerationState(object):
             var_subst_map=None, vectorization_info=None,
             is_generating_device_code=None,
             gen_program_name=None,
-            schedule_index_end=None):
+            schedule_index_end=None,
+            index_pointer_info=None):
 
         if kernel is None:
             kernel = self.kernel
@@ -258,6 +314,9 @@ class CodeGenerationState(object):
         if schedule_index_end is None:
             schedule_index_end = self.schedule_index_end
 
+        if index_pointer_info is None:
+            index_pointer_info = self.index_pointer_info
+
         return CodeGenerationState(
                 kernel=kernel,
                 implemented_data_info=implemented_data_info,
@@ -273,7 +332,9 @@ class CodeGenerationState(object):
                 var_name_generator=self.var_name_generator,
                 is_generating_device_code=is_generating_device_code,
                 gen_program_name=gen_program_name,
-                schedule_index_end=schedule_index_end)
+                schedule_index_end=schedule_index_end,
+                pregenerated_subkernels=self.pregenerated_subkernels,
+                index_pointer_info=index_pointer_info)
 
     def copy_and_assign(self, name, value):
         """Make a copy of self with variable *name* fixed to *value*."""
@@ -377,6 +438,12 @@ code_gen_cache = WriteOncePersistentDict(
          "loopy-code-gen-cache-v3-"+DATA_MODEL_VERSION,
          key_builder=LoopyKeyBuilder())
 
+# Holds the same results as code_gen_cache, but in compact form, so that
+# retrieving code for execution does not unpickle ASTs and implemented domains.
+compact_code_gen_cache = WriteOncePersistentDict(
+         "loopy-compact-code-gen-cache-v1-"+DATA_MODEL_VERSION,
+         key_builder=LoopyKeyBuilder())
+
 
 class PreambleInfo(ImmutableRecord):
     """
@@ -390,11 +457,7 @@ class PreambleInfo(ImmutableRecord):
 
 # {{{ main code generation entrypoint
 
-def generate_code_v2(kernel):
-    """
-    :returns: a :class:`CodeGenerationResult`
-    """
-
+def _get_linearized_kernel(kernel):
     from loopy.kernel import KernelState
     if kernel.state == KernelState.INITIAL:
         from loopy.preprocess import preprocess_kernel
@@ -408,14 +471,23 @@ def generate_code_v2(kernel):
         raise LoopyError("cannot generate code for a kernel that has not been "
                 "scheduled")
 
+    return kernel
+
+
+def generate_code_v2(kernel):
+    """
+    :returns: a :class:`CodeGenerationResult`
+    """
+
+    kernel = _get_linearized_kernel(kernel)
+
     # {{{ cache retrieval
 
     from loopy import CACHING_ENABLED
 
     if CACHING_ENABLED:
-        input_kernel = kernel
         try:
-            result = code_gen_cache[input_kernel]
+            result = code_gen_cache[kernel]
             logger.debug("%s: code generation cache hit" % kernel.name)
             return result
         except KeyError:
@@ -423,6 +495,20 @@ def generate_code_v2(kernel):
 
     # }}}
 
+    codegen_result = _generate_code_v2_uncached(kernel)
+
+    if CACHING_ENABLED:
+        code_gen_cache.store_if_not_present(kernel, codegen_result)
+
+    return codegen_result
+
+
+def _generate_code_v2_uncached(kernel):
+    """
+    :arg kernel: a linearized kernel.
+    :returns: a :class:`CodeGenerationResult`
+    """
+
     from loopy.type_inference import infer_unknown_types
     kernel = infer_unknown_types(kernel, expect_completion=True)
 
@@ -488,6 +574,13 @@ def generate_code_v2(kernel):
                 + kernel.target.host_program_name_suffix),
             schedule_index_end=len(kernel.schedule))
 
+    if kernel.options.parallel_subkernel_codegen:
+        from loopy.codegen.control import pregenerate_subkernels
+        nprocesses = kernel.options.parallel_subkernel_codegen
+        codegen_state.pregenerated_subkernels = pregenerate_subkernels(
+                codegen_state,
+                nprocesses=None if nprocesses is True else nprocesses)
+
     from loopy.codegen.result import generate_host_or_device_program
     codegen_result = generate_host_or_device_program(
             codegen_state,
@@ -534,10 +627,53 @@ def generate_code_v2(kernel):
 
     logger.info("%s: generate code: done" % kernel.name)
 
+    return codegen_result
+
+
+def generate_code_for_execution(kernel, keep_ast=False):
+    """Like :func:`generate_code_v2`, but only returning what is needed to
+    build and invoke the generated code. Only the compact results are
+    cached, separately from the full ones of :func:`generate_code_v2`, so
+    that a cache hit is cheap. Kernel bundles loaded by
+    :func:`loopy.load_bundle` are consulted first.
+
+    :arg keep_ast: If *True* and the kernel is not found in a bundle, return
+        a full result like :func:`generate_code_v2` instead of a compact one.
+        Its code can then be written out piece by piece (see
+        :attr:`loopy.Options.stream_code_to_disk`) without ever being held
+        in memory (or cached) as a whole.
+    :returns: a :class:`loopy.codegen.result.CompactCodeGenerationResult`, or
+        a :class:`loopy.codegen.result.CodeGenerationResult` if *keep_ast* is
+        given.
+    """
+
+    kernel = _get_linearized_kernel(kernel)
+
+    from loopy.target.bundle import lookup_in_bundles
+    try:
+        return lookup_in_bundles("generated_code", kernel)
+    except KeyError:
+        pass
+
+    if keep_ast:
+        return _generate_code_v2_uncached(kernel)
+
+    from loopy import CACHING_ENABLED
+
     if CACHING_ENABLED:
-        code_gen_cache.store_if_not_present(input_kernel, codegen_result)
+        try:
+            result = compact_code_gen_cache[kernel]
+            logger.debug("%s: compact code generation cache hit" % kernel.name)
+            return result
+        except KeyError:
+            pass
 
-    return codegen_result
+    result = _generate_code_v2_uncached(kernel).get_compact_result()
+
+    if CACHING_ENABLED:
+        compact_code_gen_cache.store_if_not_present(kernel, result)
+
+    return result
 
 
 def generate_code(kernel, device=None):
@@ -50,6 +50,58 @@ def get_approximate_convex_bounds_checks(domain, check_inames, implemented_domai
     result = convexify(result)
     return result.get_constraints()
 
+
+def get_box_bounds_checks(domain, check_inames, implemented_domain):
+    """Like :func:`get_approximate_convex_bounds_checks`, but for domains
+    for which :func:`loopy.isl_helpers.is_box_set` holds. Since the bounds of
+    each iname are independent of those of the other inames, no projection
+    is necessary.
+    """
+    var_dict = domain.get_var_dict(dim_type.set)
+    check_indices = [
+            var_dict[iname][1] for iname in check_inames if iname in var_dict]
+
+    # Constraints involving only parameters restrict all inames at once,
+    # so they are kept as well.
+    result = isl.BasicSet.universe(domain.space)
+    for cns in domain.get_constraints():
+        if (any(cns.involves_dims(dim_type.set, i, 1) for i in check_indices)
+                or not cns.involves_dims(
+                    dim_type.set, 0, domain.dim(dim_type.set))):
+            result = result.add_constraint(cns)
+
+    result = isl.Set.from_basic_set(result)
+    result, implemented_domain = isl.align_two(result, implemented_domain)
+    result = result.gist(implemented_domain)
+
+    from loopy.isl_helpers import convexify
+    result = convexify(result)
+    return result.get_constraints()
+
+
+def _get_bounds_checks(domain, check_inames, implemented_domain, box_only):
+    from loopy.isl_helpers import is_box_set
+    if box_only and is_box_set(domain):
+        return get_box_bounds_checks(domain, check_inames, implemented_domain)
+    else:
+        return get_approximate_convex_bounds_checks(
+                domain, check_inames, implemented_domain)
+
+
+def get_bounds_checks(kernel, domain, check_inames, implemented_domain):
+    """Return a list of :class:`islpy.Constraint` instances that, together
+    with *implemented_domain*, restrict *check_inames* to *domain*.
+
+    Results are cached (through :attr:`loopy.LoopKernel.cache_manager`)
+    across code generation runs and subkernels. If
+    :attr:`loopy.Options.box_bounds_checks` is set, rectangular domains
+    skip the projections of the general case.
+    """
+    return kernel.cache_manager.op(
+            domain, "bounds_checks", _get_bounds_checks,
+            (frozenset(check_inames), implemented_domain,
+                bool(kernel.options.box_bounds_checks)))
+
 # }}}
 
 
@@ -65,6 +65,224 @@ def synthesize_idis_for_extra_args(kernel, schedule_index):
     return idis
 
 
+def _get_subkernel_codegen_state(codegen_state, sched_index, extra_args):
+    kernel = codegen_state.kernel
+    sched_item = kernel.schedule[sched_index]
+
+    _, past_end_i = gather_schedule_block(kernel.schedule, sched_index)
+    assert past_end_i <= codegen_state.schedule_index_end
+
+    return codegen_state.copy(
+            is_generating_device_code=True,
+            gen_program_name=sched_item.kernel_name,
+            schedule_index_end=past_end_i-1,
+            implemented_data_info=(codegen_state.implemented_data_info
+                + extra_args))
+
+
+# {{{ parallel subkernel generation
+
+class _SubkernelCodegenOutcome(object):
+    """The result of generating code for a subkernel in a worker process,
+    along with the changes this made to the mutable parts of the
+    :class:`loopy.codegen.CodeGenerationState`.
+    """
+
+    def __init__(self, codegen_result, new_names, new_name_counters,
+            new_seen_dtypes, new_seen_functions, new_seen_atomic_dtypes):
+        self.codegen_result = codegen_result
+        self.new_names = new_names
+        self.new_name_counters = new_name_counters
+        self.new_seen_dtypes = new_seen_dtypes
+        self.new_seen_functions = new_seen_functions
+        self.new_seen_atomic_dtypes = new_seen_atomic_dtypes
+
+
+# state shared with forked worker processes
+_PARALLEL_CODEGEN_STATE = None
+
+
+def _get_name_counters(var_name_generator):
+    return dict(getattr(var_name_generator, "prefix_to_counter", {}))
+
+
+def _generate_subkernel_in_worker(sched_index):
+    from copy import deepcopy
+
+    codegen_state = _PARALLEL_CODEGEN_STATE
+
+    # Each task starts from the same state as the parent process, even if
+    # this worker has processed other tasks before.
+    var_name_generator = deepcopy(codegen_state.var_name_generator)
+    seen_dtypes = set(codegen_state.seen_dtypes)
+    seen_functions = set(codegen_state.seen_functions)
+    seen_atomic_dtypes = set(codegen_state.seen_atomic_dtypes)
+
+    from loopy.codegen import CodeGenerationState
+    codegen_state = CodeGenerationState(
+            kernel=codegen_state.kernel,
+            implemented_data_info=codegen_state.implemented_data_info,
+            implemented_domain=codegen_state.implemented_domain,
+            implemented_predicates=codegen_state.implemented_predicates,
+            seen_dtypes=seen_dtypes,
+            seen_functions=seen_functions,
+            seen_atomic_dtypes=seen_atomic_dtypes,
+            var_subst_map=codegen_state.var_subst_map,
+            allow_complex=codegen_state.allow_complex,
+            vectorization_info=codegen_state.vectorization_info,
+            var_name_generator=var_name_generator,
+            is_generating_device_code=codegen_state.is_generating_device_code,
+            gen_program_name=codegen_state.gen_program_name,
+            schedule_index_end=codegen_state.schedule_index_end)
+
+    from loopy.codegen.result import generate_host_or_device_program
+    codegen_result = generate_host_or_device_program(
+            _get_subkernel_codegen_state(
+                codegen_state, sched_index,
+                synthesize_idis_for_extra_args(codegen_state.kernel, sched_index)),
+            sched_index)
+
+    parent_state = _PARALLEL_CODEGEN_STATE
+    return _SubkernelCodegenOutcome(
+            codegen_result=codegen_result,
+            new_names=(
+                var_name_generator.existing_names
+                - parent_state.var_name_generator.existing_names),
+            new_name_counters=_get_name_counters(var_name_generator),
+            new_seen_dtypes=seen_dtypes - parent_state.seen_dtypes,
+            new_seen_functions=seen_functions - parent_state.seen_functions,
+            new_seen_atomic_dtypes=(
+                seen_atomic_dtypes - parent_state.seen_atomic_dtypes))
+
+
+class PregeneratedSubkernels(object):
+    """Device code for top-level subkernels, generated ahead of time in
+    parallel by :func:`pregenerate_subkernels`.
+
+    Pregenerated code is only used if it is identical to what sequential
+    generation would have produced, i.e. if the state of code generation
+    upon reaching the subkernel matches the one the code was generated from.
+    Otherwise, the subkernel is generated as usual.
+
+    .. automethod:: get
+    """
+
+    def __init__(self, codegen_state, outcomes):
+        self.codegen_state = codegen_state
+        self.outcomes = outcomes
+
+        self.nnames = len(codegen_state.var_name_generator.existing_names)
+        self.name_counters = _get_name_counters(codegen_state.var_name_generator)
+
+    def _is_applicable(self, codegen_state):
+        orig_state = self.codegen_state
+        return (
+                codegen_state.kernel is orig_state.kernel
+                and codegen_state.implemented_data_info
+                is orig_state.implemented_data_info
+                and (codegen_state.implemented_domain
+                    is orig_state.implemented_domain
+                    or codegen_state.implemented_domain.plain_is_equal(
+                        orig_state.implemented_domain))
+                and codegen_state.implemented_predicates
+                == orig_state.implemented_predicates
+                and codegen_state.var_subst_map == orig_state.var_subst_map
+                and codegen_state.vectorization_info is None
+                and not codegen_state.is_generating_device_code)
+
+    def get(self, codegen_state, sched_index):
+        """Return the pregenerated :class:`loopy.codegen.result.CodeGenerationResult`
+        for the subkernel at *sched_index*, updating the mutable parts of
+        *codegen_state* as sequential generation would have. Return *None* if
+        the pregenerated code is not usable.
+        """
+        outcome = self.outcomes.get(sched_index)
+        if outcome is None or not self._is_applicable(codegen_state):
+            return None
+
+        var_name_generator = codegen_state.var_name_generator
+        if outcome.new_names:
+            # Name generation depends on the names (and name counters) seen
+            # so far. Unless these are unchanged, sequential generation
+            # might have picked different names.
+            if (len(var_name_generator.existing_names) != self.nnames
+                    or _get_name_counters(var_name_generator)
+                    != self.name_counters):
+                return None
+
+            for name in sorted(outcome.new_names):
+                var_name_generator.existing_names.add(name)
+                var_name_generator._name_added(name)
+            if hasattr(var_name_generator, "prefix_to_counter"):
+                var_name_generator.prefix_to_counter.update(
+                        outcome.new_name_counters)
+
+        codegen_state.seen_dtypes.update(outcome.new_seen_dtypes)
+        codegen_state.seen_functions.update(outcome.new_seen_functions)
+        codegen_state.seen_atomic_dtypes.update(outcome.new_seen_atomic_dtypes)
+
+        del self.outcomes[sched_index]
+        return outcome.codegen_result
+
+
+def pregenerate_subkernels(codegen_state, nprocesses=None):
+    """Generate device code for the subkernels at the top level of the host
+    program of *codegen_state* in parallel worker processes.
+
+    :arg nprocesses: the number of worker processes, defaulting to the
+        number of CPUs.
+    :returns: a :class:`PregeneratedSubkernels` or *None* if parallel
+        generation is not possible or not worthwhile.
+    """
+    import multiprocessing as mp
+
+    if "fork" not in mp.get_all_start_methods():
+        # Workers need to inherit the code generation state, which is not
+        # generally picklable.
+        return None
+
+    kernel = codegen_state.kernel
+
+    sched_indices = []
+    depth = 0
+    for sched_index, sched_item in enumerate(kernel.schedule):
+        if isinstance(sched_item, EnterLoop):
+            depth += 1
+        elif isinstance(sched_item, LeaveLoop):
+            depth -= 1
+        elif isinstance(sched_item, CallKernel) and depth == 0:
+            sched_indices.append(sched_index)
+
+    if len(sched_indices) < 2:
+        return None
+
+    if nprocesses is None:
+        import os
+        nprocesses = os.cpu_count() or 1
+    nprocesses = min(nprocesses, len(sched_indices))
+    if nprocesses < 2:
+        return None
+
+    global _PARALLEL_CODEGEN_STATE
+    _PARALLEL_CODEGEN_STATE = codegen_state
+    try:
+        with mp.get_context("fork").Pool(nprocesses) as pool:
+            outcomes = pool.map(_generate_subkernel_in_worker, sched_indices)
+    except Exception as e:
+        from loopy.diagnostic import warn_with_kernel
+        warn_with_kernel(kernel, "parallel_codegen_failed",
+                "parallel generation of subkernels failed, "
+                "falling back to sequential generation: %s" % e)
+        return None
+    finally:
+        _PARALLEL_CODEGEN_STATE = None
+
+    return PregeneratedSubkernels(
+            codegen_state, dict(zip(sched_indices, outcomes)))
+
+# }}}
+
+
 def generate_code_for_sched_index(codegen_state, sched_index):
     kernel = codegen_state.kernel
     sched_item = kernel.schedule[sched_index]
@@ -72,22 +290,21 @@ def generate_code_for_sched_index(codegen_state, sched_index):
     if isinstance(sched_item, CallKernel):
         assert not codegen_state.is_generating_device_code
 
-        from loopy.schedule import (gather_schedule_block, get_insn_ids_for_block_at)
-        _, past_end_i = gather_schedule_block(kernel.schedule, sched_index)
-        assert past_end_i <= codegen_state.schedule_index_end
+        from loopy.schedule import get_insn_ids_for_block_at
 
         extra_args = synthesize_idis_for_extra_args(kernel, sched_index)
 
-        new_codegen_state = codegen_state.copy(
-                is_generating_device_code=True,
-                gen_program_name=sched_item.kernel_name,
-                schedule_index_end=past_end_i-1,
-                implemented_data_info=(codegen_state.implemented_data_info
-                    + extra_args))
+        codegen_result = None
+        if codegen_state.pregenerated_subkernels is not None:
+            codegen_result = codegen_state.pregenerated_subkernels.get(
+                    codegen_state, sched_index)
 
-        from loopy.codegen.result import generate_host_or_device_program
-        codegen_result = generate_host_or_device_program(
-                new_codegen_state, sched_index)
+        if codegen_result is None:
+            from loopy.codegen.result import generate_host_or_device_program
+            codegen_result = generate_host_or_device_program(
+                    _get_subkernel_codegen_state(
+                        codegen_state, sched_index, extra_args),
+                    sched_index)
 
         glob_grid, loc_grid = kernel.get_grid_sizes_for_insn_ids_as_exprs(
                 get_insn_ids_for_block_at(kernel.schedule, sched_index))
@@ -321,10 +538,10 @@ def build_loop_nest(codegen_state, schedule_index):
             domain = isl.align_spaces(
                     self.kernel.get_inames_domain(check_inames),
                     self.impl_domain, obj_bigger_ok=True)
-            from loopy.codegen.bounds import get_approximate_convex_bounds_checks
+            from loopy.codegen.bounds import get_bounds_checks
             # Each instruction individually gets its bounds checks,
             # so we can safely overapproximate here.
-            return get_approximate_convex_bounds_checks(domain,
+            return get_bounds_checks(self.kernel, domain,
                     check_inames, self.impl_domain)
 
     def build_insn_group(sched_index_info_entries, codegen_state,
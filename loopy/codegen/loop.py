@@ -22,13 +22,17 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+import six
 from six.moves import range
 
-from loopy.diagnostic import warn, LoopyError
+from loopy.diagnostic import warn, LoopyError, ExpressionNotAffineError
 from loopy.codegen.result import merge_codegen_results
+from loopy.symbolic import CoefficientCollector, WalkMapper
 import islpy as isl
 from islpy import dim_type
 from loopy.codegen.control import build_loop_nest
+from pymbolic import var
+from pymbolic.primitives import Variable
 from pymbolic.mapper.stringifier import PREC_NONE
 
 
@@ -345,8 +349,295 @@ def set_up_hw_parallel_loops(codegen_state, schedule_index, next_func,
 # }}}
 
 
+# {{{ index pointers
+
+class _IndexCoefficientCollector(CoefficientCollector):
+    def handle_unsupported_expression(self, expr, *args, **kwargs):
+        raise ExpressionNotAffineError("cannot gather coefficients of '%s'"
+                % expr)
+
+    map_call = handle_unsupported_expression
+    map_quotient = handle_unsupported_expression
+    map_power = handle_unsupported_expression
+
+
+class _GlobalArrayAccessCollector(WalkMapper):
+    def __init__(self, kernel):
+        self.kernel = kernel
+        self.accesses = []
+
+    def map_subscript(self, expr, *args, **kwargs):
+        from loopy.kernel.data import ArrayArg
+
+        if (isinstance(expr.aggregate, Variable)
+                and isinstance(
+                    self.kernel.arg_dict.get(expr.aggregate.name), ArrayArg)
+                and expr not in self.accesses):
+            self.accesses.append(expr)
+
+        self.rec(expr.index, *args, **kwargs)
+
+
+def _get_linear_global_access(codegen_state, expr):
+    """
+    :returns: *None* if *expr* does not subscript a global array with a
+        single linear offset, or else a tuple ``(array, array_name, offset)``.
+    """
+    from loopy.kernel.data import ArrayArg
+    kernel = codegen_state.kernel
+
+    ary = kernel.arg_dict.get(expr.aggregate.name)
+    if not isinstance(ary, ArrayArg):
+        return None
+
+    from loopy.kernel.array import VectorArrayDimTag
+    if any(isinstance(dim_tag, VectorArrayDimTag)
+            for dim_tag in ary.dim_tags or ()):
+        # The indices along vector axes may only be known once inner loops
+        # are unrolled.
+        return None
+
+    from loopy.symbolic import simplify_using_aff
+    index_tuple = tuple(
+            simplify_using_aff(kernel, idx) for idx in expr.index_tuple)
+
+    from loopy.kernel.array import get_access_info
+    from pymbolic import evaluate
+    access_info = get_access_info(kernel.target, ary, index_tuple,
+            lambda expr: evaluate(expr, codegen_state.var_subst_map),
+            codegen_state.vectorization_info)
+
+    return _get_linear_offset(ary, access_info)
+
+
+def _get_linear_offset(ary, access_info):
+    if len(access_info.subscripts) != 1 or access_info.vector_index is not None:
+        return None
+
+    subscript, = access_info.subscripts
+    return ary, access_info.array_name, subscript
+
+
+def _split_linear_offset(kernel, offset, pointer_inames):
+    """Splits the linear array offset *offset* into the contributions of
+    *pointer_inames* and the rest.
+
+    :returns: *None* if *offset* is not affine in the inames of *kernel* with
+        coefficients that are constant throughout the kernel, or else a tuple
+        ``(coefficients, residual)``, where *coefficients* is a
+        :class:`frozenset` of tuples ``(iname, coefficient)`` for the
+        inames in *pointer_inames* with nonzero coefficients.
+    """
+    try:
+        iname_to_coeff = _IndexCoefficientCollector(kernel.all_inames())(offset)
+    except (ExpressionNotAffineError, RuntimeError):
+        # RuntimeError: nonlinear in the inames
+        return None
+
+    from loopy.kernel.data import ValueArg
+    invariant_names = (
+            set(arg.name for arg in kernel.args if isinstance(arg, ValueArg))
+            - kernel.get_written_variables())
+
+    from loopy.symbolic import get_dependencies
+    from pymbolic.primitives import flattened_sum
+
+    coefficients = set()
+    residual = []
+    for iname_var, coeff in six.iteritems(iname_to_coeff):
+        if not isinstance(iname_var, Variable):
+            residual.append(coeff)
+        elif iname_var.name in pointer_inames:
+            if not get_dependencies(coeff) <= invariant_names:
+                return None
+            if coeff != 0:
+                coefficients.add((iname_var.name, coeff))
+        else:
+            residual.append(coeff*iname_var)
+
+    return frozenset(coefficients), flattened_sum(residual)
+
+
+def find_index_pointer(codegen_state, ary, access_info):
+    """
+    :returns: *None* if there is no pointer from
+        :attr:`loopy.codegen.CodeGenerationState.index_pointer_info` for the
+        access described by *access_info*, or else a tuple
+        ``(pointer_name, offset)``, where *offset* is the offset of the access
+        relative to the pointer.
+    """
+    info = codegen_state.index_pointer_info
+    if info is None or codegen_state.vectorization_info is not None:
+        return None
+
+    from loopy.kernel.data import ArrayArg
+    if not isinstance(ary, ArrayArg):
+        return None
+
+    linear_access = _get_linear_offset(ary, access_info)
+    if linear_access is None:
+        return None
+
+    _, array_name, offset = linear_access
+
+    split = _split_linear_offset(codegen_state.kernel, offset, info.inames)
+    if split is None:
+        return None
+
+    coefficients, residual = split
+
+    pointer_name = info.pointers.get((array_name, coefficients))
+    if pointer_name is None:
+        return None
+
+    return pointer_name, residual
+
+
+def _get_index_pointers(codegen_state, sched_index, lbound):
+    """Finds the pointers into global arrays needed in the body of the loop
+    at *sched_index*.
+
+    :returns: a tuple ``(index_pointer_info, initializers, increments)``,
+        where *index_pointer_info* is the
+        :class:`loopy.codegen.IndexPointerInfo` for the loop body,
+        *initializers* is a list of tuples ``(name, array, base, offset)``
+        for the pointers to set up ahead of the loop, and *increments* is a
+        list of tuples ``(name, increment)``.
+    """
+    kernel = codegen_state.kernel
+    loop_iname = kernel.schedule[sched_index].iname
+
+    from loopy.codegen import IndexPointerInfo
+
+    old_info = codegen_state.index_pointer_info
+    if old_info is None:
+        # Hardware-parallel inames are fixed throughout the loop nest, so
+        # their contributions are folded into the pointers as well.
+        from loopy.kernel.data import HardwareConcurrentTag
+        old_info = IndexPointerInfo(
+                inames=frozenset(
+                    iname for iname in kernel.all_inames()
+                    if kernel.iname_tags_of_type(iname, HardwareConcurrentTag)),
+                pointers={})
+
+    pointer_inames = old_info.inames | frozenset([loop_iname])
+    pointers = old_info.pointers.copy()
+
+    from loopy.kernel.instruction import MultiAssignmentBase
+    from loopy.schedule import get_insn_ids_for_block_at
+
+    collector = _GlobalArrayAccessCollector(kernel)
+    for insn_id in sorted(get_insn_ids_for_block_at(kernel.schedule, sched_index)):
+        insn = kernel.id_to_insn[insn_id]
+        if not isinstance(insn, MultiAssignmentBase):
+            continue
+
+        for expr in (insn.assignees + (insn.expression,)
+                + tuple(insn.predicates)):
+            collector(expr)
+
+    initializers = []
+    increments = []
+
+    for expr in collector.accesses:
+        linear_access = _get_linear_global_access(codegen_state, expr)
+        if linear_access is None:
+            continue
+
+        ary, array_name, offset = linear_access
+        split = _split_linear_offset(kernel, offset, pointer_inames)
+        if split is None:
+            continue
+
+        coefficients, _ = split
+        loop_coeff = dict(coefficients).get(loop_iname)
+        if loop_coeff is None or (array_name, coefficients) in pointers:
+            continue
+
+        outer_coefficients = frozenset(
+                (iname, coeff) for iname, coeff in coefficients
+                if iname != loop_iname)
+
+        base = old_info.pointers.get((array_name, outer_coefficients))
+        if base is not None:
+            base_offset = loop_coeff*lbound
+        else:
+            from pymbolic.primitives import flattened_sum
+            base = array_name
+            base_offset = flattened_sum(
+                    [coeff*var(iname) for iname, coeff in outer_coefficients]
+                    + [loop_coeff*lbound])
+
+        name = codegen_state.var_name_generator(
+                "%s_%s_ptr" % (array_name, loop_iname))
+        pointers[array_name, coefficients] = name
+        initializers.append((name, ary, base, base_offset))
+        increments.append((name, loop_coeff))
+
+    return (
+            IndexPointerInfo(inames=pointer_inames, pointers=pointers),
+            initializers, increments)
+
+# }}}
+
+
 # {{{ sequential loop
 
+def _get_sequential_loop_bounds(domain, slab, assumptions, loop_iname,
+        usable_inames, implemented_domain):
+    """
+    :returns: a tuple ``(dom_and_slab, moved_inames, lbound, ubound)``, where
+        *dom_and_slab* is the intersection of *domain*, *slab* and
+        *assumptions*, with the inames in *usable_inames* moved to parameters
+        (as listed in *moved_inames*), and *lbound* and *ubound* are the
+        bounds of *loop_iname* in it.
+    """
+    aligned_domain = isl.align_spaces(domain, slab, obj_bigger_ok=True)
+
+    dom_and_slab = aligned_domain & slab
+
+    assumptions_non_param = isl.BasicSet.from_params(assumptions)
+    dom_and_slab, assumptions_non_param = isl.align_two(
+            dom_and_slab, assumptions_non_param)
+    dom_and_slab = dom_and_slab & assumptions_non_param
+
+    # move inames that are usable into parameters
+    moved_inames = []
+    for das_iname in sorted(dom_and_slab.get_var_names(dim_type.set)):
+        if das_iname in usable_inames:
+            moved_inames.append(das_iname)
+            dt, idx = dom_and_slab.get_var_dict()[das_iname]
+            dom_and_slab = dom_and_slab.move_dims(
+                    dim_type.param, dom_and_slab.dim(dim_type.param),
+                    dt, idx, 1)
+
+    _, loop_iname_idx = dom_and_slab.get_var_dict()[loop_iname]
+
+    impl_domain = isl.align_spaces(
+        implemented_domain,
+        dom_and_slab,
+        obj_bigger_ok=True
+        ).params()
+
+    # Set operation caches are shared between kernels, so a fresh cache
+    # manager is as good as that of any kernel.
+    from loopy.kernel.tools import SetOperationCacheManager
+    cache_manager = SetOperationCacheManager()
+
+    lbound = (
+            cache_manager.dim_min(dom_and_slab, loop_iname_idx)
+            .gist(assumptions)
+            .gist(impl_domain)
+            .coalesce())
+    ubound = (
+            cache_manager.dim_max(dom_and_slab, loop_iname_idx)
+            .gist(assumptions)
+            .gist(impl_domain)
+            .coalesce())
+
+    return dom_and_slab, tuple(moved_inames), lbound, ubound
+
+
 def generate_sequential_loop_dim_code(codegen_state, sched_index):
     kernel = codegen_state.kernel
 
@@ -370,45 +661,13 @@ def generate_sequential_loop_dim_code(codegen_state, sched_index):
 
         # {{{ find bounds
 
-        aligned_domain = isl.align_spaces(domain, slab, obj_bigger_ok=True)
-
-        dom_and_slab = aligned_domain & slab
-
-        assumptions_non_param = isl.BasicSet.from_params(kernel.assumptions)
-        dom_and_slab, assumptions_non_param = isl.align_two(
-                dom_and_slab, assumptions_non_param)
-        dom_and_slab = dom_and_slab & assumptions_non_param
-
-        # move inames that are usable into parameters
-        moved_inames = []
-        for das_iname in sorted(dom_and_slab.get_var_names(dim_type.set)):
-            if das_iname in usable_inames:
-                moved_inames.append(das_iname)
-                dt, idx = dom_and_slab.get_var_dict()[das_iname]
-                dom_and_slab = dom_and_slab.move_dims(
-                        dim_type.param, dom_and_slab.dim(dim_type.param),
-                        dt, idx, 1)
-
-        _, loop_iname_idx = dom_and_slab.get_var_dict()[loop_iname]
-
-        impl_domain = isl.align_spaces(
-            codegen_state.implemented_domain,
-            dom_and_slab,
-            obj_bigger_ok=True
-            ).params()
-
-        lbound = (
-                kernel.cache_manager.dim_min(
-                    dom_and_slab, loop_iname_idx)
-                .gist(kernel.assumptions)
-                .gist(impl_domain)
-                .coalesce())
-        ubound = (
-            kernel.cache_manager.dim_max(
-                dom_and_slab, loop_iname_idx)
-            .gist(kernel.assumptions)
-            .gist(impl_domain)
-            .coalesce())
+        dom_and_slab, moved_inames, lbound, ubound = \
+                kernel.cache_manager.op(
+                    domain, "sequential_loop_bounds",
+                    _get_sequential_loop_bounds,
+                    (slab, kernel.assumptions, loop_iname,
+                        frozenset(usable_inames),
+                        codegen_state.implemented_domain))
 
         # }}}
 
@@ -439,6 +698,27 @@ def generate_sequential_loop_dim_code(codegen_state, sched_index):
                 .copy(kernel=intersect_kernel_with_slab(
                     kernel, slab, loop_iname)))
 
+        astb = codegen_state.ast_builder
+
+        from loopy.symbolic import pw_aff_to_expr
+        from loopy.isl_helpers import simplify_pw_aff
+
+        is_single_trip = impl_ubound.is_equal(impl_lbound)
+        loop_lbound = pw_aff_to_expr(simplify_pw_aff(lbound, kernel.assumptions))
+
+        pointer_initializers = []
+        pointer_increments = []
+        if (kernel.options.strength_reduce_indices
+                and not is_single_trip
+                and codegen_state.is_generating_device_code
+                and codegen_state.vectorization_info is None
+                and astb.can_implement_index_pointers):
+            index_pointer_info, pointer_initializers, pointer_increments = \
+                    _get_index_pointers(new_codegen_state, sched_index,
+                            loop_lbound)
+            new_codegen_state = new_codegen_state.copy(
+                    index_pointer_info=index_pointer_info)
+
         inner = build_loop_nest(new_codegen_state, sched_index+1)
 
         # }}}
@@ -446,11 +726,7 @@ def generate_sequential_loop_dim_code(codegen_state, sched_index):
         if cmt is not None:
             result.append(codegen_state.ast_builder.emit_comment(cmt))
 
-        astb = codegen_state.ast_builder
-
-        from loopy.symbolic import pw_aff_to_expr
-
-        if impl_ubound.is_equal(impl_lbound):
+        if is_single_trip:
             # single-trip, generate just a variable assignment, not a loop
             inner = merge_codegen_results(codegen_state, [
                 astb.emit_initializer(
@@ -470,16 +746,23 @@ def generate_sequential_loop_dim_code(codegen_state, sched_index):
         else:
             inner_ast = inner.current_ast(codegen_state)
 
-            from loopy.isl_helpers import simplify_pw_aff
+            for name, ary, base, base_offset in pointer_initializers:
+                if base_offset != 0:
+                    base = "%s + %s" % (
+                            base, ecm(base_offset, PREC_NONE, "i"))
+
+                result.append(astb.emit_index_pointer_initializer(
+                    codegen_state, name, ary.dtype,
+                    ary.name in kernel.get_written_variables(), base))
 
             result.append(
                 inner.with_new_ast(
                     codegen_state,
                     astb.emit_sequential_loop(
                         codegen_state, loop_iname, kernel.index_dtype,
-                        pw_aff_to_expr(simplify_pw_aff(lbound, kernel.assumptions)),
+                        loop_lbound,
                         pw_aff_to_expr(simplify_pw_aff(ubound, kernel.assumptions)),
-                        inner_ast)))
+                        inner_ast, pointer_increments=pointer_increments)))
 
     return merge_codegen_results(codegen_state, result)
 
@@ -43,6 +43,65 @@ def process_preambles(preambles):
             for lines in dedup_preambles]
 
 
+def write_ast(outf, ast):
+    """Write ``str(ast)`` to the file-like *outf* line by line, without
+    building the entire string in memory.
+    """
+    if not hasattr(ast, "generate"):
+        outf.write(str(ast))
+        return
+
+    first = True
+    for line in ast.generate():
+        if not first:
+            outf.write("\n")
+        outf.write(line.rstrip())
+        first = False
+
+
+class _HashingWriter(object):
+    def __init__(self, outf):
+        import hashlib
+        self.outf = outf
+        self.checksum = hashlib.sha256()
+
+    def write(self, s):
+        self.checksum.update(s.encode("utf-8"))
+        self.outf.write(s)
+
+
+def write_code_to_store(write_code, directory, suffix):
+    """Store the code written by *write_code* in a file in *directory*
+    named after the hash of its content.
+
+    :arg write_code: a function receiving a file-like object, e.g.
+        :meth:`CodeGenerationResult.write_all_code`.
+    :arg suffix: the file name extension, e.g. ``"c"``.
+    :returns: the path of the file
+    """
+    import os
+    import tempfile
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as outf:
+            hashing_outf = _HashingWriter(outf)
+            write_code(hashing_outf)
+
+        path = os.path.join(directory, "%s.%s" % (
+            hashing_outf.checksum.hexdigest(), suffix))
+
+        # atomic, and replacing a file by one with identical content is
+        # harmless
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    return path
+
+
 __doc__ = """
 .. currentmodule:: loopy.codegen.result
 
@@ -50,6 +109,12 @@ __doc__ = """
 
 .. autoclass:: CodeGenerationResult
 
+.. autoclass:: CompactCodeGenerationResult
+
+.. autofunction:: write_ast
+
+.. autofunction:: write_code_to_store
+
 .. autofunction:: merge_codegen_results
 
 .. autofunction:: generate_host_or_device_program
@@ -96,6 +161,10 @@ class CodeGenerationResult(ImmutableRecord):
     .. automethod:: host_code
     .. automethod:: device_code
     .. automethod:: all_code
+    .. automethod:: write_host_code
+    .. automethod:: write_device_code
+    .. automethod:: write_all_code
+    .. automethod:: get_compact_result
 
     .. attribute:: implemented_data_info
 
@@ -156,6 +225,67 @@ class CodeGenerationResult(ImmutableRecord):
                 + "\n\n"
                 + str(self.host_program.ast))
 
+    # {{{ streaming code output
+
+    def write_host_code(self, outf):
+        """Write the code returned by :meth:`host_code` to the file-like
+        *outf*, piece by piece.
+        """
+        for preamble_code in process_preambles(
+                getattr(self, "host_preambles", [])):
+            outf.write(preamble_code)
+
+        write_ast(outf, self.host_program.ast)
+
+    def _write_device_programs(self, outf):
+        for i, dp in enumerate(self.device_programs):
+            if i:
+                outf.write("\n\n")
+            write_ast(outf, dp.ast)
+
+    def write_device_code(self, outf):
+        """Write the code returned by :meth:`device_code` to the file-like
+        *outf*, piece by piece.
+        """
+        for preamble_code in process_preambles(
+                getattr(self, "device_preambles", [])):
+            outf.write(preamble_code)
+
+        outf.write("\n")
+        self._write_device_programs(outf)
+
+    def write_all_code(self, outf):
+        """Write the code returned by :meth:`all_code` to the file-like
+        *outf*, piece by piece.
+        """
+        for preamble_code in process_preambles(
+                getattr(self, "host_preambles", [])
+                + getattr(self, "device_preambles", [])):
+            outf.write(preamble_code)
+
+        outf.write("\n")
+        self._write_device_programs(outf)
+        outf.write("\n\n")
+        write_ast(outf, self.host_program.ast)
+
+    # }}}
+
+    def get_compact_result(self):
+        """
+        :returns: a :class:`CompactCodeGenerationResult` for this result.
+        """
+        def strip_ast(prg):
+            return GeneratedProgram(
+                    name=prg.name,
+                    is_device_program=prg.is_device_program)
+
+        return CompactCodeGenerationResult(
+                host_program=strip_ast(self.host_program),
+                device_programs=[strip_ast(dp) for dp in self.device_programs],
+                implemented_data_info=self.implemented_data_info,
+                host_code_str=self.host_code(),
+                device_code_str=self.device_code())
+
     def current_program(self, codegen_state):
         if codegen_state.is_generating_device_code:
             if self.device_programs:
@@ -198,6 +328,42 @@ class CodeGenerationResult(ImmutableRecord):
                 self.current_program(codegen_state).copy(
                     ast=new_ast))
 
+
+class CompactCodeGenerationResult(ImmutableRecord):
+    """The part of a :class:`CodeGenerationResult` needed to build and
+    invoke the generated code: the code as text and the argument layout. In
+    contrast to a full result, it contains no ASTs and no
+    :attr:`CodeGenerationResult.implemented_domains`, making it cheap to store
+    and unpickle.
+
+    .. attribute:: host_program
+    .. attribute:: device_programs
+
+        :class:`GeneratedProgram` instances without an
+        :attr:`~GeneratedProgram.ast`, i.e. only carrying names.
+
+    .. attribute:: implemented_data_info
+    .. attribute:: host_code_str
+    .. attribute:: device_code_str
+
+    .. automethod:: host_code
+    .. automethod:: device_code
+    .. automethod:: write_host_code
+    .. automethod:: write_device_code
+    """
+
+    def host_code(self):
+        return self.host_code_str
+
+    def device_code(self):
+        return self.device_code_str
+
+    def write_host_code(self, outf):
+        outf.write(self.host_code_str)
+
+    def write_device_code(self, outf):
+        outf.write(self.device_code_str)
+
 # }}}
 
 
@@ -583,6 +583,120 @@ def dim_max_with_elimination(obj, idx):
 # }}}
 
 
+# {{{ box sets
+
+def is_box_set(set):
+    """Return *True* if *set* is a :class:`islpy.BasicSet` without
+    existentially quantified variables in which each constraint involves at
+    most one set dimension, with a coefficient of 1 or -1. In other words,
+    return whether *set* is a product of (parametric) intervals.
+    """
+    if not isinstance(set, isl.BasicSet) or set.dim(dim_type.div):
+        return False
+
+    nset = set.dim(dim_type.set)
+    for cns in set.get_constraints():
+        set_coeffs = [
+                coeff
+                for coeff in (
+                    cns.get_coefficient_val(dim_type.set, i).to_python()
+                    for i in range(nset))
+                if coeff]
+
+        if len(set_coeffs) > 1 or (set_coeffs and abs(set_coeffs[0]) != 1):
+            return False
+
+    return True
+
+
+def _get_constraint_param_aff(cns, zero):
+    """Return the part of *cns* not involving set dimensions as an
+    :class:`islpy.Aff` on the parameter domain of *zero*.
+    """
+    result = zero.set_constant_val(cns.get_constant_val())
+    for i in range(zero.dim(dim_type.param)):
+        result = result.set_coefficient_val(
+                dim_type.param, i,
+                cns.get_coefficient_val(dim_type.param, i))
+
+    return result
+
+
+def get_box_param_set(bset):
+    """For a *bset* for which :func:`is_box_set` holds, return the
+    :class:`islpy.Set` of parameter values allowed by the constraints of
+    *bset* that involve no set dimension. These constraints are not
+    reflected in the bounds returned by :func:`get_box_dim_bound_affs`.
+    """
+    zero = isl.Aff.zero_on_domain(isl.LocalSpace.from_space(bset.space.params()))
+
+    result = isl.Set.universe(bset.space.params())
+    for cns in bset.get_constraints():
+        if cns.involves_dims(dim_type.set, 0, bset.dim(dim_type.set)):
+            continue
+
+        aff = _get_constraint_param_aff(cns, zero)
+        if cns.is_equality():
+            result = result & aff.eq_set(zero)
+        else:
+            result = result & aff.ge_set(zero)
+
+    return result
+
+
+def get_box_dim_bound_affs(bset, idx):
+    """For a *bset* for which :func:`is_box_set` holds, return a tuple
+    ``(lower_affs, upper_affs)`` of lists of :class:`islpy.Aff` instances on
+    the parameter domain of *bset*. Set dimension *idx* of *bset* is bounded
+    below by the maximum of *lower_affs* and above by the minimum of
+    *upper_affs*.
+    """
+    zero = isl.Aff.zero_on_domain(isl.LocalSpace.from_space(bset.space.params()))
+
+    lower_affs = []
+    upper_affs = []
+    for cns in bset.get_constraints():
+        coeff = cns.get_coefficient_val(dim_type.set, idx).to_python()
+        if not coeff:
+            continue
+
+        # cns is 'coeff*x + rest >= 0' (or '== 0'), where coeff is 1 or -1
+        rest = _get_constraint_param_aff(cns, zero)
+        bound = -rest if coeff > 0 else rest
+
+        if cns.is_equality() or coeff > 0:
+            lower_affs.append(bound)
+        if cns.is_equality() or coeff < 0:
+            upper_affs.append(bound)
+
+    return lower_affs, upper_affs
+
+
+def get_box_dim_bounds(lower_affs, upper_affs, context=None):
+    """Return a tuple ``(lower, upper)`` of :class:`islpy.PwAff` instances
+    bounding a dimension of a box set, given the bounds obtained from
+    :func:`get_box_dim_bound_affs`. *lower* and *upper* are only defined
+    where *lower* does not exceed *upper* (and within *context*, a parameter
+    set, if given). Return *None* if the dimension is unbounded.
+    """
+    if not lower_affs or not upper_affs:
+        return None
+
+    from functools import reduce
+    lower = reduce(isl.PwAff.max, [isl.PwAff.from_aff(aff) for aff in lower_affs])
+    upper = reduce(isl.PwAff.min, [isl.PwAff.from_aff(aff) for aff in upper_affs])
+
+    nonempty = lower.le_set(upper)
+    if context is not None:
+        nonempty = nonempty & context.align_params(nonempty.space)
+
+    return (
+            lower.intersect_domain(nonempty).coalesce(),
+            upper.intersect_domain(nonempty).coalesce())
+
+# }}}
+
+
 # {{{ get_simple_strides
 
 def get_simple_strides(bset, key_by="name"):
@@ -96,6 +96,69 @@ class _UniqueVarNameGenerator(UniqueNameGenerator):
 # }}}
 
 
+def _intersect_domain_with_assumptions(domain, assumptions):
+    aligned_assumptions, domain = isl.align_two(assumptions, domain)
+    return aligned_assumptions & domain
+
+
+# {{{ field-aware memoization
+
+# maps method names to the kernel fields their results are derived from
+_DERIVED_DATA_FIELD_DEPS = {}
+
+_NOT_PRESENT = object()
+
+# The domain tree depends on which instructions write to temporaries that
+# are used as loop bounds.
+_DOMAIN_TREE_FIELDS = ("domains", "instructions", "temporary_variables")
+
+# Container fields whose sizes are recorded upon kernel creation, to detect
+# (unsupported, but occasionally practiced) in-place modification.
+_SIZED_KERNEL_FIELDS = (
+        "domains", "instructions", "args", "temporary_variables",
+        "substitutions")
+
+
+def memoize_on_kernel_fields(*field_names):
+    """Like :func:`pytools.memoize_method`, but additionally records that the
+    result of the decorated :class:`LoopKernel` method only depends on the
+    kernel fields *field_names*. :meth:`LoopKernel.copy` carries memoized
+    results over to the new kernel if none of these fields changed.
+    """
+    field_names = frozenset(field_names)
+
+    def decorator(method):
+        name = method.__name__
+        _DERIVED_DATA_FIELD_DEPS[name] = field_names
+
+        def wrapper(self, *args, **kwargs):
+            if kwargs:
+                key = (name, args, frozenset(six.iteritems(kwargs)))
+            else:
+                key = (name, args)
+
+            try:
+                return self._derived_data_cache[key]
+            except KeyError:
+                pass
+
+            # Results carried over by LoopKernel.copy are only used if the
+            # kernel was not modified in place since its creation.
+            result = self._carried_derived_data.pop(key, _NOT_PRESENT)
+            if result is _NOT_PRESENT or self._has_resized_fields(field_names):
+                result = method(self, *args, **kwargs)
+
+            self._derived_data_cache[key] = result
+            return result
+
+        from functools import update_wrapper
+        return update_wrapper(wrapper, method)
+
+    return decorator
+
+# }}}
+
+
 # {{{ loop kernel object
 
 class _deprecated_KernelState_SCHEDULED(object):  # noqa
@@ -413,6 +476,44 @@ class LoopKernel(ImmutableRecordWithoutPickling):
                 _cached_written_variables=_cached_written_variables)
 
         self._kernel_executor_cache = {}
+        self._init_derived_data_cache()
+
+    def _init_derived_data_cache(self):
+        self._derived_data_cache = {}
+        self._carried_derived_data = {}
+        self._field_sizes = dict(
+                (field_name, len(getattr(self, field_name)))
+                for field_name in _SIZED_KERNEL_FIELDS
+                if getattr(self, field_name, None) is not None)
+
+    def _has_resized_fields(self, field_names):
+        return any(
+                len(getattr(self, field_name)) != self._field_sizes[field_name]
+                for field_name in field_names
+                if field_name in self._field_sizes)
+
+    def copy(self, **kwargs):
+        result = super(LoopKernel, self).copy(**kwargs)
+
+        # {{{ carry over memoized data whose underlying fields are unchanged
+
+        if self._derived_data_cache or self._carried_derived_data:
+            changed_fields = set(
+                    field_name for field_name in self.__class__.fields
+                    if getattr(self, field_name, None)
+                    is not getattr(result, field_name, None))
+            changed_fields.update(
+                    field_name for field_name in self._field_sizes
+                    if self._has_resized_fields((field_name,)))
+
+            for cache in [self._carried_derived_data, self._derived_data_cache]:
+                for key, value in six.iteritems(cache):
+                    if not (_DERIVED_DATA_FIELD_DEPS[key[0]] & changed_fields):
+                        result._carried_derived_data[key] = value
+
+        # }}}
+
+        return result
 
     # }}}
 
@@ -477,12 +578,13 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
     # {{{ name wrangling
 
-    @memoize_method
+    @memoize_on_kernel_fields("args", "temporary_variables")
     def non_iname_variable_names(self):
         return (set(six.iterkeys(self.arg_dict))
                 | set(six.iterkeys(self.temporary_variables)))
 
-    @memoize_method
+    @memoize_on_kernel_fields(
+            "domains", "args", "temporary_variables", "substitutions")
     def all_variable_names(self, include_temp_storage=True):
         return (
                 set(six.iterkeys(self.temporary_variables))
@@ -537,7 +639,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
         raise ValueError("nothing known about variable '%s'" % name)
 
     @property
-    @memoize_method
+    @memoize_on_kernel_fields("instructions")
     def id_to_insn(self):
         return dict((insn.id, insn) for insn in self.instructions)
 
@@ -545,7 +647,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
     # {{{ domain wrangling
 
-    @memoize_method
+    @memoize_on_kernel_fields(*_DOMAIN_TREE_FIELDS)
     def parents_per_domain(self):
         """Return a list corresponding to self.domains (by index)
         containing domain indices which are nested around this
@@ -609,7 +711,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
         return result
 
-    @memoize_method
+    @memoize_on_kernel_fields(*_DOMAIN_TREE_FIELDS)
     def all_parents_per_domain(self):
         """Return a list corresponding to self.domains (by index)
         containing domain indices which are nested around this
@@ -632,7 +734,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
         return result
 
-    @memoize_method
+    @memoize_on_kernel_fields("domains")
     def _get_home_domain_map(self):
         return dict(
                 (iname, i_domain)
@@ -649,7 +751,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
         assert False
 
-    @memoize_method
+    @memoize_on_kernel_fields("domains")
     def combine_domains(self, domains):
         """
         :arg domains: domain indices of domains to be combined. More 'dominant'
@@ -662,17 +764,8 @@ class LoopKernel(ImmutableRecordWithoutPickling):
             return isl.BasicSet.universe(isl.Space.set_alloc(
                 self.isl_context, 0, 0))
 
-        result = None
-        for dom_index in domains:
-            dom = self.domains[dom_index]
-            if result is None:
-                result = dom
-            else:
-                aligned_dom, aligned_result = isl.align_two(
-                        dom, result)
-                result = aligned_result & aligned_dom
-
-        return result
+        return self.cache_manager.combine(
+                tuple(self.domains[dom_index] for dom_index in domains))
 
     def get_inames_domain(self, inames):
         if not inames:
@@ -688,7 +781,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
         return self._get_inames_domain_backend(inames)
 
-    @memoize_method
+    @memoize_on_kernel_fields(*_DOMAIN_TREE_FIELDS)
     def get_leaf_domain_indices(self, inames):
         """Find the leaves of the domain tree needed to cover all inames.
 
@@ -734,7 +827,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
         return list(root_to_leaf.values())
 
-    @memoize_method
+    @memoize_on_kernel_fields(*_DOMAIN_TREE_FIELDS)
     def _get_inames_domain_backend(self, inames):
         domain_indices = set()
         for leaf_dom_idx in self.get_leaf_domain_indices(inames):
@@ -767,7 +860,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
                 self.iname_to_tags.get(iname, frozenset()),
                 tag_type_or_types, max_num=max_num, min_num=min_num)
 
-    @memoize_method
+    @memoize_on_kernel_fields("domains")
     def all_inames(self):
         result = set()
         for dom in self.domains:
@@ -775,7 +868,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
                     intern(n) for n in dom.get_var_names(dim_type.set))
         return frozenset(result)
 
-    @memoize_method
+    @memoize_on_kernel_fields("domains")
     def all_params(self):
         all_inames = self.all_inames()
 
@@ -799,7 +892,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
         from loopy.tools import intern_frozenset_of_ids
         return intern_frozenset_of_ids(all_params-all_inames)
 
-    @memoize_method
+    @memoize_on_kernel_fields("instructions")
     def all_insn_inames(self):
         """Return a mapping from instruction ids to inames inside which
         they should be run.
@@ -810,7 +903,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
         return result
 
-    @memoize_method
+    @memoize_on_kernel_fields("instructions")
     def all_referenced_inames(self):
         result = set()
         for inames in six.itervalues(self.all_insn_inames()):
@@ -822,7 +915,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
             insn = self.id_to_insn[insn]
         return insn.within_inames
 
-    @memoize_method
+    @memoize_on_kernel_fields("domains", "instructions")
     def iname_to_insns(self):
         result = dict(
                 (iname, set()) for iname in self.all_inames())
@@ -832,7 +925,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
         return result
 
-    @memoize_method
+    @memoize_on_kernel_fields("iname_to_tags")
     def _remove_inames_for_shared_hw_axes(self, cond_inames):
         """
         See if cond_inames contains references to two (or more) inames that
@@ -887,7 +980,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
     # {{{ dependency wrangling
 
-    @memoize_method
+    @memoize_on_kernel_fields("instructions")
     def recursive_insn_dep_map(self):
         """Returns a :class:`dict` mapping an instruction IDs *a*
         to all instruction IDs it directly or indirectly depends
@@ -920,7 +1013,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
     # {{{ read and written variables
 
-    @memoize_method
+    @memoize_on_kernel_fields("instructions", "args", "temporary_variables")
     def reader_map(self):
         """
         :return: a dict that maps variable names to ids of insns that read that
@@ -938,7 +1031,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
         return result
 
-    @memoize_method
+    @memoize_on_kernel_fields("instructions")
     def writer_map(self):
         """
         :return: a dict that maps variable names to ids of insns that write
@@ -952,14 +1045,14 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
         return result
 
-    @memoize_method
+    @memoize_on_kernel_fields("instructions")
     def get_read_variables(self):
         result = set()
         for insn in self.instructions:
             result.update(insn.read_dependency_names())
         return result
 
-    @memoize_method
+    @memoize_on_kernel_fields("instructions", "_cached_written_variables")
     def get_written_variables(self):
         if self._cached_written_variables is not None:
             return self._cached_written_variables
@@ -969,7 +1062,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
                 for insn in self.instructions
                 for var_name in insn.assignee_var_names())
 
-    @memoize_method
+    @memoize_on_kernel_fields("temporary_variables")
     def get_temporary_to_base_storage_map(self):
         result = {}
         for tv in six.itervalues(self.temporary_variables):
@@ -978,7 +1071,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
         return result
 
-    @memoize_method
+    @memoize_on_kernel_fields("instructions", "args", "_cached_written_variables")
     def get_unwritten_value_args(self):
         written_vars = self.get_written_variables()
 
@@ -993,12 +1086,12 @@ class LoopKernel(ImmutableRecordWithoutPickling):
     # {{{ argument wrangling
 
     @property
-    @memoize_method
+    @memoize_on_kernel_fields("args")
     def arg_dict(self):
         return dict((arg.name, arg) for arg in self.args)
 
     @property
-    @memoize_method
+    @memoize_on_kernel_fields("domains", "args")
     def scalar_loop_args(self):
         from loopy.kernel.data import ValueArg
 
@@ -1011,7 +1104,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
             return [arg.name for arg in self.args if isinstance(arg, ValueArg)
                     if arg.name in loop_arg_names]
 
-    @memoize_method
+    @memoize_on_kernel_fields("args", "temporary_variables")
     def global_var_names(self):
         from loopy.kernel.data import AddressSpace
 
@@ -1029,20 +1122,113 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
     # {{{ bounds finding
 
-    @memoize_method
+    @memoize_on_kernel_fields("domains")
+    def _get_box_iname_bound_affs(self):
+        """Return a mapping from inames to tuples ``(lower_affs, upper_affs,
+        nonempty)`` for the inames of rectangular domains whose constraints
+        only involve parameters, not other inames. *lower_affs* and
+        *upper_affs* are as returned by
+        :func:`loopy.isl_helpers.get_box_dim_bound_affs`. *nonempty* is the set
+        of parameter values for which the domain is not empty.
+        """
+        from loopy.isl_helpers import (
+                is_box_set, get_box_param_set, get_box_dim_bound_affs)
+
+        all_inames = self.all_inames()
+
+        result = {}
+        for dom in self.domains:
+            if not is_box_set(dom) or any(
+                    name in all_inames
+                    for name in dom.get_var_names(dim_type.param)):
+                continue
+
+            dom_bound_affs = [
+                    get_box_dim_bound_affs(dom, idx)
+                    for idx in range(dom.dim(dim_type.set))]
+
+            nonempty = get_box_param_set(dom)
+            for lower_affs, upper_affs in dom_bound_affs:
+                for lower_aff in lower_affs:
+                    for upper_aff in upper_affs:
+                        nonempty = nonempty & lower_aff.le_set(upper_aff)
+
+            for iname, (lower_affs, upper_affs) in zip(
+                    dom.get_var_names(dim_type.set), dom_bound_affs):
+                result[iname] = (lower_affs, upper_affs, nonempty)
+
+        return result
+
+    def _get_box_iname_bounds(self, iname, constants_only):
+        """Return a tuple ``(lower_bound_pw_aff, upper_bound_pw_aff, size)``
+        for *iname* as :meth:`get_iname_bounds` would, but without projecting
+        any sets, or *None* if this is not possible.
+        """
+        bound_affs = self._get_box_iname_bound_affs().get(iname)
+        if bound_affs is None:
+            return None
+
+        lower_affs, upper_affs, nonempty = bound_affs
+
+        if constants_only:
+            if any(aff.involves_dims(dim_type.param, 0, aff.dim(dim_type.param))
+                    for aff in lower_affs + upper_affs):
+                return None
+
+            lower_affs, upper_affs = [
+                    [aff.drop_dims(dim_type.param, 0, aff.dim(dim_type.param))
+                        for aff in affs]
+                    for affs in (lower_affs, upper_affs)]
+            assumptions = None
+            context = None
+        else:
+            assumptions = self.cache_manager.project_out_except(
+                    self.assumptions, nonempty.get_var_dict(dim_type.param),
+                    [dim_type.param])
+            context = nonempty & assumptions.align_params(nonempty.space)
+
+        from loopy.isl_helpers import get_box_dim_bounds
+        bounds = get_box_dim_bounds(lower_affs, upper_affs, context=context)
+
+        if bounds is None or bounds[0].domain().is_empty():
+            # unbounded or empty: leave reporting this to the general case
+            return None
+
+        lower_bound_pw_aff, upper_bound_pw_aff = bounds
+        size = (upper_bound_pw_aff - lower_bound_pw_aff + 1)
+        if assumptions is not None:
+            size = size.gist_params(assumptions.align_params(size.space))
+
+        return lower_bound_pw_aff, upper_bound_pw_aff, size
+
+    @memoize_on_kernel_fields(*_DOMAIN_TREE_FIELDS, "assumptions")
     def get_iname_bounds(self, iname, constants_only=False):
-        domain = self.get_inames_domain(frozenset([iname]))
+        class BoundsRecord(ImmutableRecord):
+            pass
 
-        assumptions = self.assumptions.project_out_except(
-                set(domain.get_var_dict(dim_type.param)), [dim_type.param])
+        # rectangular domains do not need the general machinery below
+        box_bounds = self._get_box_iname_bounds(iname, constants_only)
+        if box_bounds is not None:
+            lower_bound_pw_aff, upper_bound_pw_aff, size = box_bounds
+            return BoundsRecord(
+                    lower_bound_pw_aff=lower_bound_pw_aff,
+                    upper_bound_pw_aff=upper_bound_pw_aff,
+                    size=size)
 
-        aligned_assumptions, domain = isl.align_two(assumptions, domain)
+        domain = self.get_inames_domain(frozenset([iname]))
+
+        assumptions = self.cache_manager.project_out_except(
+                self.assumptions,
+                domain.get_var_dict(dim_type.param), [dim_type.param])
 
-        dom_intersect_assumptions = aligned_assumptions & domain
+        dom_intersect_assumptions = self.cache_manager.op(
+                domain, "intersect_assumptions",
+                _intersect_domain_with_assumptions, (assumptions,))
 
         if constants_only:
             # Kill all variable dependencies
-            dom_intersect_assumptions = dom_intersect_assumptions.project_out_except(
+            dom_intersect_assumptions = self.cache_manager.project_out_except(
+                    dom_intersect_assumptions,
                     [iname], [dim_type.param, dim_type.set])
 
         iname_idx = dom_intersect_assumptions.get_var_dict()[iname][1]
@@ -1056,18 +1242,15 @@ class LoopKernel(ImmutableRecordWithoutPickling):
                     dom_intersect_assumptions, iname_idx)
                 .coalesce())
 
-        class BoundsRecord(ImmutableRecord):
-            pass
-
         size = (upper_bound_pw_aff - lower_bound_pw_aff + 1)
-        size = size.gist(assumptions)
+        size = self.cache_manager.gist(size, assumptions)
 
         return BoundsRecord(
                 lower_bound_pw_aff=lower_bound_pw_aff,
                 upper_bound_pw_aff=upper_bound_pw_aff,
                 size=size)
 
-    @memoize_method
+    @memoize_on_kernel_fields(*_DOMAIN_TREE_FIELDS, "assumptions")
     def get_constant_iname_length(self, iname):
         from loopy.isl_helpers import static_max_of_pw_aff
         from loopy.symbolic import aff_to_expr
@@ -1217,7 +1400,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
     # {{{ local memory
 
-    @memoize_method
+    @memoize_on_kernel_fields("temporary_variables")
     def local_var_names(self):
         from loopy.kernel.data import AddressSpace
         return set(
@@ -1235,7 +1418,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
 
     # {{{ nosync sets
 
-    @memoize_method
+    @memoize_on_kernel_fields("instructions")
     def get_nosync_set(self, insn_id, scope):
         assert scope in ("local", "global")
 
@@ -1512,6 +1695,7 @@ class LoopKernel(ImmutableRecordWithoutPickling):
         from loopy.kernel.tools import SetOperationCacheManager
         self.cache_manager = SetOperationCacheManager()
         self._kernel_executor_cache = {}
+        self._init_derived_data_cache()
 
     # }}}
 
@@ -1563,11 +1747,10 @@ class LoopKernel(ImmutableRecordWithoutPickling):
             key_builder.rec(key_hash, getattr(self, field_name))
 
     def __hash__(self):
+        # The key builder caches the digest on the kernel, and that of
+        # each (unchanged, shared) instruction on the instruction.
         from loopy.tools import LoopyKeyBuilder
-        from pytools.persistent_dict import new_hash
-        key_hash = new_hash()
-        self.update_persistent_hash(key_hash, LoopyKeyBuilder())
-        return hash(key_hash.digest())
+        return hash(LoopyKeyBuilder()(self))
 
     def __eq__(self, other):
         if self is other:
@@ -248,6 +248,21 @@ class InstructionBase(ImmutableRecord):
         assert isinstance(groups, frozenset)
         assert isinstance(conflicts_with_groups, frozenset)
 
+        # Share storage for equal sets across instructions (and across
+        # copies of the same instruction). Only sets of strings are shared:
+        # for those, equality implies identity. Predicates, for instance,
+        # may compare equal while differing in type.
+        from loopy.tools import intern_frozenset
+
+        if isinstance(id, str):
+            id = intern(id)
+        if depends_on is not None:
+            depends_on = intern_frozenset(depends_on)
+        groups = intern_frozenset(groups)
+        conflicts_with_groups = intern_frozenset(conflicts_with_groups)
+        within_inames = intern_frozenset(within_inames)
+        tags = intern_frozenset(tags)
+
         ImmutableRecord.__init__(self,
                 id=id,
                 depends_on=depends_on,
@@ -400,7 +415,7 @@ class InstructionBase(ImmutableRecord):
     def __setstate__(self, val):
         super(InstructionBase, self).__setstate__(val)
 
-        from loopy.tools import intern_frozenset_of_ids
+        from loopy.tools import intern_frozenset, intern_frozenset_of_ids
 
         if self.id is not None:  # pylint:disable=access-member-before-definition
             self.id = intern(self.id)
@@ -410,6 +425,7 @@ class InstructionBase(ImmutableRecord):
                 intern_frozenset_of_ids(self.conflicts_with_groups))
         self.within_inames = (
                 intern_frozenset_of_ids(self.within_inames))
+        self.tags = intern_frozenset(self.tags)
 
 # }}}
 
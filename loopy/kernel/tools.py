@@ -298,23 +298,142 @@ def find_all_insn_inames(kernel):
 
 # {{{ set operation cache
 
+def _is_isl_object(obj):
+    return hasattr(obj, "plain_is_equal")
+
+
+def _isl_object_hash(obj):
+    # Not all islpy types hash by value, so use isl's hash where available
+    # and fall back to the string representation.
+    get_hash = getattr(obj, "get_hash", None)
+    if get_hash is not None:
+        return hash((get_hash(), _isl_dim_names(obj)))
+    else:
+        return hash(str(obj))
+
+
+def _isl_dim_names(obj):
+    # isl's hash and plain_is_equal disregard dimension names.
+    return tuple(sorted(
+        (name, int(dt), idx)
+        for name, (dt, idx) in six.iteritems(obj.get_var_dict())))
+
+
+def _isl_objects_equal(a, b):
+    return (type(a) is type(b)
+            and a.plain_is_equal(b)
+            and _isl_dim_names(a) == _isl_dim_names(b))
+
+
+def _set_op_arg_hash(arg):
+    if isinstance(arg, tuple):
+        return tuple(_set_op_arg_hash(arg_i) for arg_i in arg)
+    if _is_isl_object(arg):
+        return _isl_object_hash(arg)
+    return hash(arg)
+
+
+def _set_op_args_equal(a, b):
+    if isinstance(a, tuple):
+        return (
+                isinstance(b, tuple)
+                and len(a) == len(b)
+                and all(_set_op_args_equal(a_i, b_i) for a_i, b_i in zip(a, b)))
+
+    if _is_isl_object(a):
+        return _isl_objects_equal(a, b)
+
+    return type(a) is type(b) and a == b
+
+
+class _SetOperationLRUCache(object):
+    """A bounded, least-recently-used cache of the results of operations on
+    :mod:`islpy` sets. Sets (and :mod:`islpy` arguments) are compared using
+    their hash and :meth:`islpy.BasicSet.plain_is_equal`.
+    """
+
+    def __init__(self, max_size):
+        from collections import OrderedDict
+        self.max_size = max_size
+
+        # mapping: (op_name, hash of set and args) -> [(set, args, result)]
+        self.buckets = OrderedDict()
+        self.nentries = 0
+
+    def get_or_compute(self, set, op_name, op, args):
+        key = (op_name, _isl_object_hash(set), _set_op_arg_hash(args))
+
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = []
+        else:
+            self.buckets.move_to_end(key)
+
+            for bkt_set, bkt_args, result in bucket:
+                if (_isl_objects_equal(set, bkt_set)
+                        and _set_op_args_equal(args, bkt_args)):
+                    return result
+
+        result = op(set, *args)
+
+        bucket.append((set, args, result))
+        self.nentries += 1
+
+        while self.nentries > self.max_size and len(self.buckets) > 1:
+            _, evicted_bucket = self.buckets.popitem(last=False)
+            self.nentries -= len(evicted_bucket)
+
+        return result
+
+    def clear(self):
+        self.buckets.clear()
+        self.nentries = 0
+
+
+# Shared by all kernels (and all copies of a kernel), so that
+# transformed kernels whose domains did not change reuse earlier results.
+_SET_OPERATION_CACHE = _SetOperationLRUCache(max_size=2**14)
+
+
+def _combine_sets(set, *other_sets):
+    result = set
+    for other_set in other_sets:
+        aligned_other_set, aligned_result = isl.align_two(other_set, result)
+        result = aligned_result & aligned_other_set
+
+    return result
+
+
 class SetOperationCacheManager:
+    """Memoizes the results of expensive operations on :mod:`islpy` sets.
+
+    The results are stored in a bounded, process-wide cache, so that they
+    survive copying (and pickling) of kernels.
+    """
+
     def __init__(self):
-        # mapping: set hash -> [(set, op, args, result)]
-        self.cache = {}
+        self.cache = _SET_OPERATION_CACHE
 
     def op(self, set, op_name, op, args):
-        hashval = hash(set)
-        bucket = self.cache.setdefault(hashval, [])
+        return self.cache.get_or_compute(set, op_name, op, tuple(args))
 
-        for bkt_set, bkt_op, bkt_args, result in bucket:
-            if set.plain_is_equal(bkt_set) and op == bkt_op and args == bkt_args:
-                return result
+    def combine(self, sets):
+        """Return the intersection of *sets* (a non-empty :class:`tuple`),
+        aligning the dimensions of each set with the previous intersection.
+        """
+        return self.op(sets[0], "combine", _combine_sets, sets[1:])
 
-        #print op, set.get_dim_name(dim_type.set, args[0])
-        result = op(set, *args)
-        bucket.append((set, op_name, args, result))
-        return result
+    def project_out_except(self, set, names, types):
+        return self.op(set, "project_out_except",
+                lambda set, names, types: set.project_out_except(
+                    list(names), list(types)),
+                (tuple(sorted(names)), tuple(types)))
+
+    def gist(self, set, context):
+        return self.op(set, "gist", type(set).gist, (context,))
+
+    def card(self, set):
+        return self.op(set, "card", type(set).card, ())
 
     def dim_min(self, set, *args):
         if set.plain_is_empty():
@@ -0,0 +1,296 @@
+from __future__ import division, absolute_import
+
+__copyright__ = "Copyright (C) 2020 University of Illinois Board of Trustees"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import six
+
+from islpy import dim_type
+from pytools import ImmutableRecord
+
+from loopy.diagnostic import LoopyError
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+__doc__ = """
+.. currentmodule:: loopy.multiversion
+
+Kernels carrying several versions specialized on properties of their
+:ref:`domain-parameters`, such as divisibility or size. The version to run is
+chosen from the argument values at call time, either by the order in which
+the versions are given or by a model of their run time. Each version is an
+ordinary :class:`loopy.LoopKernel`, so it is compiled and cached
+independently of the others.
+
+The choice is made in Python, before the invoker of the chosen version is
+called, rather than within a single generated invoker. This keeps the
+versions independent of each other and of the invoker generators of the
+targets.
+
+.. autoclass:: KernelVersion
+
+.. autoclass:: MultiVersionedKernel
+"""
+
+
+# {{{ kernel version
+
+class KernelVersion(ImmutableRecord):
+    """
+    .. attribute:: condition
+
+        An :class:`islpy.BasicSet` of parameter values for which
+        :attr:`kernel` may be used, or *None* if it may always be used.
+
+    .. attribute:: kernel
+
+        A :class:`loopy.LoopKernel` whose assumptions include
+        :attr:`condition`.
+    """
+
+    def is_applicable(self, param_values):
+        """
+        :arg param_values: a mapping from names of parameters to their
+            integer values.
+        :returns: whether :attr:`kernel` may be used for *param_values*.
+            This is *False* if a parameter in :attr:`condition` is missing
+            from *param_values*.
+        """
+        if self.condition is None:
+            return True
+
+        s = self.condition
+        for name, (dt, idx) in six.iteritems(s.get_var_dict()):
+            assert dt == dim_type.param
+
+            if not s.involves_dims(dt, idx, 1):
+                continue
+
+            try:
+                value = param_values[name]
+            except KeyError:
+                return False
+
+            s = s.fix_val(dt, idx, int(value))
+
+        return not s.is_empty()
+
+# }}}
+
+
+# {{{ parameter values
+
+def _get_param_values(kernel, param_names, kwargs):
+    """Find the values of *param_names* among the keyword arguments
+    *kwargs* of a call to *kernel*, either passed directly or as an axis
+    length of an array argument.
+    """
+    result = {}
+
+    for name in param_names:
+        value = kwargs.get(name)
+        if value is not None:
+            result[name] = value
+
+    missing = set(param_names) - set(result)
+    if not missing:
+        return result
+
+    from pymbolic.primitives import Variable
+    from loopy.kernel.data import ArrayBase
+
+    for arg in kernel.args:
+        if not missing:
+            break
+
+        if (not isinstance(arg, ArrayBase)
+                or not isinstance(arg.shape, tuple)):
+            continue
+
+        ary = kwargs.get(arg.name)
+        ary_shape = getattr(ary, "shape", None)
+        if ary_shape is None or len(ary_shape) != len(arg.shape):
+            continue
+
+        for axis_len, ary_axis_len in zip(arg.shape, ary_shape):
+            if isinstance(axis_len, Variable) and axis_len.name in missing:
+                result[axis_len.name] = ary_axis_len
+                missing.remove(axis_len.name)
+
+    return result
+
+# }}}
+
+
+# {{{ multi-versioned kernel
+
+class MultiVersionedKernel(object):
+    """A kernel with several versions specialized on conditions on its
+    :ref:`domain-parameters`. Calling it calls a version in :attr:`versions`
+    whose condition holds for the values of the parameters in the call. The
+    last version is the generic one.
+
+    Without a *model*, the order of :attr:`versions` is taken to rank them
+    by speed, and the first applicable version is called. No timing is done,
+    so that ranking is up to the user, who may find it with
+    :func:`loopy.autotune.autotune`. With a *model*, such as one returned by
+    :func:`loopy.perfmodel.get_time_predictor`, the applicable version with
+    the lowest predicted run time is called.
+
+    For example, to avoid the tail of a split loop when ``n`` is divisible
+    by 16::
+
+        mv_knl = MultiVersionedKernel(knl, [
+            ("n mod 16 = 0", lambda knl: lp.split_iname(knl, "i", 16)),
+            ])
+
+    .. attribute:: versions
+
+        A list of :class:`KernelVersion` instances, ordered by preference.
+
+    The version chosen for the values of the parameters is remembered for
+    the *max_memo_size* most recently used parameter values.
+
+    .. automethod:: __init__
+    .. automethod:: get_version
+    .. automethod:: __call__
+    """
+
+    def __init__(self, kernel, specializations, generic_transform=None,
+            max_memo_size=128, model=None):
+        """
+        :arg kernel: a :class:`loopy.LoopKernel`.
+        :arg specializations: a sequence of tuples ``(assumptions,
+            transform)`` in order of preference. *assumptions* is an
+            :class:`islpy.BasicSet` or a string in :ref:`isl-syntax` as
+            accepted by :func:`loopy.assume`. The version is *kernel* with
+            *assumptions* added, transformed by the function *transform*,
+            which may also be *None*.
+        :arg generic_transform: *None* or a function transforming *kernel*
+            into the generic version, used if no other version applies.
+        :arg max_memo_size: the number of parameter values for which the
+            chosen version is remembered.
+        :arg model: *None* or a function ``model(kernel, parameters)``
+            returning a prediction of the run time of *kernel* for the
+            parameter values *parameters*. It is only used if the values of
+            all parameters of *kernel* are known in a call. Versions with
+            equal predictions are ranked by their order.
+        """
+        from loopy.transform.parameter import assume
+
+        self.kernel = kernel
+
+        versions = []
+        for assumptions, transform in specializations:
+            version_kernel = assume(kernel, assumptions)
+
+            # Only what is not already assumed needs checking at call time.
+            condition = version_kernel.assumptions.params().gist(
+                    kernel.assumptions.params())
+
+            if transform is not None:
+                version_kernel = transform(version_kernel)
+
+            versions.append(KernelVersion(
+                condition=condition, kernel=version_kernel))
+
+        generic_kernel = kernel
+        if generic_transform is not None:
+            generic_kernel = generic_transform(kernel)
+
+        versions.append(KernelVersion(condition=None, kernel=generic_kernel))
+
+        self.versions = versions
+
+        self.param_names = frozenset(
+                name
+                for version in versions
+                if version.condition is not None
+                for name, (dt, idx) in six.iteritems(
+                    version.condition.get_var_dict())
+                if version.condition.involves_dims(dt, idx, 1))
+
+        self.model = model
+        if model is not None:
+            # the model needs the values of all parameters
+            self.param_names = self.param_names | kernel.all_params()
+
+        from collections import OrderedDict
+        self.max_memo_size = max_memo_size
+        self._param_values_to_version = OrderedDict()
+
+    def get_version(self, **kwargs):
+        """
+        :arg kwargs: the keyword arguments of a call.
+        :returns: the :class:`KernelVersion` to use for a call with the
+            keyword arguments *kwargs*. Parameters not passed explicitly are
+            found from the shapes of array arguments where possible.
+            Versions whose condition involves a parameter that cannot be
+            found are skipped.
+        """
+        param_values = _get_param_values(self.kernel, self.param_names, kwargs)
+
+        key = tuple(sorted(
+            (name, int(value))
+            for name, value in six.iteritems(param_values)))
+
+        try:
+            version = self._param_values_to_version[key]
+        except KeyError:
+            pass
+        else:
+            self._param_values_to_version.move_to_end(key)
+            return version
+
+        applicable = [
+                version for version in self.versions
+                if version.is_applicable(param_values)]
+        if not applicable:
+            raise LoopyError("no applicable version found")
+
+        version = applicable[0]
+        if (self.model is not None
+                and len(applicable) > 1
+                and self.kernel.all_params() <= frozenset(param_values)):
+            version = min(applicable,
+                    key=lambda version: self.model(version.kernel, param_values))
+
+        logger.debug("%s: using version with condition %s for %s"
+                % (self.kernel.name, version.condition, dict(key)))
+
+        self._param_values_to_version[key] = version
+        while len(self._param_values_to_version) > self.max_memo_size:
+            self._param_values_to_version.popitem(last=False)
+
+        return version
+
+    def __call__(self, *args, **kwargs):
+        """Call the version chosen by :meth:`get_version` with the same
+        arguments.
+        """
+        return self.get_version(**kwargs).kernel(*args, **kwargs)
+
+# }}}
+
+# vim: foldmethod=marker
@@ -89,6 +89,56 @@ class Options(ImmutableRecord):
         Like :attr:`trace_assignments`, but also trace the
         assigned values.
 
+    .. attribute:: box_bounds_checks
+
+        When generating conditionals for the bounds of inames in
+        rectangular domains (in which each constraint involves at most
+        one iname), use the constraints of the domain directly, skipping
+        the (more general, but costlier) projection onto the checked inames.
+
+    .. attribute:: parallel_subkernel_codegen
+
+        Generate device code for the subkernels of a kernel (see
+        :func:`loopy.save_and_reload_temporaries`) in parallel worker
+        processes. If *True*, use as many processes as there are CPUs.
+        An integer gives the number of processes. The generated code
+        is identical to that of sequential generation.
+
+    .. attribute:: stream_code_to_disk
+
+        Write generated code piece by piece to a file named after the hash
+        of its content (see :func:`loopy.codegen.result.write_code_to_store`)
+        and compile it from there, rather than building the code as a string
+        in memory. Only supported by :class:`loopy.ExecutableCTarget` and
+        ignored if :attr:`write_code` or :attr:`edit_code` are set.
+
+    .. attribute:: hoist_invariants
+
+        During preprocessing, compute subexpressions that are invariant
+        in some of the loops around their instruction ahead of these loops,
+        see :func:`loopy.hoist_invariants`.
+
+    .. attribute:: minimize_global_barriers
+
+        During preprocessing, merge global barriers that can be executed at
+        the same time, to reduce the number of subkernels, see
+        :func:`loopy.minimize_global_barriers`.
+
+    .. attribute:: strength_reduce_indices
+
+        In generated device code, access global arrays through pointers that
+        are set up ahead of each sequential loop and advanced by the stride
+        of the loop's iname after each iteration, rather than computing the
+        full offset of each access in each iteration. Accesses that differ
+        only in the contributions of inner loops share a pointer. Only
+        offsets that are affine in the inames with coefficients depending
+        only on (unwritten) value arguments are handled this way.
+
+    .. attribute:: share_temporary_storage
+
+        After scheduling, let temporaries whose live ranges do not overlap
+        share storage, see :func:`loopy.share_temporary_storage`.
+
     .. attribute:: check_dep_resolution
 
         Whether loopy should issue an error if a dependency
@@ -218,6 +268,17 @@ class Options(ImmutableRecord):
                     allow_terminal_colors_def),
                 disable_global_barriers=kwargs.get("disable_global_barriers",
                     False),
+                box_bounds_checks=kwargs.get("box_bounds_checks", False),
+                parallel_subkernel_codegen=kwargs.get(
+                    "parallel_subkernel_codegen", False),
+                stream_code_to_disk=kwargs.get("stream_code_to_disk", False),
+                hoist_invariants=kwargs.get("hoist_invariants", False),
+                minimize_global_barriers=kwargs.get(
+                    "minimize_global_barriers", False),
+                strength_reduce_indices=kwargs.get(
+                    "strength_reduce_indices", False),
+                share_temporary_storage=kwargs.get(
+                    "share_temporary_storage", False),
                 check_dep_resolution=kwargs.get("check_dep_resolution", True),
 
                 enforce_variable_access_ordered=kwargs.get(
@@ -0,0 +1,495 @@
+from __future__ import division, absolute_import
+
+__copyright__ = "Copyright (C) 2020 University of Illinois Board of Trustees"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import six
+
+import numpy as np
+from pytools import ImmutableRecord, Record, memoize_on_first_arg
+from pytools.persistent_dict import PersistentDict
+
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+__doc__ = """
+.. currentmodule:: loopy.perfmodel
+
+Predicting the run time of kernels from the counts of
+:mod:`loopy.statistics`, without executing them. The prediction follows the
+roofline model: a kernel takes as long as the larger of the time needed for
+its arithmetic and the time needed for its memory traffic, plus the latency
+of its kernel launches and barriers.
+
+.. autoclass:: MachineModel
+
+.. autoclass:: PerformancePrediction
+
+.. autofunction:: predict_performance
+
+.. autofunction:: get_time_predictor
+
+.. autofunction:: calibrate_machine_model
+"""
+
+
+# {{{ machine model
+
+class MachineModel(ImmutableRecord):
+    """A description of the performance characteristics of a device.
+
+    .. attribute:: flop_rates
+
+        A mapping from names of :mod:`numpy` data types (e.g. ``"float64"``)
+        to the number of operations on that type per second.
+
+    .. attribute:: default_flop_rate
+
+        The number of operations per second on types not in
+        :attr:`flop_rates`.
+
+    .. attribute:: op_costs
+
+        A mapping from names of operations (see :attr:`loopy.Op.name`) to
+        their cost relative to an addition. Calls to functions are looked up
+        as ``"func"``. Operations not listed cost as much as an addition.
+
+    .. attribute:: memory_bandwidth
+
+        The bandwidth to main memory in bytes per second.
+
+    .. attribute:: cache_bandwidth
+
+        The bandwidth of accesses hitting in the cache in bytes per second.
+
+    .. attribute:: cache_size
+
+        The size of the last level of cache in bytes.
+
+    .. attribute:: cache_line_size
+
+        The size of a cache line in bytes. Accesses of neighboring work items
+        more than one element apart are assumed to transfer a cache line
+        each.
+
+    .. attribute:: local_memory_bandwidth
+
+        The bandwidth of local memory in bytes per second.
+
+    .. attribute:: launch_latency
+
+        The time taken by each kernel launch in seconds.
+
+    .. attribute:: barrier_latency
+
+        The time taken by each barrier in seconds.
+    """
+
+    def __init__(self, flop_rates=None, default_flop_rate=4e9, op_costs=None,
+            memory_bandwidth=10e9, cache_bandwidth=50e9, cache_size=8*2**20,
+            cache_line_size=64, local_memory_bandwidth=50e9,
+            launch_latency=1e-6, barrier_latency=1e-7):
+        if flop_rates is None:
+            flop_rates = {"float32": 16e9, "float64": 8e9}
+        if op_costs is None:
+            op_costs = {"div": 4, "pow": 8, "func": 8}
+
+        ImmutableRecord.__init__(self,
+                flop_rates=flop_rates,
+                default_flop_rate=default_flop_rate,
+                op_costs=op_costs,
+                memory_bandwidth=memory_bandwidth,
+                cache_bandwidth=cache_bandwidth,
+                cache_size=cache_size,
+                cache_line_size=cache_line_size,
+                local_memory_bandwidth=local_memory_bandwidth,
+                launch_latency=launch_latency,
+                barrier_latency=barrier_latency)
+
+    def get_op_time(self, op):
+        """
+        :arg op: a :class:`loopy.Op`.
+        :returns: the time taken by one operation described by *op* in
+            seconds.
+        """
+        name = op.name
+        if name.startswith("func:"):
+            name = "func"
+
+        rate = self.flop_rates.get(
+                op.dtype.numpy_dtype.name, self.default_flop_rate)
+        return self.op_costs.get(name, 1) / rate
+
+    def get_access_bytes(self, access):
+        """
+        :arg access: a :class:`loopy.MemAccess`.
+        :returns: the number of bytes transferred by one access described by
+            *access*.
+        """
+        itemsize = access.dtype.numpy_dtype.itemsize
+
+        stride = (access.lid_strides or {}).get(0)
+        if isinstance(stride, (int, np.integer)) and abs(stride) > 1:
+            return itemsize * min(
+                    abs(int(stride)), max(1, self.cache_line_size // itemsize))
+
+        return itemsize
+
+# }}}
+
+
+# {{{ prediction
+
+class PerformancePrediction(Record):
+    """
+    .. attribute:: time
+
+        The predicted run time in seconds.
+
+    .. attribute:: compute_time
+    .. attribute:: memory_time
+    .. attribute:: synchronization_time
+
+        The time spent in kernel launches and barriers.
+
+    .. attribute:: ops
+
+        The number of arithmetic operations.
+
+    .. attribute:: global_bytes
+
+        The number of bytes accessed in global memory.
+
+    .. attribute:: memory_bytes
+
+        The number of bytes expected to be transferred from main memory. This
+        is at least the size of the global data accessed, and grows towards
+        :attr:`global_bytes` as that size exceeds the cache.
+
+    .. attribute:: local_bytes
+
+        The number of bytes accessed in local memory.
+
+    .. attribute:: arithmetic_intensity
+
+        :attr:`ops` per byte of :attr:`memory_bytes`.
+
+    .. attribute:: bound
+
+        ``"compute"`` or ``"memory"``, whichever of :attr:`compute_time` and
+        :attr:`memory_time` is larger.
+    """
+
+
+_SILENCED_WARNINGS = [
+        "insn_count_subgroups_upper_bound",
+        "get_x_map_guessing_subgroup_size",
+        "getting_subgroup_size_from_device",
+        ]
+
+
+@memoize_on_first_arg
+def _get_symbolic_counts(kernel, subgroup_size):
+    from loopy.statistics import (
+            get_op_map, get_mem_access_map, get_synchronization_map,
+            gather_access_footprint_bytes)
+
+    kernel = kernel.copy(
+            silenced_warnings=kernel.silenced_warnings + _SILENCED_WARNINGS)
+
+    op_map = get_op_map(kernel, numpy_types=False, count_redundant_work=True,
+            count_within_subscripts=False, subgroup_size=subgroup_size)
+    mem_map = get_mem_access_map(kernel, numpy_types=False,
+            count_redundant_work=True, subgroup_size=subgroup_size)
+    sync_map = get_synchronization_map(kernel, subgroup_size=subgroup_size)
+
+    from loopy.kernel.data import ArrayArg
+    footprint_bytes = [
+            fp_bytes
+            for (var_name, _), fp_bytes in six.iteritems(
+                gather_access_footprint_bytes(kernel, ignore_uncountable=True))
+            if isinstance(kernel.arg_dict.get(var_name), ArrayArg)]
+
+    return op_map, mem_map, sync_map, footprint_bytes
+
+
+def predict_performance(kernel, parameters, machine=None, subgroup_size="guess"):
+    """Predict the run time of *kernel*.
+
+    :arg parameters: a mapping from names of the integer arguments of
+        *kernel* to their values.
+    :arg machine: a :class:`MachineModel`, defaulting to one with typical
+        values for a single CPU core. See :func:`calibrate_machine_model`
+        for a model of the local CPU.
+    :arg subgroup_size: see :func:`loopy.get_mem_access_map`.
+    :returns: a :class:`PerformancePrediction`.
+    """
+    if machine is None:
+        machine = MachineModel()
+
+    op_map, mem_map, sync_map, footprint_bytes = _get_symbolic_counts(
+            kernel, subgroup_size)
+
+    def evaluate(count):
+        return count.eval_with_dict(parameters)
+
+    # {{{ compute
+
+    ops = 0
+    compute_time = 0
+    for op, count in six.iteritems(op_map.count_map):
+        count = evaluate(count)
+        ops += count
+        compute_time += count * machine.get_op_time(op)
+
+    # }}}
+
+    # {{{ memory
+
+    global_bytes = 0
+    local_bytes = 0
+    for access, count in six.iteritems(mem_map.count_map):
+        nbytes = evaluate(count) * machine.get_access_bytes(access)
+        if access.mtype == "global":
+            global_bytes += nbytes
+        else:
+            local_bytes += nbytes
+
+    footprint = min(
+            sum(evaluate(fp_bytes) for fp_bytes in footprint_bytes),
+            global_bytes)
+
+    # Accesses beyond the first to each element miss the cache increasingly
+    # often as the footprint outgrows it.
+    if footprint > machine.cache_size:
+        miss_ratio = 1 - machine.cache_size / footprint
+    else:
+        miss_ratio = 0
+
+    memory_bytes = footprint + miss_ratio * (global_bytes - footprint)
+
+    memory_time = (
+            memory_bytes / machine.memory_bandwidth
+            + (global_bytes - memory_bytes) / machine.cache_bandwidth
+            + local_bytes / machine.local_memory_bandwidth)
+
+    # }}}
+
+    # {{{ synchronization
+
+    synchronization_time = 0
+    for kind, count in six.iteritems(sync_map.count_map):
+        latency = (machine.launch_latency
+                if kind == "kernel_launch" else machine.barrier_latency)
+        synchronization_time += evaluate(count) * latency
+
+    # }}}
+
+    return PerformancePrediction(
+            time=max(compute_time, memory_time) + synchronization_time,
+            compute_time=compute_time,
+            memory_time=memory_time,
+            synchronization_time=synchronization_time,
+            ops=ops,
+            global_bytes=global_bytes,
+            memory_bytes=memory_bytes,
+            local_bytes=local_bytes,
+            arithmetic_intensity=(
+                ops / memory_bytes if memory_bytes else float("inf")),
+            bound="compute" if compute_time > memory_time else "memory")
+
+
+def get_time_predictor(machine=None, subgroup_size="guess"):
+    """
+    :returns: a function ``predict(kernel, parameters)`` returning the
+        predicted run time of *kernel* in seconds, for use as the *model* of
+        :func:`loopy.autotune.autotune`.
+    """
+    def predict(kernel, parameters):
+        return predict_performance(kernel, parameters, machine,
+                subgroup_size=subgroup_size).time
+
+    return predict
+
+# }}}
+
+
+# {{{ calibration
+
+machine_model_database = PersistentDict("loopy-machine-models-v1")
+
+
+def _get_cache_size():
+    """
+    :returns: the size of the largest CPU cache in bytes, or *None* if it
+        cannot be determined.
+    """
+    import glob
+
+    units = {"K": 2**10, "M": 2**20, "G": 2**30}
+
+    result = None
+    for fname in glob.glob("/sys/devices/system/cpu/cpu0/cache/index*/size"):
+        try:
+            with open(fname) as inf:
+                size = inf.read().strip()
+        except IOError:
+            continue
+
+        try:
+            if size[-1:] in units:
+                size = int(size[:-1]) * units[size[-1]]
+            else:
+                size = int(size)
+        except ValueError:
+            continue
+
+        result = max(result or 0, size)
+
+    return result
+
+
+def _time_benchmark(kernel, parameters, ntrials, min_trial_time):
+    from loopy.autotune import make_arguments, time_kernel
+    # The fastest trial is the one least disturbed by other processes.
+    return time_kernel(kernel,
+        make_arguments(kernel, parameters),
+        ntrials=ntrials, min_trial_time=min_trial_time).min
+
+
+def calibrate_machine_model(cache_size=None, dtypes=(np.float32, np.float64),
+        ntrials=5, min_trial_time=1e-2, force=False, database=None):
+    """Measure the performance characteristics of one core of the local CPU
+    by timing microbenchmarks compiled with :class:`loopy.ExecutableCTarget`.
+
+    :arg cache_size: the size of the last level of cache in bytes. If
+        *None*, it is read from the operating system. The memory bandwidth is
+        measured on arrays larger than the cache, and the cache bandwidth on
+        arrays fitting in it.
+    :arg dtypes: the types for which the rate of operations is measured.
+    :arg ntrials: see :func:`loopy.autotune.time_kernel`.
+    :arg min_trial_time: see :func:`loopy.autotune.time_kernel`.
+    :arg force: if *True*, measure even if a model for the local CPU is
+        recorded in *database*.
+    :arg database: a mapping in which the model is recorded, defaulting to a
+        persistent database.
+    :returns: a :class:`MachineModel`.
+    """
+    import loopy as lp
+    from loopy.target.c import ExecutableCTarget
+
+    if database is None:
+        database = machine_model_database
+
+    if cache_size is None:
+        cache_size = _get_cache_size() or MachineModel().cache_size
+
+    dtypes = tuple(np.dtype(dtype).name for dtype in dtypes)
+
+    stream_knl = lp.make_kernel(
+            "{[i]: 0<=i<n}",
+            "b[i] = 3*a[i]",
+            [
+                lp.GlobalArg("a", np.float64, shape="n"),
+                lp.GlobalArg("b", np.float64, shape="n"),
+                "..."
+                ],
+            target=ExecutableCTarget(),
+            name="loopy_stream_benchmark",
+            lang_version=(2018, 2))
+
+    from loopy.autotune import get_device_key
+    db_key = (get_device_key(stream_knl), cache_size, dtypes)
+
+    if not force:
+        try:
+            return database[db_key]
+        except KeyError:
+            pass
+
+    def time_stream(n):
+        return _time_benchmark(
+                stream_knl, {"n": n}, ntrials, min_trial_time)
+
+    # {{{ latency and bandwidth
+
+    launch_latency = time_stream(1)
+
+    # two arrays taking up a quarter of the cache
+    n_cached = max(1, cache_size // (8*8))
+    cache_bandwidth = 16*n_cached / max(
+            time_stream(n_cached) - launch_latency, 1e-12)
+
+    # two arrays, each twice the size of the cache
+    n_uncached = 2*cache_size // 8
+    memory_bandwidth = 16*n_uncached / max(
+            time_stream(n_uncached) - launch_latency, 1e-12)
+
+    # }}}
+
+    # {{{ operation rates
+
+    flop_rates = {}
+    for dtype in dtypes:
+        flop_knl = lp.make_kernel(
+                "{[j, i]: 0<=j<m and 0<=i<n}",
+                "x[i] = x[i]*a + b {inames=i:j}",
+                [
+                    lp.GlobalArg("x", dtype, shape="n"),
+                    lp.ValueArg("a", dtype),
+                    lp.ValueArg("b", dtype),
+                    "..."
+                    ],
+                target=ExecutableCTarget(),
+                name="loopy_flop_benchmark",
+                lang_version=(2018, 2))
+        flop_knl = lp.prioritize_loops(flop_knl, "j,i")
+
+        # x stays in the first level of cache.
+        n = 256
+        m = 2**10
+        t = _time_benchmark(flop_knl, {"n": n, "m": m, "a": 0.5, "b": 0.5},
+                ntrials, min_trial_time)
+        flop_rates[dtype] = 2*n*m / max(t - launch_latency, 1e-12)
+
+    # }}}
+
+    machine = MachineModel(
+            flop_rates=flop_rates,
+            default_flop_rate=min(six.itervalues(flop_rates)),
+            memory_bandwidth=memory_bandwidth,
+            cache_bandwidth=cache_bandwidth,
+            cache_size=cache_size,
+            local_memory_bandwidth=cache_bandwidth,
+            launch_latency=launch_latency,
+            barrier_latency=0)
+
+    logger.info("calibrated machine model: %s" % machine)
+
+    database[db_key] = machine
+    return machine
+
+# }}}
+
+# vim: foldmethod=marker
@@ -898,6 +898,11 @@ def realize_reduction(kernel, insn_id_filter=None, unknown_types_ok=True,
     If *insn_id_filter* is not given, all reductions in all instructions will
     be realized.
 
+    Reductions over an iname tagged as a group axis are realized in two
+    stages separated by a global barrier. Each group first reduces over the
+    remaining inames of the reduction into its entry of a global temporary,
+    and the entries of that temporary are then reduced sequentially.
+
     If *automagic_scans_ok*, this function will attempt to rewrite triangular
     reductions as scans automatically.
 
@@ -1080,6 +1085,7 @@ def realize_reduction(kernel, insn_id_filter=None, unknown_types_ok=True,
                     _strip_if_scalar(acc_vars, acc_vars),
                     reduction_expr),
                 depends_on=frozenset(reduction_insn_depends_on) | insn.depends_on,
+                no_sync_with=insn.no_sync_with,
                 within_inames=update_insn_iname_deps,
                 within_inames_is_final=insn.within_inames_is_final,
                 predicates=insn.predicates,)
@@ -1308,6 +1314,167 @@ def realize_reduction(kernel, insn_id_filter=None, unknown_types_ok=True,
             return [acc_var[outer_local_iname_vars + (0,)] for acc_var in acc_vars]
     # }}}
 
+    # {{{ global-parallel
+
+    def map_reduction_global(expr, rec, nresults, arg_dtypes,
+            reduction_dtypes):
+        # Each group reduces over the remaining inames into its entry of a
+        # global temporary. After a global barrier, these per-group partial
+        # results are reduced sequentially.
+
+        from loopy.kernel.data import (
+                GroupIndexTag, HardwareConcurrentTag, AddressSpace)
+        from loopy.kernel.instruction import BarrierInstruction
+        from loopy.symbolic import Reduction, pw_aff_to_expr, get_dependencies
+        from loopy.isl_helpers import static_min_of_pw_aff, static_max_of_pw_aff
+        from pymbolic import var
+
+        red_iname, = (
+                iname for iname in expr.inames
+                if temp_kernel.iname_tags_of_type(iname, GroupIndexTag))
+
+        outer_insn_inames = temp_kernel.insn_inames(insn)
+
+        outer_parallel_inames = [
+                oiname for oiname in outer_insn_inames
+                if temp_kernel.iname_tags_of_type(
+                    oiname, HardwareConcurrentTag)]
+        if outer_parallel_inames:
+            raise LoopyError("reduction over group-parallel iname '%s' "
+                    "may not be nested within parallel iname(s) '%s'"
+                    % (red_iname, ", ".join(outer_parallel_inames)))
+
+        if insn.predicates:
+            raise LoopyError("reduction over group-parallel iname '%s' "
+                    "may not be conditional" % red_iname)
+
+        bounds = temp_kernel.get_iname_bounds(red_iname)
+        lbound = pw_aff_to_expr(
+                static_min_of_pw_aff(
+                    bounds.lower_bound_pw_aff, constants_only=False))
+        size = pw_aff_to_expr(
+                static_max_of_pw_aff(bounds.size, constants_only=False))
+
+        if (get_dependencies(lbound) | get_dependencies(size)) \
+                & temp_kernel.all_inames():
+            raise LoopyError("bounds of group-parallel reduction iname '%s' "
+                    "may not depend on other inames" % red_iname)
+
+        partial_var_names = make_temporaries(
+                name_based_on="partial_"+red_iname,
+                nvars=nresults,
+                shape=(size,),
+                dtypes=reduction_dtypes,
+                address_space=AddressSpace.GLOBAL)
+
+        partial_vars = tuple(var(n) for n in partial_var_names)
+
+        # {{{ stage 1: one partial result per group
+
+        # Within each group, reduce sequentially first and then across the
+        # work items of the group.
+        iname_classes = _classify_reduction_inames(temp_kernel, tuple(
+            iname for iname in expr.inames if iname != red_iname))
+
+        partial_expr = expr.expr
+        for inames in [iname_classes.sequential, iname_classes.local_parallel]:
+            if inames:
+                partial_expr = Reduction(expr.operation, inames, partial_expr,
+                        allow_simultaneous=expr.allow_simultaneous)
+
+        partial_assignees = tuple(
+                partial_var[var(red_iname) - lbound]
+                for partial_var in partial_vars)
+
+        if isinstance(partial_expr, tuple):
+            # a multi-argument reduction over the group iname only
+            assert nresults > 1
+            partial_assignments = [
+                    ((assignee,), sub_expr)
+                    for assignee, sub_expr in zip(
+                        partial_assignees, partial_expr)]
+        else:
+            partial_assignments = [(partial_assignees, partial_expr)]
+
+        partial_ids = set()
+        for assignees, rhs in partial_assignments:
+            partial_id = insn_id_gen("%s_%s_partial" % (insn.id, red_iname))
+            generated_insns.append(make_assignment(
+                    id=partial_id,
+                    assignees=assignees,
+                    expression=rhs,
+                    within_inames=(
+                        (outer_insn_inames - frozenset(expr.inames))
+                        | frozenset([red_iname])),
+                    within_inames_is_final=insn.within_inames_is_final,
+                    depends_on=insn.depends_on,
+                    ))
+            partial_ids.add(partial_id)
+
+        # }}}
+
+        barrier_depends_on = frozenset(partial_ids)
+
+        global_barrier = lp.find_most_recent_global_barrier(temp_kernel, insn.id)
+        if global_barrier is not None:
+            barrier_depends_on |= frozenset([global_barrier])
+
+        barrier_id = insn_id_gen("%s_%s_barrier" % (insn.id, red_iname))
+        generated_insns.append(BarrierInstruction(
+                id=barrier_id,
+                depends_on=barrier_depends_on,
+                within_inames=outer_insn_inames,
+                within_inames_is_final=insn.within_inames_is_final,
+                synchronization_kind="global",
+                mem_kind="global"))
+
+        # {{{ stage 2: reduce the partial results
+
+        final_iname = var_name_gen("red_"+red_iname)
+
+        final_domain = (
+                temp_kernel.get_inames_domain(frozenset([red_iname]))
+                .project_out_except([red_iname], [isl.dim_type.set]))
+        final_domain = final_domain.set_dim_name(
+                isl.dim_type.set, 0, final_iname)
+        domains.append(final_domain)
+
+        acc_var_names = make_temporaries(
+                name_based_on="acc_"+red_iname,
+                nvars=nresults,
+                shape=(),
+                dtypes=reduction_dtypes,
+                address_space=AddressSpace.PRIVATE)
+
+        acc_vars = tuple(var(n) for n in acc_var_names)
+
+        final_id = insn_id_gen("%s_%s_final" % (insn.id, red_iname))
+        generated_insns.append(make_assignment(
+                id=final_id,
+                assignees=acc_vars,
+                expression=Reduction(
+                    expr.operation, (final_iname,),
+                    _strip_if_scalar(acc_vars, tuple(
+                        partial_var[var(final_iname) - lbound]
+                        for partial_var in partial_vars)),
+                    allow_simultaneous=expr.allow_simultaneous),
+                within_inames=outer_insn_inames,
+                within_inames_is_final=insn.within_inames_is_final,
+                depends_on=frozenset([barrier_id]),
+                ))
+
+        # }}}
+
+        new_insn_add_depends_on.add(final_id)
+
+        if nresults == 1:
+            assert len(acc_vars) == 1
+            return acc_vars[0]
+        else:
+            return acc_vars
+
+    # }}}
+
     # {{{ utils (stateful)
 
     from pytools import memoize
@@ -1716,6 +1883,34 @@ def realize_reduction(kernel, insn_id_filter=None, unknown_types_ok=True,
 
         # {{{ sanity checks
 
+        if n_nonlocal_par:
+            from loopy.kernel.data import GroupIndexTag
+            group_inames = tuple(
+                    iname for iname in iname_classes.nonlocal_parallel
+                    if temp_kernel.iname_tags_of_type(iname, GroupIndexTag))
+
+            bad_inames = tuple(
+                    iname for iname in iname_classes.nonlocal_parallel
+                    if iname not in group_inames)
+            if bad_inames:
+                raise LoopyError("the only forms of parallelism supported "
+                        "by reductions are 'local' and 'group'--found "
+                        "iname(s) '%s' respectively tagged '%s'"
+                        % (", ".join(bad_inames),
+                           ", ".join(str(kernel.iname_tags(iname))
+                                     for iname in bad_inames)))
+
+            if len(group_inames) > 1:
+                raise LoopyError("Reduction over '%s' contains more than "
+                        "one group-parallel iname. It must be split "
+                        "(using split_reduction_{in,out}ward) "
+                        "before code generation."
+                        % ", ".join(expr.inames))
+
+            # The remaining inames are reduced over within each group.
+            return map_reduction_global(
+                    expr, rec, nresults, arg_dtypes, reduction_dtypes)
+
         if n_local_par and n_sequential:
             raise LoopyError("Reduction over '%s' contains both parallel and "
                     "sequential inames. It must be split "
@@ -1730,15 +1925,6 @@ def realize_reduction(kernel, insn_id_filter=None, unknown_types_ok=True,
                     "before code generation."
                     % ", ".join(expr.inames))
 
-        if n_nonlocal_par:
-            bad_inames = iname_classes.nonlocal_parallel
-            raise LoopyError("the only form of parallelism supported "
-                    "by reductions is 'local'--found iname(s) '%s' "
-                    "respectively tagged '%s'"
-                    % (", ".join(bad_inames),
-                       ", ".join(str(kernel.iname_tags(iname))
-                                 for iname in bad_inames)))
-
         if n_local_par == 0 and n_sequential == 0:
             from loopy.diagnostic import warn_with_kernel
             warn_with_kernel(kernel, "empty_reduction",
@@ -2058,6 +2244,19 @@ def preprocess_kernel(kernel, device=None):
     from loopy.kernel.creation import apply_single_writer_depencency_heuristic
     kernel = apply_single_writer_depencency_heuristic(kernel)
 
+    # Ordering restriction:
+    # Hoisting relies on dependencies to tell whether values read may change
+    # within a loop, and must see reductions before they are realized.
+
+    if kernel.options.hoist_invariants:
+        from loopy.transform.hoist import hoist_invariants
+        kernel = hoist_invariants(kernel)
+        kernel = infer_unknown_types(kernel, expect_completion=False)
+
+    if kernel.options.minimize_global_barriers:
+        from loopy.transform.add_barrier import minimize_global_barriers
+        kernel = minimize_global_barriers(kernel)
+
     # Ordering restrictions:
     #
     # - realize_reduction must happen after type inference because it needs
@@ -2097,8 +2097,17 @@ def generate_loop_schedules_inner(kernel, debug_args={}):
                 # Device mapper only gets run once.
                 new_kernel = map_schedule_onto_host_or_device(new_kernel)
 
+                logger.debug("%s: %d subkernels" % (kernel.name, sum(
+                    1 for sched_item in new_kernel.schedule
+                    if isinstance(sched_item, CallKernel))))
+
             from loopy.schedule.tools import add_extra_args_to_schedule
             new_kernel = add_extra_args_to_schedule(new_kernel)
+
+            if kernel.options.share_temporary_storage:
+                from loopy.transform.storage import share_temporary_storage
+                new_kernel = share_temporary_storage(new_kernel)
+
             yield new_kernel
 
             debug.start()
@@ -1136,12 +1136,53 @@ def add_assumptions_guard(kernel, pwqpolynomial):
     return GuardedPwQPolynomial(pwqpolynomial, kernel.assumptions)
 
 
+def _count_box_set(set, space=None):
+    """Return the number of points in *set* as a
+    :class:`islpy.PwQPolynomial` if *set* is a product of intervals (see
+    :func:`loopy.isl_helpers.is_box_set`), or *None* otherwise.
+    """
+    from loopy.isl_helpers import (
+            is_box_set, get_box_param_set, get_box_dim_bound_affs,
+            get_box_dim_bounds)
+
+    if not is_box_set(set) or not set.dim(dim_type.set):
+        return None
+
+    param_set = get_box_param_set(set)
+
+    result = None
+    for i in range(set.dim(dim_type.set)):
+        bounds = get_box_dim_bounds(
+                *get_box_dim_bound_affs(set, i), context=param_set)
+        if bounds is None:
+            return None
+
+        lower, upper = bounds
+        length_pwaff = upper - lower + 1
+        if space is not None:
+            length_pwaff = length_pwaff.align_params(space)
+
+        length = isl.PwQPolynomial.from_pw_aff(length_pwaff)
+        if result is None:
+            result = length
+        else:
+            result = result * length
+
+    return result
+
+
 def count(kernel, set, space=None):
+    # Rectangular domains are counted without resorting to the general
+    # (and far costlier) machinery below.
+    box_count = _count_box_set(set, space)
+    if box_count is not None:
+        return add_assumptions_guard(kernel, box_count)
+
     try:
         if space is not None:
             set = set.align_params(space)
 
-        return add_assumptions_guard(kernel, set.card())
+        return add_assumptions_guard(kernel, kernel.cache_manager.card(set))
     except AttributeError:
         pass
 
@@ -751,10 +751,69 @@ class ExpansionState(ImmutableRecord):
                 make_subst_func(self.arg_context))(expr)
 
 
+def _with_transformed_expressions_if_changed(insn, f):
+    """Like :meth:`loopy.InstructionBase.with_transformed_expressions`, but
+    return *insn* itself if *f* returned all expressions unchanged.
+    """
+    changed = [False]
+
+    def map_expr(expr):
+        result = f(expr)
+        if result is not expr:
+            changed[0] = True
+        return result
+
+    new_insn = insn.with_transformed_expressions(map_expr)
+    if not changed[0]:
+        return insn
+
+    return new_insn
+
+
+def _is_same_init_arg(a, b):
+    if a is b:
+        return True
+
+    return (
+            isinstance(a, tuple) and isinstance(b, tuple)
+            and len(a) == len(b)
+            and all(a_i is b_i for a_i, b_i in zip(a, b)))
+
+
+def _preserve_identity(expr, result):
+    """Return *expr* if *result* is a node of the same type built from the
+    very same children, otherwise return *result*.
+    """
+    if result is expr or type(result) is not type(expr):
+        return result
+
+    if isinstance(expr, tuple):
+        old_args = expr
+        new_args = result
+    elif isinstance(expr, p.Expression):
+        old_args = expr.__getinitargs__()
+        new_args = result.__getinitargs__()
+    else:
+        return result
+
+    if (len(old_args) == len(new_args)
+            and all(_is_same_init_arg(old_arg, new_arg)
+                for old_arg, new_arg in zip(old_args, new_args))):
+        return expr
+    else:
+        return result
+
+
 class SubstitutionRuleRenamer(IdentityMapper):
     def __init__(self, renames):
         self.renames = renames
 
+    def rec(self, expr, *args, **kwargs):
+        return _preserve_identity(
+                expr, IdentityMapper.rec(self, expr, *args, **kwargs))
+
+    __call__ = rec
+
     def map_call(self, expr):
         if not isinstance(expr.function, p.Variable):
             return IdentityMapper.map_call(self, expr)
@@ -789,7 +848,7 @@ def rename_subst_rules_in_instructions(insns, renames):
     subst_renamer = SubstitutionRuleRenamer(renames)
 
     return [
-            insn.with_transformed_expressions(subst_renamer)
+            _with_transformed_expressions_if_changed(insn, subst_renamer)
             for insn in insns]
 
 
@@ -913,10 +972,60 @@ class RuleAwareIdentityMapper(IdentityMapper):
 
     Subclasses of this must be careful to not touch identifiers that
     are in :attr:`ExpansionState.arg_context`.
+
+    .. attribute:: memoize_subexpressions
+
+        If *True*, the result of mapping each subexpression is memoized
+        under the key returned by :meth:`get_cache_key`, so that
+        subexpression objects occurring repeatedly (e.g. as arguments of
+        substitution rules) are only traversed once per expansion context.
+        Also, subexpressions none of whose children changed are returned
+        as the original object. Only set this in subclasses whose mapper
+        methods have no side effects beyond registering substitution rules.
+        Defaults to *False*.
+
+    .. automethod:: get_cache_key
     """
 
+    memoize_subexpressions = False
+
     def __init__(self, rule_mapping_context):
         self.rule_mapping_context = rule_mapping_context
+        self._rec_cache = {}
+
+    def get_cache_key(self, expr, expn_state):
+        """Return a hashable key identifying the result of mapping *expr* in
+        *expn_state*. Subclasses whose results do not depend on some part of
+        the expansion state may override this to allow more reuse.
+        """
+        # The argument context is built anew for each invocation of a rule,
+        # so key on its contents rather than its identity.
+        return (id(expr), id(expn_state.kernel), id(expn_state.instruction),
+                expn_state.stack,
+                tuple(sorted(six.iteritems(expn_state.arg_context))))
+
+    def rec(self, expr, *args, **kwargs):
+        if (not self.memoize_subexpressions
+                or len(args) != 1 or kwargs):
+            return IdentityMapper.rec(self, expr, *args, **kwargs)
+
+        expn_state, = args
+        key = self.get_cache_key(expr, expn_state)
+
+        try:
+            _, _, result = self._rec_cache[key]
+        except KeyError:
+            pass
+        else:
+            return result
+
+        result = _preserve_identity(
+                expr, IdentityMapper.rec(self, expr, expn_state))
+
+        # Keep *expr* and *expn_state* alive to make sure the ids in the
+        # key do not get reused.
+        self._rec_cache[key] = (expr, expn_state, result)
+        return result
 
     def map_variable(self, expr, expn_state):
         name, tag = parse_tagged_name(expr)
@@ -983,7 +1092,7 @@ class RuleAwareIdentityMapper(IdentityMapper):
         from loopy.kernel.data import InstructionBase
         assert insn is None or isinstance(insn, InstructionBase)
 
-        return IdentityMapper.__call__(self, expr,
+        return self.rec(expr,
                 ExpansionState(
                     kernel=kernel,
                     instruction=insn,
@@ -994,12 +1103,18 @@ class RuleAwareIdentityMapper(IdentityMapper):
         return insn
 
     def map_kernel(self, kernel):
+        if self.memoize_subexpressions:
+            transform_insn = _with_transformed_expressions_if_changed
+        else:
+            def transform_insn(insn, f):
+                return insn.with_transformed_expressions(f)
+
         new_insns = [
                 # While subst rules are not allowed in assignees, the mapper
                 # may perform tasks entirely unrelated to subst rules, so
                 # we must map assignees, too.
                 self.map_instruction(kernel,
-                    insn.with_transformed_expressions(
+                    transform_insn(insn,
                         lambda expr: self(expr, kernel, insn)))
                 for insn in kernel.instructions]
 
@@ -1007,6 +1122,8 @@ class RuleAwareIdentityMapper(IdentityMapper):
 
 
 class RuleAwareSubstitutionMapper(RuleAwareIdentityMapper):
+    memoize_subexpressions = True
+
     def __init__(self, rule_mapping_context, subst_func, within):
         super(RuleAwareSubstitutionMapper, self).__init__(rule_mapping_context)
 
@@ -1029,6 +1146,8 @@ class RuleAwareSubstitutionMapper(RuleAwareIdentityMapper):
 
 
 class RuleAwareSubstitutionRuleExpander(RuleAwareIdentityMapper):
+    memoize_subexpressions = True
+
     def __init__(self, rule_mapping_context, rules, within):
         super(RuleAwareSubstitutionRuleExpander, self).__init__(rule_mapping_context)
 
@@ -213,13 +213,26 @@ class ASTBuilderBase(object):
         raise NotImplementedError()
 
     def emit_sequential_loop(self, codegen_state, iname, iname_dtype,
-            static_lbound, static_ubound, inner):
+            static_lbound, static_ubound, inner, pointer_increments=()):
+        """
+        :arg pointer_increments: a sequence of tuples ``(name, increment)``
+            of pointers (declared by :meth:`emit_index_pointer_initializer`)
+            to advance by the expression *increment* after each iteration.
+        """
         raise NotImplementedError()
 
     @property
     def can_implement_conditionals(self):
         return False
 
+    @property
+    def can_implement_index_pointers(self):
+        return False
+
+    def emit_index_pointer_initializer(self, codegen_state, name, dtype,
+            is_written, val_str):
+        raise NotImplementedError()
+
     def emit_if(self, condition_str, ast):
         raise NotImplementedError()
 
@@ -0,0 +1,245 @@
+from __future__ import division, absolute_import
+
+__copyright__ = "Copyright (C) 2020 University of Illinois Board of Trustees"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import struct
+
+import six
+import numpy as np
+
+from loopy.diagnostic import LoopyError
+from loopy.tools import LoopyKeyBuilder
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+__doc__ = """
+.. currentmodule:: loopy
+
+A kernel bundle is a single file holding everything needed to run a set of
+kernels: the typed and scheduled kernels, the generated code, the invokers
+and, for :class:`loopy.ExecutableCTarget`, the compiled shared libraries.
+Once loaded, kernel executors look up these pieces in the bundle before
+consulting loopy's persistent caches or generating and compiling code.
+
+.. autofunction:: export_bundle
+
+.. autofunction:: load_bundle
+
+.. autoclass:: loopy.target.bundle.KernelBundle
+"""
+
+
+# {{{ file format
+
+# A bundle file consists of
+#
+# - a header: _BUNDLE_MAGIC, followed by the offset and the size of the index,
+# - the pickled entries, and
+# - the index, a pickled :class:`dict` mapping entry keys (hex digests
+#   computed by :class:`loopy.tools.LoopyKeyBuilder`) to the offset and the
+#   size of the entry.
+
+_BUNDLE_MAGIC = b"LOOPYBUNDLE\x00\x00\x00\x00\x01"
+_HEADER_FORMAT = "<QQ"
+_HEADER_SIZE = len(_BUNDLE_MAGIC) + struct.calcsize(_HEADER_FORMAT)
+
+
+def get_bundle_entry_key(kind, key):
+    return LoopyKeyBuilder()((kind, key))
+
+# }}}
+
+
+# {{{ loaded bundles
+
+_LOADED_BUNDLES = []
+
+
+class KernelBundle(object):
+    """A loaded kernel bundle, see :func:`load_bundle`. Entries are
+    unpickled on demand from a memory map of the bundle file.
+
+    .. automethod:: close
+    """
+
+    def __init__(self, path):
+        import mmap
+
+        self.path = path
+
+        with open(path, "rb") as inf:
+            self._mmap = mmap.mmap(inf.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(_BUNDLE_MAGIC)] != _BUNDLE_MAGIC:
+            self._mmap.close()
+            raise LoopyError("'%s' is not a loopy kernel bundle" % path)
+
+        index_offset, index_size = struct.unpack(
+                _HEADER_FORMAT, self._mmap[len(_BUNDLE_MAGIC):_HEADER_SIZE])
+
+        from six.moves.cPickle import loads
+        self._index = loads(self._mmap[index_offset:index_offset+index_size])
+
+    def __len__(self):
+        return len(self._index)
+
+    def get_by_digest(self, digest):
+        offset, size = self._index[digest]
+
+        from six.moves.cPickle import loads
+        return loads(self._mmap[offset:offset+size])
+
+    def close(self):
+        """Stop serving lookups from this bundle and release the memory map.
+        """
+        if self in _LOADED_BUNDLES:
+            _LOADED_BUNDLES.remove(self)
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def load_bundle(path):
+    """Load a bundle written by :func:`export_bundle` and use it to serve
+    the lookups of kernel executors, with bundles loaded later taking
+    precedence. Kernels not contained in any loaded bundle go through the
+    usual code generation and compilation pipeline.
+
+    :returns: a :class:`KernelBundle`, which may also be used as a context
+        manager that closes it on exit.
+    """
+    bundle = KernelBundle(path)
+    _LOADED_BUNDLES.append(bundle)
+
+    logger.info("loaded kernel bundle '%s' with %d entries"
+            % (path, len(bundle)))
+
+    return bundle
+
+
+def lookup_in_bundles(kind, key):
+    """
+    :arg kind: one of ``"typed_and_scheduled"``, ``"generated_code"``,
+        ``"invoker"`` and ``"c_library"``.
+    :returns: the entry for *key* in the most recently loaded bundle
+        containing it.
+    :raises KeyError: if no loaded bundle contains *key*.
+    """
+    if not _LOADED_BUNDLES:
+        raise KeyError(key)
+
+    digest = get_bundle_entry_key(kind, key)
+    for bundle in reversed(_LOADED_BUNDLES):
+        try:
+            return bundle.get_by_digest(digest)
+        except KeyError:
+            pass
+
+    raise KeyError(key)
+
+# }}}
+
+
+# {{{ export
+
+def _normalize_arg_to_dtype_set(executor, arg_to_dtype):
+    """Mimics :meth:`loopy.target.execution.KernelExecutorBase.arg_to_dtype_set`,
+    which computes the lookup key at invocation time.
+    """
+    if not executor.has_runtime_typed_args:
+        return None
+
+    return frozenset(
+            (name, np.dtype(dtype))
+            for name, dtype in six.iteritems(arg_to_dtype or {}))
+
+
+def export_bundle(executors, path):
+    """Write a bundle for the kernel executors in *executors* to the
+    file *path*. The kernels are scheduled, generated and compiled as needed.
+
+    :arg executors: an iterable of kernel executors (as obtained, e.g., from
+        :meth:`loopy.target.TargetBase.get_kernel_executor`) or of tuples
+        ``(executor, arg_to_dtype)``, where *arg_to_dtype* maps names of
+        arguments whose type is only known at invocation time to their
+        :class:`numpy.dtype`.
+    """
+    from six.moves.cPickle import dumps, HIGHEST_PROTOCOL
+    from loopy.codegen import generate_code_for_execution
+
+    entries = {}
+
+    def add_entry(kind, key, value):
+        entries[get_bundle_entry_key(kind, key)] = dumps(value, HIGHEST_PROTOCOL)
+
+    for executor in executors:
+        if isinstance(executor, tuple):
+            executor, arg_to_dtype = executor
+        else:
+            arg_to_dtype = None
+
+        arg_to_dtype_set = _normalize_arg_to_dtype_set(executor, arg_to_dtype)
+        kernel_info = executor.kernel_info(arg_to_dtype_set)
+        kernel = kernel_info.kernel
+
+        add_entry("typed_and_scheduled",
+                executor.get_typed_and_scheduled_cache_key(arg_to_dtype_set),
+                kernel)
+        codegen_result = generate_code_for_execution(kernel)
+        add_entry("generated_code", kernel, codegen_result)
+        add_entry("invoker",
+                executor.get_invoker_cache_key(kernel, codegen_result),
+                kernel_info.invoker)
+
+        for c_kernel in getattr(kernel_info, "c_kernels", []):
+            with open(c_kernel.dll._name, "rb") as inf:
+                add_entry("c_library", c_kernel.library_cache_key, inf.read())
+
+    with open(path, "wb") as outf:
+        outf.write(_BUNDLE_MAGIC)
+        outf.write(struct.pack(_HEADER_FORMAT, 0, 0))
+
+        index = {}
+        for digest, data in six.iteritems(entries):
+            index[digest] = (outf.tell(), len(data))
+            outf.write(data)
+
+        index_data = dumps(index, HIGHEST_PROTOCOL)
+        index_offset = outf.tell()
+        outf.write(index_data)
+
+        outf.seek(len(_BUNDLE_MAGIC))
+        outf.write(struct.pack(_HEADER_FORMAT, index_offset, len(index_data)))
+
+    logger.info("wrote kernel bundle '%s' with %d entries"
+            % (path, len(index)))
+
+# }}}
+
+# vim: foldmethod=marker
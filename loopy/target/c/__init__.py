@@ -645,7 +645,7 @@ class CFamilyASTBuilder(ASTBuilderBase):
 
                         temp_decls.append(decl)
 
-            else:
+            elif tv.name in sub_knl_temps:
                 assert tv.initializer is None
 
                 offset = 0
@@ -982,7 +982,7 @@ class CFamilyASTBuilder(ASTBuilderBase):
                 CExpression(self.get_c_expression_to_code_mapper(), result))
 
     def emit_sequential_loop(self, codegen_state, iname, iname_dtype,
-            lbound, ubound, inner):
+            lbound, ubound, inner, pointer_increments=()):
         ecm = codegen_state.expression_to_code_mapper
 
         from pymbolic import var
@@ -990,6 +990,11 @@ class CFamilyASTBuilder(ASTBuilderBase):
         from pymbolic.mapper.stringifier import PREC_NONE
         from cgen import For, InlineInitializer
 
+        update = ", ".join(
+                ["++%s" % iname]
+                + ["%s += %s" % (name, ecm(increment, PREC_NONE, "i"))
+                    for name, increment in pointer_increments])
+
         return For(
                 InlineInitializer(
                     POD(self, iname_dtype, iname),
@@ -1000,7 +1005,7 @@ class CFamilyASTBuilder(ASTBuilderBase):
                         "<=",
                         ubound),
                     PREC_NONE, "i"),
-                "++%s" % iname,
+                update,
                 inner)
 
     def emit_initializer(self, codegen_state, dtype, name, val_str, is_const):
@@ -1013,6 +1018,29 @@ class CFamilyASTBuilder(ASTBuilderBase):
 
         return Initializer(decl, val_str)
 
+    @property
+    def can_implement_index_pointers(self):
+        return True
+
+    def get_index_pointer_decl(self, name, dtype, is_written):
+        from cgen import Pointer, Const
+
+        # not restrict-qualified, as several pointers may refer to the same
+        # array
+        decl = Pointer(POD(self, dtype, name))
+
+        if not is_written:
+            decl = Const(decl)
+
+        return decl
+
+    def emit_index_pointer_initializer(self, codegen_state, name, dtype,
+            is_written, val_str):
+        from cgen import Initializer
+        return Initializer(
+                self.get_index_pointer_decl(name, dtype, is_written),
+                val_str)
+
     def emit_blank_line(self):
         from cgen import Line
         return Line()
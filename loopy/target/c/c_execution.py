@@ -267,7 +267,9 @@ class CCompiler(object):
                      debug_recompile=True):
         """Compile code, build and load shared library."""
         logger.debug(code)
-        c_fname = self._tempname('code.' + self.source_suffix)
+        # relative to the cache directory of the code, so that code for
+        # different kernels is not written to the same file
+        c_fname = 'code.' + self.source_suffix
 
         # build object
         _, mod_name, ext_file, recompiled = \
@@ -283,6 +285,50 @@ class CCompiler(object):
         # and return compiled
         return ctypes.CDLL(ext_file)
 
+    def build_from_file(self, name, source_path, debug=False):
+        """Compile the code in *source_path*, build and load a shared library.
+
+        The library is placed next to *source_path*, and reused if present.
+        *source_path* should therefore identify its content, as the files
+        written by :func:`loopy.codegen.result.write_code_to_store` do.
+        """
+        from hashlib import sha256
+        toolchain_hash = sha256(
+                str(self.toolchain.abi_id()).encode("utf-8")).hexdigest()[:16]
+        ext_file = "%s-%s%s" % (
+                os.path.splitext(source_path)[0], toolchain_hash,
+                self.toolchain.so_ext)
+
+        if os.path.exists(ext_file):
+            logger.debug('Kernel {0} retrieved from cache'.format(name))
+        else:
+            tmp_ext_file = self._tempname("%s.tmp%d%s" % (
+                os.path.basename(ext_file), os.getpid(), self.toolchain.so_ext))
+            self.toolchain.build_extension(tmp_ext_file, [source_path], debug)
+            os.replace(tmp_ext_file, ext_file)
+            logger.debug('Kernel {0} compiled from source'.format(name))
+
+        return ctypes.CDLL(ext_file)
+
+    def get_library_cache_key(self, name, code_hash):
+        return (str(self.toolchain.abi_id()), name, code_hash)
+
+    def load_library(self, data):
+        """Load the shared library with the binary content *data*, e.g.
+        from a kernel bundle.
+        """
+        from hashlib import sha256
+        ext_file = self._tempname(
+                sha256(data).hexdigest() + self.toolchain.so_ext)
+
+        if not os.path.exists(ext_file):
+            tmp_ext_file = ext_file + ".tmp"
+            with open(tmp_ext_file, "wb") as outf:
+                outf.write(data)
+            os.replace(tmp_ext_file, ext_file)
+
+        return ctypes.CDLL(ext_file)
+
 
 class CPlusPlusCompiler(CCompiler):
     """Subclass of CCompiler to invoke a C++ compiler."""
@@ -337,15 +383,34 @@ class CompiledCKernel(object):
     to automatically map argument types.
     """
 
-    def __init__(self, knl, idi, dev_code, target, comp=None):
+    def __init__(self, knl, idi, dev_code, target, comp=None, source_path=None):
         from loopy.target.c import ExecutableCTarget
         assert isinstance(target, ExecutableCTarget)
         self.target = target
         self.name = knl.name
         # get code and build
         self.code = dev_code
+        self.source_path = source_path
         self.comp = comp if comp is not None else CCompiler()
-        self.dll = self.comp.build(self.name, self.code)
+
+        if source_path is not None:
+            # content-addressed, see write_code_to_store
+            code_hash = os.path.splitext(os.path.basename(source_path))[0]
+        else:
+            from hashlib import sha256
+            code_hash = sha256(self.code.encode("utf-8")).hexdigest()
+        self.library_cache_key = self.comp.get_library_cache_key(
+                self.name, code_hash)
+
+        from loopy.target.bundle import lookup_in_bundles
+        try:
+            self.dll = self.comp.load_library(
+                    lookup_in_bundles("c_library", self.library_cache_key))
+        except KeyError:
+            if source_path is not None:
+                self.dll = self.comp.build_from_file(self.name, source_path)
+            else:
+                self.dll = self.comp.build(self.name, self.code)
 
         # get the function declaration for interface with ctypes
         func_decl = IDIToCDLL(self.target)
@@ -401,8 +466,18 @@ class CKernelExecutor(KernelExecutorBase):
     def kernel_info(self, arg_to_dtype_set=frozenset(), all_kwargs=None):
         kernel = self.get_typed_and_scheduled_kernel(arg_to_dtype_set)
 
-        from loopy.codegen import generate_code_v2
-        codegen_result = generate_code_v2(kernel)
+        stream_code_to_disk = (
+                self.kernel.options.stream_code_to_disk
+                and not self.kernel.options.write_cl
+                and not self.kernel.options.edit_cl)
+
+        from loopy.codegen import generate_code_for_execution
+        codegen_result = generate_code_for_execution(
+                kernel, keep_ast=stream_code_to_disk)
+
+        if stream_code_to_disk:
+            return self._get_kernel_info_with_code_on_disk(
+                    kernel, codegen_result)
 
         dev_code = codegen_result.device_code()
         host_code = codegen_result.host_code()
@@ -437,6 +512,29 @@ class CKernelExecutor(KernelExecutorBase):
                 implemented_data_info=codegen_result.implemented_data_info,
                 invoker=self.get_invoker(kernel, codegen_result))
 
+    def _get_kernel_info_with_code_on_disk(self, kernel, codegen_result):
+        def write_code(outf):
+            # same as the in-memory code in kernel_info
+            codegen_result.write_device_code(outf)
+            outf.write("\n\n")
+            codegen_result.write_host_code(outf)
+
+        from loopy.codegen.result import write_code_to_store
+        source_path = write_code_to_store(
+                write_code, self.compiler.tempdir, self.compiler.source_suffix)
+
+        c_kernels = []
+        for dp in codegen_result.device_programs:
+            c_kernels.append(CompiledCKernel(dp,
+                codegen_result.implemented_data_info, None, self.kernel.target,
+                self.compiler, source_path=source_path))
+
+        return _KernelInfo(
+                kernel=kernel,
+                c_kernels=c_kernels,
+                implemented_data_info=codegen_result.implemented_data_info,
+                invoker=self.get_invoker(kernel, codegen_result))
+
     # }}}
 
     def __call__(self, *args, **kwargs):
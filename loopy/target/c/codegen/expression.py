@@ -256,9 +256,17 @@ class ExpressionToCExpressionMapper(IdentityMapper):
 
             else:
                 subscript, = access_info.subscripts
+                base_name = access_info.array_name
+
+                from loopy.codegen.loop import find_index_pointer
+                index_pointer = find_index_pointer(
+                        self.codegen_state, ary, access_info)
+                if index_pointer is not None:
+                    base_name, subscript = index_pointer
+
                 result = self.make_subscript(
                         ary,
-                        make_var(access_info.array_name),
+                        make_var(base_name),
                         simplify_using_aff(
                             self.kernel, self.rec(subscript, 'i')))
 
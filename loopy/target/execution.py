@@ -127,14 +127,44 @@ class ExecutionWrapperGeneratorBase(object):
     A set of common methods for generating a wrapper
     for execution
 
+    .. automethod:: get_invoker_cache_key
+    .. automethod:: generate_integer_arg_finding
     """
 
+    # names of the kernel options affecting the generated invoker
+    invoker_option_names = ("no_numpy", "skip_arg_checks", "return_dict")
+
+    # maximum number of argument shape signatures for which the found
+    # integer arguments are memoized in each invoker
+    integer_arg_cache_size = 256
+
     def __init__(self, system_args):
         self.system_args = system_args[:]
 
     def python_dtype_str(self, dtype):
         raise NotImplementedError()
 
+    def get_invoker_cache_key(self, kernel, codegen_result):
+        """
+        :returns: a key identifying the invoker generated by :meth:`__call__`.
+            Rather than the entire *kernel*, it only captures what the
+            invoker depends on, i.e. chiefly the argument layout, so that
+            structurally identical kernels share invokers.
+        """
+        written_variables = kernel.get_written_variables()
+        return (
+                type(self).__name__,
+                kernel.name,
+                codegen_result.host_program.name,
+                codegen_result.implemented_data_info,
+                kernel.args,
+                frozenset(
+                    arg.name for arg in kernel.args
+                    if arg.name in written_variables),
+                tuple(
+                    getattr(kernel.options, name)
+                    for name in self.invoker_option_names))
+
     # {{{ invoker generation
 
     # /!\ This code runs in a namespace controlled by the user.
@@ -331,6 +361,141 @@ class ExecutionWrapperGeneratorBase(object):
 
     # }}}
 
+    # {{{ cached integer arg finding
+
+    def get_integer_arg_inference_dependencies(self, kernel, implemented_data_info):
+        """
+        :returns: a tuple ``(found_arg_names, array_deps)``. *found_arg_names*
+            is a list of the names of the integer arguments that may be found
+            from the passed arrays. *array_deps* is a list of tuples
+            ``(array_name, attr_exprs)``, where *attr_exprs* are the Python
+            expressions (in terms of ``array_name``) of the array attributes
+            that integer argument finding depends on.
+        """
+        from loopy.kernel.data import ArrayArg
+        from loopy.symbolic import DependencyMapper
+        dep_map = DependencyMapper()
+
+        found_arg_names = set()
+        array_to_attrs = {}
+
+        for arg in implemented_data_info:
+            if arg.arg_class is ArrayArg and arg.shape is not None:
+                shape_found_arg_names = set()
+                for shape_i in arg.shape:
+                    if shape_i is None:
+                        continue
+
+                    deps = dep_map(shape_i)
+                    if len(deps) == 1:
+                        integer_arg_var, = deps
+                        if kernel.arg_dict[
+                                integer_arg_var.name].dtype.is_integral():
+                            shape_found_arg_names.add(integer_arg_var.name)
+
+                if shape_found_arg_names:
+                    found_arg_names.update(shape_found_arg_names)
+                    array_to_attrs.setdefault(arg.name, []).append(
+                            "%s.shape" % arg.name)
+
+            if arg.offset_for_name is not None:
+                if not kernel.options.no_numpy:
+                    offset_expr = "getattr(%s, \"offset\", 0)"
+                else:
+                    offset_expr = "%s.offset"
+
+                found_arg_names.add(arg.name)
+                array_to_attrs.setdefault(arg.offset_for_name, []).append(
+                        offset_expr % arg.offset_for_name)
+
+            if arg.stride_for_name_and_axis is not None:
+                impl_array_name, _ = arg.stride_for_name_and_axis
+                found_arg_names.add(arg.name)
+                array_to_attrs.setdefault(impl_array_name, []).append(
+                        "%s.strides" % impl_array_name)
+
+        return (
+                [arg.name for arg in implemented_data_info
+                    if arg.name in found_arg_names],
+                [(arg.name, array_to_attrs[arg.name])
+                    for arg in implemented_data_info
+                    if arg.name in array_to_attrs])
+
+    def generate_integer_arg_finding(self, gen, kernel, implemented_data_info):
+        """Generates code finding the integer arguments from the shapes,
+        offsets and strides of the passed arrays. The found values are
+        memoized in the generated module, keyed on the array attributes they
+        are found from and on the passed values of the integer arguments that
+        may be found, so that calls with previously seen argument shapes skip
+        finding them altogether.
+        """
+        found_arg_names, array_deps = \
+                self.get_integer_arg_inference_dependencies(
+                        kernel, implemented_data_info)
+
+        if not found_arg_names:
+            self.generate_value_arg_check(gen, kernel, implemented_data_info)
+            return
+
+        # array attributes are looked up only if the array was passed
+        key_exprs = found_arg_names + [
+                "None if %s is None else (%s,)" % (
+                    array_name, ", ".join(attr_exprs))
+                for array_name, attr_exprs in array_deps]
+        found_args_tuple = "(%s,)" % ", ".join(found_arg_names)
+
+        gen.add_to_preamble("_lpy_integer_arg_cache = {}")
+        gen.add_to_preamble("")
+
+        gen("# {{{ find integer arguments, memoized on argument shapes")
+        gen("")
+
+        gen("try:")
+        with Indentation(gen):
+            gen("_lpy_integer_arg_key = (%s,)" % ", ".join(key_exprs))
+            gen("_lpy_integer_args = "
+                    "_lpy_integer_arg_cache.get(_lpy_integer_arg_key)")
+        gen("except (AttributeError, TypeError):")
+        with Indentation(gen):
+            gen("# arguments without (hashable) shapes, find integer "
+                    "arguments every time")
+            gen("_lpy_integer_arg_key = None")
+            gen("_lpy_integer_args = None")
+        gen("")
+
+        gen("if _lpy_integer_args is None:")
+        with Indentation(gen):
+            self.generate_integer_arg_finding_from_shapes(
+                gen, kernel, implemented_data_info)
+            self.generate_integer_arg_finding_from_offsets(
+                gen, kernel, implemented_data_info)
+            self.generate_integer_arg_finding_from_strides(
+                gen, kernel, implemented_data_info)
+
+            gen("if _lpy_integer_arg_key is not None:")
+            with Indentation(gen):
+                gen("if len(_lpy_integer_arg_cache) >= %d:"
+                        % self.integer_arg_cache_size)
+                with Indentation(gen):
+                    gen("_lpy_integer_arg_cache.clear()")
+                gen("_lpy_integer_arg_cache[_lpy_integer_arg_key] = %s"
+                        % found_args_tuple)
+        gen("else:")
+        with Indentation(gen):
+            gen("%s = _lpy_integer_args" % found_args_tuple)
+        gen("")
+
+        gen("del _lpy_integer_arg_key")
+        gen("del _lpy_integer_args")
+        gen("")
+
+        gen("# }}}")
+        gen("")
+
+        self.generate_value_arg_check(gen, kernel, implemented_data_info)
+
+    # }}}
+
     # {{{ handle non numpy arguements
 
     def handle_non_numpy_arg(self, gen, arg):
@@ -650,13 +815,7 @@ class ExecutionWrapperGeneratorBase(object):
 
         self.initialize_system_args(gen)
 
-        self.generate_integer_arg_finding_from_shapes(
-            gen, kernel, implemented_data_info)
-        self.generate_integer_arg_finding_from_offsets(
-            gen, kernel, implemented_data_info)
-        self.generate_integer_arg_finding_from_strides(
-            gen, kernel, implemented_data_info)
-        self.generate_value_arg_check(
+        self.generate_integer_arg_finding(
             gen, kernel, implemented_data_info)
 
         args = self.generate_arg_setup(
@@ -678,7 +837,50 @@ class ExecutionWrapperGeneratorBase(object):
                 with open(options.write_wrapper, "w") as outf:
                     outf.write(output)
 
-        return gen.get_picklable_function()
+        return GeneratedInvoker(gen.name, gen.get())
+
+# }}}
+
+
+# {{{ generated invoker
+
+class GeneratedInvoker(object):
+    """A function generated by :class:`ExecutionWrapperGeneratorBase`.
+    Pickles as the marshalled code object of the module defining the
+    function, so that unpickling does not require compiling the source.
+    """
+
+    def __init__(self, name, source):
+        code = compile(source.rstrip()+"\n",
+                "<generated code for '%s'>" % name, "exec")
+        self._initialize(name, code)
+
+    def _initialize(self, name, code):
+        self.name = name
+        self.code = code
+
+        mod_globals = {}
+        exec(code, mod_globals)
+        self.func = mod_globals[name]
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __getstate__(self):
+        import marshal
+        from importlib.util import MAGIC_NUMBER
+        return (MAGIC_NUMBER, self.name, marshal.dumps(self.code))
+
+    def __setstate__(self, state):
+        import marshal
+        from importlib.util import MAGIC_NUMBER
+        magic, name, code_bytes = state
+
+        if magic != MAGIC_NUMBER:
+            raise ValueError("cannot unpickle invoker '%s' generated for "
+                    "a different Python version" % name)
+
+        self._initialize(name, marshal.loads(code_bytes))
 
 # }}}
 
@@ -699,7 +901,7 @@ typed_and_scheduled_cache = WriteOncePersistentDict(
 
 
 invoker_cache = WriteOncePersistentDict(
-        "loopy-invoker-cache-v1-"+DATA_MODEL_VERSION,
+        "loopy-invoker-cache-v2-"+DATA_MODEL_VERSION,
         key_builder=LoopyKeyBuilder())
 
 
@@ -763,14 +965,23 @@ class KernelExecutorBase(object):
 
         return kernel
 
-    def get_typed_and_scheduled_kernel(self, arg_to_dtype_set):
-        from loopy import CACHING_ENABLED
-
+    def get_typed_and_scheduled_cache_key(self, arg_to_dtype_set):
         from loopy.preprocess import prepare_for_caching
         # prepare_for_caching() gets run by preprocess, but the kernel at this
         # stage is not guaranteed to be preprocessed.
         cacheable_kernel = prepare_for_caching(self.kernel)
-        cache_key = (type(self).__name__, cacheable_kernel, arg_to_dtype_set)
+        return (type(self).__name__, cacheable_kernel, arg_to_dtype_set)
+
+    def get_typed_and_scheduled_kernel(self, arg_to_dtype_set):
+        from loopy import CACHING_ENABLED
+
+        cache_key = self.get_typed_and_scheduled_cache_key(arg_to_dtype_set)
+
+        from loopy.target.bundle import lookup_in_bundles
+        try:
+            return lookup_in_bundles("typed_and_scheduled", cache_key)
+        except KeyError:
+            pass
 
         if CACHING_ENABLED:
             try:
@@ -833,20 +1044,30 @@ class KernelExecutorBase(object):
 
         kernel = self.get_typed_and_scheduled_kernel(arg_to_dtype)
 
-        from loopy.codegen import generate_code_v2
-        code = generate_code_v2(kernel)
+        from loopy.codegen import generate_code_for_execution
+        code = generate_code_for_execution(kernel)
         return code.device_code()
 
-    def get_invoker_uncached(self, kernel, *args):
+    def get_invoker_uncached(self, kernel, codegen_result):
         raise NotImplementedError()
 
     def get_wrapper_generator(self):
         raise NotImplementedError()
 
-    def get_invoker(self, kernel, *args):
+    def get_invoker_cache_key(self, kernel, codegen_result):
+        return self.get_wrapper_generator().get_invoker_cache_key(
+                kernel, codegen_result)
+
+    def get_invoker(self, kernel, codegen_result):
         from loopy import CACHING_ENABLED
 
-        cache_key = (self.__class__.__name__, kernel)
+        cache_key = self.get_invoker_cache_key(kernel, codegen_result)
+
+        from loopy.target.bundle import lookup_in_bundles
+        try:
+            return lookup_in_bundles("invoker", cache_key)
+        except KeyError:
+            pass
 
         if CACHING_ENABLED:
             try:
@@ -856,7 +1077,7 @@ class KernelExecutorBase(object):
 
         logger.debug("%s: invoker cache miss" % kernel.name)
 
-        invoker = self.get_invoker_uncached(kernel, *args)
+        invoker = self.get_invoker_uncached(kernel, codegen_result)
 
         if CACHING_ENABLED:
             invoker_cache.store_if_not_present(cache_key, invoker)
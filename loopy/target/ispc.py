@@ -483,8 +483,14 @@ class ISPCASTBuilder(CFamilyASTBuilder):
         from cgen import Assign
         return Assign(ecm(lhs, prec=PREC_NONE, type_context=None), rhs_code)
 
+    @property
+    def can_implement_index_pointers(self):
+        return False
+
     def emit_sequential_loop(self, codegen_state, iname, iname_dtype,
-            lbound, ubound, inner):
+            lbound, ubound, inner, pointer_increments=()):
+        assert not pointer_increments
+
         ecm = codegen_state.expression_to_code_mapper
 
         from loopy.target.c import POD
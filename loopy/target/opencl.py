@@ -499,6 +499,11 @@ class OpenCLCASTBuilder(CFamilyASTBuilder):
         return self.get_array_arg_decl(name, AddressSpace.GLOBAL, shape,
                 dtype, is_written)
 
+    def get_index_pointer_decl(self, name, dtype, is_written):
+        from cgen.opencl import CLGlobal
+        return CLGlobal(super(OpenCLCASTBuilder, self).get_index_pointer_decl(
+            name, dtype, is_written))
+
     def get_image_arg_decl(self, name, shape, num_target_axes, dtype, is_written):
         if is_written:
             mode = "w"
@@ -44,6 +44,10 @@ class PyOpenCLExecutionWrapperGenerator(ExecutionWrapperGeneratorBase):
     pyopencl execution
     """
 
+    invoker_option_names = (
+            ExecutionWrapperGeneratorBase.invoker_option_names
+            + ("cl_exec_manage_array_events",))
+
     def __init__(self):
         system_args = [
             "_lpy_cl_kernels", "queue", "allocator=None", "wait_for=None",
@@ -52,6 +56,13 @@ class PyOpenCLExecutionWrapperGenerator(ExecutionWrapperGeneratorBase):
             ]
         super(PyOpenCLExecutionWrapperGenerator, self).__init__(system_args)
 
+    def get_invoker_cache_key(self, kernel, codegen_result):
+        # the host code becomes part of the invoker
+        return (
+                super(PyOpenCLExecutionWrapperGenerator, self)
+                .get_invoker_cache_key(kernel, codegen_result)
+                + (codegen_result.host_code(),))
+
     def python_dtype_str(self, dtype):
         import pyopencl.tools as cl_tools
         if dtype.isbuiltin:
@@ -288,9 +299,9 @@ class PyOpenCLKernelExecutor(KernelExecutorBase):
     def kernel_info(self, arg_to_dtype_set=frozenset(), all_kwargs=None):
         kernel = self.get_typed_and_scheduled_kernel(arg_to_dtype_set)
 
-        from loopy.codegen import generate_code_v2
+        from loopy.codegen import generate_code_for_execution
         from loopy.target.execution import get_highlighted_code
-        codegen_result = generate_code_v2(kernel)
+        codegen_result = generate_code_for_execution(kernel)
 
         dev_code = codegen_result.device_code()
 
@@ -256,7 +256,9 @@ class PythonASTBuilderBase(ASTBuilderBase):
         return Collection
 
     def emit_sequential_loop(self, codegen_state, iname, iname_dtype,
-            lbound, ubound, inner):
+            lbound, ubound, inner, pointer_increments=()):
+        assert not pointer_increments
+
         ecm = codegen_state.expression_to_code_mapper
 
         from pymbolic.mapper.stringifier import PREC_NONE, PREC_SUM
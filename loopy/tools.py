@@ -50,6 +50,15 @@ else:
 
 # {{{ custom KeyBuilder subclass
 
+# isl sets do not accept the attributes used by the key builder to cache
+# their digests, but printing them is expensive. Domains are usually shared
+# between many copies of a kernel, so remember the printed form of each set
+# object (bounded, by identity).
+
+_ISL_SET_STR_CACHE = {}
+_MAX_ISL_SET_STR_CACHE_SIZE = 2**12
+
+
 class PersistentHashWalkMapper(LoopyWalkMapper, PersistentHashWalkMapperBase):
     """A subclass of :class:`loopy.symbolic.WalkMapper` for constructing
     persistent hash keys for use with
@@ -84,10 +93,21 @@ class LoopyKeyBuilder(KeyBuilderBase):
     update_for_defaultdict = update_for_dict
 
     def update_for_BasicSet(self, key_hash, key):  # noqa
-        from islpy import Printer
-        prn = Printer.to_str(key.get_ctx())
-        getattr(prn, "print_"+key._base_name)(key)
-        key_hash.update(prn.get_str().encode("utf8"))
+        try:
+            _, set_str = _ISL_SET_STR_CACHE[id(key)]
+        except KeyError:
+            from islpy import Printer
+            prn = Printer.to_str(key.get_ctx())
+            getattr(prn, "print_"+key._base_name)(key)
+            set_str = prn.get_str().encode("utf8")
+
+            if len(_ISL_SET_STR_CACHE) >= _MAX_ISL_SET_STR_CACHE_SIZE:
+                _ISL_SET_STR_CACHE.clear()
+
+            # Keep *key* alive so that its id does not get reused.
+            _ISL_SET_STR_CACHE[id(key)] = (key, set_str)
+
+        key_hash.update(set_str)
 
     def update_for_type(self, key_hash, key):
         try:
@@ -104,11 +124,38 @@ class LoopyKeyBuilder(KeyBuilderBase):
     def update_for_type_auto(self, key_hash, key):
         key_hash.update("auto".encode("utf8"))
 
+    def _new_hash(self):
+        # Older versions of pytools do not expose the hash constructor on
+        # the key builder.
+        try:
+            new_hash = self.new_hash
+        except AttributeError:
+            from hashlib import sha256 as new_hash
+
+        return new_hash()
+
     def update_for_pymbolic_expression(self, key_hash, key):
         if key is None:
             self.update_for_NoneType(key_hash, key)
-        else:
-            PersistentHashWalkMapper(key_hash)(key)
+            return
+
+        # Expressions are immutable, so their digest is computed once and
+        # then stored on the expression object itself (if it allows
+        # that). Unchanged expressions shared between copies of a kernel
+        # therefore do not need to be traversed again.
+        digest = getattr(key, "_loopy_expression_hash_digest", None)
+
+        if digest is None:
+            expr_hash = self._new_hash()
+            PersistentHashWalkMapper(expr_hash)(key)
+            digest = expr_hash.digest()
+
+            try:
+                object.__setattr__(key, "_loopy_expression_hash_digest", digest)
+            except (AttributeError, TypeError):
+                pass
+
+        key_hash.update(digest)
 
 
 class PymbolicExpressionHashWrapper(object):
@@ -611,7 +658,47 @@ def is_interned(s):
     return s is None or intern(s) is s
 
 
+# {{{ frozenset interning
+
+# Instructions in large kernels mostly share a small number of distinct
+# sets of inames, groups, etc. Interning those sets lets instructions (and
+# their copies) share a single instance of each.
+
+_INTERNED_FROZENSETS = {}
+
+# The table is simply cleared once it grows beyond this size, to keep
+# long-running processes from accumulating sets of kernels long gone.
+_MAX_INTERNED_FROZENSETS = 2**16
+
+
+def intern_frozenset(fs):
+    """Return a canonical :class:`frozenset` equal to *fs*. :class:`str`
+    elements of newly encountered sets are themselves interned.
+
+    :arg fs: an iterable of hashable objects.
+    """
+    if not isinstance(fs, frozenset):
+        fs = frozenset(fs)
+
+    try:
+        return _INTERNED_FROZENSETS[fs]
+    except KeyError:
+        pass
+
+    fs = frozenset(
+            intern(s) if isinstance(s, str) else s
+            for s in fs)
+
+    if len(_INTERNED_FROZENSETS) >= _MAX_INTERNED_FROZENSETS:
+        _INTERNED_FROZENSETS.clear()
+
+    _INTERNED_FROZENSETS[fs] = fs
+    return fs
+
+
 def intern_frozenset_of_ids(fs):
-    return frozenset(intern(s) for s in fs)
+    return intern_frozenset(fs)
+
+# }}}
 
 # vim: foldmethod=marker
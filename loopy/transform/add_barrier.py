@@ -22,15 +22,21 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+import six
 
 from loopy.kernel.instruction import BarrierInstruction
 from loopy.match import parse_match
 from loopy.transform.instruction import add_dependency
 
+import logging
+logger = logging.getLogger(__name__)
+
 __doc__ = """
 .. currentmodule:: loopy
 
 .. autofunction:: add_barrier
+
+.. autofunction:: minimize_global_barriers
 """
 
 
@@ -84,4 +90,105 @@ def add_barrier(knl, insn_before="", insn_after="", id_based_on=None,
 
 # }}}
 
+
+# {{{ minimize_global_barriers
+
+def _get_global_barrier_phases(kernel):
+    """
+    :returns: a mapping from instruction ids to the largest number of global
+        barriers on a dependency chain ending in (and including) the
+        instruction.
+    """
+    from loopy.schedule import get_insns_in_topologically_sorted_order
+
+    phases = {}
+    for insn in get_insns_in_topologically_sorted_order(kernel):
+        phase = max(
+                (phases[dep_id] for dep_id in insn.depends_on),
+                default=0)
+
+        if (isinstance(insn, BarrierInstruction)
+                and insn.synchronization_kind == "global"):
+            phase += 1
+
+        phases[insn.id] = phase
+
+    return phases
+
+
+def minimize_global_barriers(kernel):
+    """Merge global barriers that can be executed at the same time, so that
+    the number of global barriers, and with it the number of subkernels (see
+    :func:`loopy.get_subkernels`) and the traffic for saving and reloading
+    temporaries across them, is as small as the dependencies permit.
+
+    Global barriers are grouped by the largest number of global barriers on
+    a dependency chain ending in them. Each group of barriers in the same
+    loop nest and with the same predicates is replaced by a single barrier
+    that waits for all instructions the barriers in the group waited for,
+    and on which all instructions depending on one of them depend. Any
+    schedule of the resulting kernel then has no more global barriers than
+    the longest dependency chain of global barriers.
+
+    The numbers of global barriers before and after are logged.
+    """
+    phases = _get_global_barrier_phases(kernel)
+
+    groups = {}
+    for insn in kernel.instructions:
+        if (isinstance(insn, BarrierInstruction)
+                and insn.synchronization_kind == "global"):
+            groups.setdefault(
+                    (phases[insn.id], insn.within_inames, insn.predicates),
+                    []).append(insn)
+
+    nbarriers_before = sum(len(group) for group in groups.values())
+
+    # maps ids of removed barriers to the ids of the barriers replacing them
+    id_map = {}
+    merged_depends_on = {}
+    for group in groups.values():
+        if len(group) < 2:
+            continue
+
+        group = sorted(group, key=lambda insn: insn.id)
+        kept = group[0]
+
+        depends_on = set()
+        for insn in group:
+            id_map[insn.id] = kept.id
+            depends_on.update(insn.depends_on)
+
+        merged_depends_on[kept.id] = frozenset(depends_on)
+
+    if not id_map:
+        logger.info("%s: no global barriers merged (%d global barriers)"
+                % (kernel.name, nbarriers_before))
+        return kernel
+
+    new_insns = []
+    for insn in kernel.instructions:
+        if id_map.get(insn.id, insn.id) != insn.id:
+            continue
+
+        depends_on = merged_depends_on.get(insn.id, insn.depends_on)
+        insn = insn.copy(depends_on=frozenset(
+            id_map.get(dep_id, dep_id) for dep_id in depends_on))
+
+        new_insns.append(insn)
+
+    nbarriers_after = nbarriers_before - sum(
+            1 for insn_id, kept_id in six.iteritems(id_map)
+            if insn_id != kept_id)
+
+    logger.info("%s: merged %d global barriers into %d "
+            "(at most %d subkernels per pass through the loop nest, "
+            "previously at most %d)"
+            % (kernel.name, nbarriers_before, nbarriers_after,
+                nbarriers_after + 1, nbarriers_before + 1))
+
+    return kernel.copy(instructions=new_insns)
+
+# }}}
+
 # vim: foldmethod=marker
@@ -150,7 +150,8 @@ def add_prefetch(kernel, var_name, sweep_inames=[], dim_arg_names=None,
         temporary_address_space=None, temporary_scope=None,
         footprint_subscripts=None,
         fetch_bounding_box=False,
-        fetch_outer_inames=None):
+        fetch_outer_inames=None,
+        double_buffer_iname=None):
     """Prefetch all accesses to the variable *var_name*, with all accesses
     being swept through *sweep_inames*.
 
@@ -236,6 +237,8 @@ def add_prefetch(kernel, var_name, sweep_inames=[], dim_arg_names=None,
 
     :arg fetch_outer_inames: The inames within which the fetch
         instruction is nested. If *None*, make an educated guess.
+    :arg double_buffer_iname: If not *None*, a sequential iname across whose
+        iterations the fetch is double-buffered, see :func:`precompute`.
 
     This function internally uses :func:`extract_subst` and :func:`precompute`.
     """
@@ -336,7 +339,8 @@ def add_prefetch(kernel, var_name, sweep_inames=[], dim_arg_names=None,
             temporary_name=temporary_name,
             temporary_address_space=temporary_address_space,
             temporary_scope=temporary_scope,
-            precompute_outer_inames=fetch_outer_inames)
+            precompute_outer_inames=fetch_outer_inames,
+            double_buffer_iname=double_buffer_iname)
 
     # {{{ remove inames that were temporarily added by slice sweeps
 
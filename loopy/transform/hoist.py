@@ -0,0 +1,384 @@
+from __future__ import division, absolute_import
+
+__copyright__ = "Copyright (C) 2020 University of Illinois Board of Trustees"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import islpy as isl
+import pymbolic.primitives as p
+
+from loopy.symbolic import IdentityMapper, WalkMapper, get_dependencies
+from loopy.kernel.data import (
+        TemporaryVariable, AddressSpace, HardwareConcurrentTag)
+from loopy.kernel.instruction import Assignment, CallInstruction
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+__doc__ = """
+.. currentmodule:: loopy
+
+.. autofunction:: hoist_invariants
+"""
+
+
+# {{{ helpers
+
+# Kinds of expressions worth computing ahead of a loop. Variables and
+# subscripts themselves are left to the compiler.
+_HOISTABLE_TYPES = (
+        p.Sum, p.Product, p.Quotient, p.FloorDiv, p.Remainder, p.Power,
+        p.Call)
+
+
+class _UnhoistableFinder(WalkMapper):
+    def __init__(self, kernel):
+        self.kernel = kernel
+        self.found = False
+
+    def visit(self, expr, *args, **kwargs):
+        return not self.found
+
+    def map_reduction(self, expr, *args, **kwargs):
+        self.found = True
+
+    def map_variable(self, expr, *args, **kwargs):
+        if expr.name in self.kernel.substitutions:
+            self.found = True
+
+    map_tagged_variable = map_variable
+
+    def map_call(self, expr, *args, **kwargs):
+        if expr.function.name in self.kernel.substitutions:
+            self.found = True
+            return
+
+        for par in expr.parameters:
+            self.rec(par, *args, **kwargs)
+
+
+def _get_domain_closed_inames(kernel, inames):
+    """
+    :returns: *inames*, together with all inames on which the bounds of
+        *inames* depend, recursively.
+    """
+    all_inames = kernel.all_inames()
+
+    result = set(inames)
+    queue = list(inames)
+    while queue:
+        iname = queue.pop()
+        domain = kernel.get_inames_domain(iname)
+        for param in domain.get_var_names(isl.dim_type.param):
+            if param in all_inames and param not in result:
+                result.add(param)
+                queue.append(param)
+
+    return frozenset(result)
+
+
+class _InvariantHoistingMapper(IdentityMapper):
+    """Replaces maximal subexpressions for which *hoist* returns a
+    replacement. Of sums and products, the longest prefix of terms for which
+    *hoist* returns a replacement is replaced, which keeps the order of
+    evaluation intact.
+    """
+
+    def __init__(self, hoist):
+        self.hoist = hoist
+
+    def rec(self, expr, inames):
+        result = self.hoist(expr, inames)
+        if result is not None:
+            return result
+
+        if isinstance(expr, (p.Sum, p.Product)):
+            children = expr.children
+            for nprefix in range(len(children) - 1, 1, -1):
+                result = self.hoist(type(expr)(children[:nprefix]), inames)
+                if result is not None:
+                    return type(expr)(
+                            (result,)
+                            + tuple(self.rec(child, inames)
+                                for child in children[nprefix:]))
+
+        return super(_InvariantHoistingMapper, self).rec(expr, inames)
+
+    __call__ = rec
+
+    def map_without_hoisting(self, expr, inames):
+        """Like :meth:`rec`, but never replaces *expr* itself, only its
+        subexpressions.
+        """
+        return super(_InvariantHoistingMapper, self).rec(expr, inames)
+
+    def map_subscript(self, expr, inames):
+        # Indices are left alone, as analyses of the accesses need them
+        # in terms of inames.
+        return expr
+
+    map_linear_subscript = map_subscript
+
+    def map_reduction(self, expr, inames):
+        from loopy.symbolic import Reduction
+        return Reduction(
+                expr.operation, expr.inames,
+                self.rec(expr.expr, inames | frozenset(expr.inames)),
+                expr.allow_simultaneous)
+
+
+class _ScalarMaterializer(object):
+    """Computes expressions into private scalar temporaries, ahead of the
+    instructions using them. Identical expressions computed within the same
+    inames share a temporary.
+    """
+
+    def __init__(self, kernel):
+        self.kernel = kernel
+        self.all_inames = kernel.all_inames()
+        self.writer_map = kernel.writer_map()
+        self.recursive_deps = kernel.recursive_insn_dep_map()
+
+        self.vng = kernel.get_var_name_generator()
+        self.ing = kernel.get_instruction_id_generator()
+
+        # maps (expression, inames) to the name of the temporary holding it
+        # and the id of the instruction computing it
+        self.materialized = {}
+        self.new_temporaries = {}
+        self.new_insns = []
+
+    def get_writer_ids(self, insn, expr, left_inames):
+        """
+        :returns: the ids of the instructions writing the variables read by
+            *expr*, or *None* if these may change within the loops over
+            *left_inames*, i.e. between the computation of *expr* ahead of
+            these loops and its use in *insn*.
+        """
+        writer_ids = set()
+        for var_name in get_dependencies(expr) - self.all_inames:
+            for writer_id in self.writer_map.get(var_name, ()):
+                writer = self.kernel.id_to_insn[writer_id]
+                if (writer_id == insn.id
+                        or self.kernel.insn_inames(writer) & left_inames
+                        or writer_id not in self.recursive_deps[insn.id]):
+                    return None
+
+                writer_ids.add(writer_id)
+
+        return frozenset(writer_ids)
+
+    def __call__(self, expr, inames, writer_ids, get_dtype, name_based_on,
+            insn_id_prefix):
+        """Compute *expr* into a temporary within *inames*.
+
+        :arg writer_ids: as returned by :meth:`get_writer_ids`.
+        :arg get_dtype: a function without arguments returning the type of
+            the temporary, only called if a new temporary is needed.
+        :returns: a tuple ``(var, insn_id)`` of a
+            :class:`pymbolic.primitives.Variable` for the temporary and the id
+            of the instruction computing it.
+        """
+        key = (expr, inames)
+        try:
+            return self.materialized[key]
+        except KeyError:
+            pass
+
+        tv_name = self.vng(name_based_on)
+        insn_id = self.ing("%s_%s" % (insn_id_prefix, tv_name))
+
+        self.new_temporaries[tv_name] = TemporaryVariable(
+                name=tv_name,
+                dtype=get_dtype(),
+                shape=(),
+                address_space=AddressSpace.PRIVATE)
+
+        self.new_insns.append(Assignment(
+                id=insn_id,
+                assignee=p.Variable(tv_name),
+                expression=expr,
+                within_inames=inames,
+                depends_on=writer_ids))
+
+        result = self.materialized[key] = p.Variable(tv_name), insn_id
+        return result
+
+    def get_kernel(self, new_instructions):
+        """
+        :returns: the kernel with *new_instructions* in place of its
+            instructions, preceded by the instructions computing the
+            temporaries, or *None* if no temporaries were needed.
+        """
+        if not self.new_insns:
+            return None
+
+        new_temporary_variables = self.kernel.temporary_variables.copy()
+        new_temporary_variables.update(self.new_temporaries)
+
+        return self.kernel.copy(
+                instructions=self.new_insns + list(new_instructions),
+                temporary_variables=new_temporary_variables)
+
+# }}}
+
+
+# {{{ hoist invariants
+
+def _hoist_invariants_once(kernel, within):
+    from loopy.type_inference import TypeInferenceMapper
+    from loopy.diagnostic import TypeInferenceFailure, DependencyTypeInferenceFailure
+    from loopy.types import to_loopy_type
+
+    all_inames = kernel.all_inames()
+    type_inf_mapper = TypeInferenceMapper(kernel)
+    materializer = _ScalarMaterializer(kernel)
+
+    new_instructions = []
+
+    for insn in kernel.instructions:
+        if (not within(kernel, insn)
+                or not isinstance(insn, (Assignment, CallInstruction))
+                or insn.predicates):
+            new_instructions.append(insn)
+            continue
+
+        insn_inames = kernel.insn_inames(insn)
+        new_deps = set()
+
+        def hoist(expr, inames):
+            if not isinstance(expr, _HOISTABLE_TYPES):
+                return None
+
+            deps = get_dependencies(expr)
+            if not deps:
+                # constant folding is up to the compiler
+                return None
+
+            finder = _UnhoistableFinder(kernel)
+            finder(expr)
+            if finder.found:
+                return None
+
+            iname_deps = deps & all_inames
+            if not iname_deps <= insn_inames:
+                # depends on a reduction iname
+                return None
+
+            hoist_inames = _get_domain_closed_inames(kernel, iname_deps)
+            if not (hoist_inames <= insn_inames and hoist_inames < inames):
+                return None
+
+            left_inames = inames - hoist_inames
+            if all(kernel.iname_tags_of_type(iname, HardwareConcurrentTag)
+                    for iname in left_inames):
+                # no loops to hoist out of
+                return None
+
+            writer_ids = materializer.get_writer_ids(insn, expr, left_inames)
+            if writer_ids is None:
+                return None
+
+            def get_dtype():
+                try:
+                    dtype = type_inf_mapper(expr)
+                except (TypeInferenceFailure, DependencyTypeInferenceFailure):
+                    from loopy.kernel.data import auto
+                    return auto
+                else:
+                    return to_loopy_type(dtype)
+
+            logger.debug("%s: hoisting '%s' out of loops over %s"
+                    % (kernel.name, expr, ", ".join(sorted(left_inames))))
+
+            tv_var, hoisted_insn_id = materializer(
+                    expr, hoist_inames, writer_ids, get_dtype,
+                    name_based_on="hoisted", insn_id_prefix="hoist")
+
+            new_deps.add(hoisted_insn_id)
+            return tv_var
+
+        mapper = _InvariantHoistingMapper(hoist)
+        if isinstance(insn, CallInstruction):
+            # The call returns several values, so only its arguments can be
+            # hoisted.
+            new_expression = mapper.map_without_hoisting(
+                    insn.expression, insn_inames)
+        else:
+            new_expression = mapper(insn.expression, insn_inames)
+
+        new_insn = insn.copy(expression=new_expression)
+
+        if new_deps:
+            new_insn = new_insn.copy(depends_on=new_insn.depends_on | new_deps)
+
+        new_instructions.append(new_insn)
+
+    new_kernel = materializer.get_kernel(new_instructions)
+    if new_kernel is None:
+        return kernel, False
+
+    return new_kernel, True
+
+
+def hoist_invariants(kernel, within=None):
+    """Computes subexpressions of instructions that only depend on some of
+    the instruction's inames ahead of the loops over the remaining inames,
+    into private temporaries. For example, in::
+
+        out[i, j] = a[j] * exp(c*b[i])
+
+    ``exp(c*b[i])`` is computed once per iteration of the loop over ``i``
+    rather than once per iteration over ``i`` and ``j``.
+
+    Subexpressions are hoisted as far out as their dependencies allow.
+    They are not hoisted if any variable they read may change within the
+    loops they are hoisted out of, or if the instruction has predicates.
+    Of sums and products, only leading terms are hoisted, so that the order
+    of evaluation stays the same. Identical subexpressions hoisted to the
+    same loops share a temporary.
+
+    Note that a hoisted subexpression is evaluated even if the loops it was
+    hoisted out of have no iterations.
+
+    This is applied automatically during preprocessing if
+    :attr:`loopy.Options.hoist_invariants` is set.
+
+    :arg within: a stack match as understood by
+        :func:`loopy.match.parse_match` restricting the instructions whose
+        expressions are considered.
+    :returns: The resulting kernel
+    """
+    from loopy.match import parse_match
+    within = parse_match(within)
+
+    changed = True
+    while changed:
+        # Hoisted instructions may themselves contain invariants of the loops
+        # they are in.
+        kernel, changed = _hoist_invariants_once(kernel, within)
+
+    return kernel
+
+# }}}
+
+# vim: foldmethod=marker
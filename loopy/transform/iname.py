@@ -122,6 +122,8 @@ def prioritize_loops(kernel, loop_priority):
 # {{{ backend
 
 class _InameSplitter(RuleAwareIdentityMapper):
+    memoize_subexpressions = True
+
     def __init__(self, rule_mapping_context, within,
             split_iname, outer_iname, inner_iname, replacement_index):
         super(_InameSplitter, self).__init__(rule_mapping_context)
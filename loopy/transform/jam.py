@@ -0,0 +1,198 @@
+from __future__ import division, absolute_import
+
+__copyright__ = "Copyright (C) 2020 University of Illinois Board of Trustees"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import pymbolic.primitives as p
+
+from loopy.symbolic import IdentityMapper, get_dependencies
+from loopy.kernel.data import TemporaryVariable, ImageArg, auto
+from loopy.kernel.instruction import Assignment, CallInstruction
+from loopy.diagnostic import LoopyError
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+__doc__ = """
+.. currentmodule:: loopy
+
+.. autofunction:: unroll_and_jam
+"""
+
+
+# {{{ load sharing
+
+class _LoadSharingMapper(IdentityMapper):
+    """Replaces subscripts for which *share* returns a replacement. *share*
+    is passed the subscript and the inames it is evaluated within, apart
+    from the jammed iname.
+    """
+
+    def __init__(self, share):
+        self.share = share
+
+    def map_subscript(self, expr, inames):
+        result = self.share(expr, inames)
+        if result is not None:
+            return result
+
+        return super(_LoadSharingMapper, self).map_subscript(expr, inames)
+
+    def map_reduction(self, expr, inames):
+        # Loads within reductions are made once per iteration of the
+        # reduction inames.
+        from loopy.symbolic import Reduction
+        return Reduction(
+                expr.operation, expr.inames,
+                self.rec(expr.expr, inames | frozenset(expr.inames)),
+                expr.allow_simultaneous)
+
+
+def _share_loads_across_iname(kernel, jam_iname):
+    """Reads from arrays in instructions within *jam_iname* whose indices
+    do not depend on *jam_iname* are made once ahead of the copies of the
+    instruction for the values of *jam_iname*, into private temporaries.
+    Reads within reductions are made within the loops over the reduction
+    inames.
+    """
+    from loopy.kernel.data import ArrayBase
+    from loopy.transform.hoist import _ScalarMaterializer
+
+    all_inames = kernel.all_inames()
+    materializer = _ScalarMaterializer(kernel)
+    jam_inames = frozenset([jam_iname])
+
+    new_instructions = []
+
+    for insn in kernel.instructions:
+        insn_inames = kernel.insn_inames(insn)
+
+        if (jam_iname not in insn_inames
+                or not isinstance(insn, (Assignment, CallInstruction))
+                or insn.predicates):
+            new_instructions.append(insn)
+            continue
+
+        new_deps = set()
+
+        def share(expr, load_inames):
+            if not isinstance(expr.aggregate, p.Variable):
+                return None
+
+            var_name = expr.aggregate.name
+            var_descr = kernel.get_var_descriptor(var_name)
+            if (not isinstance(var_descr, (ArrayBase, TemporaryVariable))
+                    or isinstance(var_descr, ImageArg)):
+                return None
+
+            if not (get_dependencies(expr) & all_inames) <= load_inames:
+                return None
+
+            # Writers within the reduction loops are not ordered with
+            # respect to the load.
+            writer_ids = materializer.get_writer_ids(
+                    insn, expr, jam_inames | (load_inames - insn_inames))
+            if writer_ids is None:
+                return None
+
+            logger.debug("%s: sharing load of '%s' across '%s'"
+                    % (kernel.name, expr, jam_iname))
+
+            def get_dtype():
+                if var_descr.dtype is None:
+                    return auto
+                return var_descr.dtype
+
+            tv_var, load_insn_id = materializer(
+                    expr, load_inames, writer_ids, get_dtype,
+                    name_based_on="%s_shared" % var_name,
+                    insn_id_prefix="load")
+
+            new_deps.add(load_insn_id)
+            return tv_var
+
+        mapper = _LoadSharingMapper(share)
+        new_insn = insn.copy(
+                expression=mapper(insn.expression, insn_inames - jam_inames))
+
+        if new_deps:
+            new_insn = new_insn.copy(depends_on=new_insn.depends_on | new_deps)
+
+        new_instructions.append(new_insn)
+
+    new_kernel = materializer.get_kernel(new_instructions)
+    if new_kernel is None:
+        return kernel
+
+    return new_kernel
+
+# }}}
+
+
+# {{{ unroll and jam
+
+def unroll_and_jam(kernel, iname, factor, inner_iname=None, outer_iname=None,
+        within=None, share_loads=True):
+    """Unrolls the loop over *iname* by *factor* and jams the copies of its
+    body into the loops nested within it. For example, for::
+
+        c[i, j] = sum(k, a[i, k]*b[k, j])
+
+    ``lp.unroll_and_jam(knl, "i", 4)`` computes four entries of a column
+    of ``c`` in each iteration of the loop over ``k``, and
+    ``b[k, j]`` is loaded once for all four.
+
+    *iname* is split by *factor* as by :func:`split_iname`, and the inner
+    iname is tagged ``ilp.unr``. Temporaries written within the jammed
+    loops thus get one copy per unrolled iteration, see
+    :func:`privatize_temporaries_with_inames`.
+
+    :arg share_loads: If *True*, array reads in the jammed instructions
+        whose indices do not depend on the unrolled iname are made once
+        into a private temporary, ahead of the copies for the unrolled
+        iterations, unless the array may be written in between. Reads
+        within reductions are made once per iteration of the reduction
+        inames.
+    :arg within: a stack match as understood by
+        :func:`loopy.match.parse_stack_match`, restricting the instructions
+        for which *iname* is split.
+    :returns: The resulting kernel
+    """
+    if iname not in kernel.all_inames():
+        raise LoopyError("iname '%s' does not exist" % iname)
+
+    if inner_iname is None:
+        inner_iname = kernel.get_var_name_generator()(iname+"_inner")
+
+    from loopy.transform.iname import split_iname
+    kernel = split_iname(kernel, iname, factor,
+            outer_iname=outer_iname, inner_iname=inner_iname,
+            inner_tag="ilp.unr", within=within)
+
+    if share_loads:
+        kernel = _share_loads_across_iname(kernel, inner_iname)
+
+    return kernel
+
+# }}}
+
+# vim: foldmethod=marker
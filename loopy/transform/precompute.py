@@ -255,6 +255,298 @@ class RuleInvocationReplacer(RuleAwareIdentityMapper):
 # }}}
 
 
+# {{{ double buffering
+
+class _BufferSlotInserter(RuleAwareIdentityMapper):
+    def __init__(self, rule_mapping_context, temporary_name, insn_id_to_slot,
+            default_slot):
+        super(_BufferSlotInserter, self).__init__(rule_mapping_context)
+        self.temporary_name = temporary_name
+        self.insn_id_to_slot = insn_id_to_slot
+        self.default_slot = default_slot
+
+    def get_slot(self, expn_state):
+        return self.insn_id_to_slot.get(expn_state.insn_id, self.default_slot)
+
+    def map_variable(self, expr, expn_state):
+        if expr.name == self.temporary_name:
+            return expr[self.get_slot(expn_state)]
+
+        return super(_BufferSlotInserter, self).map_variable(expr, expn_state)
+
+    def map_subscript(self, expr, expn_state):
+        if expr.aggregate.name == self.temporary_name:
+            return expr.aggregate[
+                    (self.get_slot(expn_state),)
+                    + tuple(
+                        self.rec(idx, expn_state)
+                        for idx in expr.index_tuple)]
+
+        return super(_BufferSlotInserter, self).map_subscript(expr, expn_state)
+
+
+def _is_product_domain(domain, inames_a, inames_b, assumptions=None):
+    """
+    :returns: whether the values *domain* allows for *inames_a* are
+        independent of the values of *inames_b*, given that the parameter
+        set *assumptions* holds.
+    """
+    if assumptions is not None:
+        assumptions, domain = isl.align_two(
+                isl.BasicSet.from_params(assumptions), domain)
+        domain = domain & assumptions
+
+    domain = domain.project_out_except(
+            list(inames_a) + list(inames_b), [isl.dim_type.set])
+
+    domain_a = domain.project_out_except(list(inames_a), [isl.dim_type.set])
+    domain_b = domain.project_out_except(list(inames_b), [isl.dim_type.set])
+
+    product = isl.align_spaces(domain_a, domain) & isl.align_spaces(
+            domain_b, domain)
+
+    return product <= domain
+
+
+def _add_double_buffering(kernel, pipeline_iname, temporary_name,
+        compute_insn_id, storage_inames, new_iname_to_tag):
+    """Let the compute instruction *compute_insn_id* fetch the values for
+    the next iteration of the sequential loop over *pipeline_iname* into a
+    second slot of the temporary while the instructions reading the
+    temporary use the values for the current one.
+
+    :returns: a tuple ``(kernel, new_iname_to_tag)`` with tags added for
+        the inames of the fetch ahead of the loop.
+    """
+    import loopy as lp
+    from loopy.kernel.data import (
+            AddressSpace, ConcurrentTag, LocalIndexTagBase)
+    from loopy.kernel.instruction import BarrierInstruction
+    from loopy.symbolic import pw_aff_to_expr, SubstitutionMapper
+    from pymbolic.primitives import Comparison
+
+    compute_insn = kernel.id_to_insn[compute_insn_id]
+    p = var(pipeline_iname)
+
+    # {{{ check applicability
+
+    if pipeline_iname not in compute_insn.within_inames:
+        raise LoopyError("double-buffering iname '%s' is not among the inames "
+                "around the precompute instruction '%s'"
+                % (pipeline_iname, compute_insn_id))
+
+    if kernel.iname_tags_of_type(pipeline_iname, ConcurrentTag):
+        raise LoopyError("double-buffering iname '%s' is not sequential"
+                % pipeline_iname)
+
+    temp_var = kernel.temporary_variables[temporary_name]
+
+    address_space = temp_var.address_space
+    if address_space is lp.auto:
+        # Fix the address space now, as it decides whether a barrier is
+        # needed.
+        if any(
+                isinstance(tag, LocalIndexTagBase)
+                for iname in storage_inames
+                for tag in (
+                    set([new_iname_to_tag.get(iname)])
+                    | kernel.iname_tags(iname))):
+            address_space = AddressSpace.LOCAL
+        else:
+            address_space = AddressSpace.PRIVATE
+
+    if address_space == AddressSpace.GLOBAL:
+        raise LoopyError("double-buffering is not supported for "
+                "global temporaries")
+
+    using_insns = [
+            insn for insn in kernel.instructions
+            if insn.id != compute_insn_id
+            and temporary_name in insn.read_dependency_names()]
+
+    for insn in using_insns:
+        if pipeline_iname not in (
+                insn.within_inames | insn.reduction_inames()):
+            raise LoopyError("instruction '%s' reads '%s' outside of the "
+                    "loop over double-buffering iname '%s'"
+                    % (insn.id, temporary_name, pipeline_iname))
+
+    writer_map = kernel.writer_map()
+    for var_name in compute_insn.read_dependency_names():
+        for writer_id in writer_map.get(var_name, ()):
+            writer = kernel.id_to_insn[writer_id]
+            if pipeline_iname in (
+                    writer.within_inames | writer.reduction_inames()):
+                raise LoopyError("cannot fetch ahead: '%s' is written by "
+                        "instruction '%s' within the loop over '%s'"
+                        % (var_name, writer_id, pipeline_iname))
+
+    if not _is_product_domain(
+            kernel.get_inames_domain(
+                frozenset(storage_inames) | frozenset([pipeline_iname])),
+            storage_inames, [pipeline_iname], kernel.assumptions):
+        raise LoopyError("cannot double-buffer: the extent of the precompute "
+                "depends on '%s'" % pipeline_iname)
+
+    pipeline_domain = kernel.get_inames_domain(frozenset([pipeline_iname]))
+    if not _is_product_domain(
+            pipeline_domain, [pipeline_iname],
+            [iname
+                for iname in pipeline_domain.get_var_names(isl.dim_type.set)
+                if iname != pipeline_iname],
+            kernel.assumptions):
+        raise LoopyError("cannot double-buffer: the bounds of '%s' depend "
+                "on other inames" % pipeline_iname)
+
+    # }}}
+
+    bounds = kernel.get_iname_bounds(pipeline_iname)
+    lbound = pw_aff_to_expr(bounds.lower_bound_pw_aff)
+    ubound = pw_aff_to_expr(bounds.upper_bound_pw_aff)
+
+    def subst_pipeline_iname(expr, value):
+        return SubstitutionMapper(
+                make_subst_func({pipeline_iname: value}))(expr)
+
+    # {{{ fetch for the first iteration ahead of the loop
+
+    prologue_id = kernel.make_unique_instruction_id(
+            based_on=compute_insn_id+"_prologue")
+
+    prologue_predicates = frozenset(
+            subst_pipeline_iname(pred, lbound)
+            for pred in compute_insn.predicates)
+    if not (isinstance(lbound, int) and isinstance(ubound, int)
+            and lbound <= ubound):
+        # the loop may not be entered
+        prologue_predicates = prologue_predicates | frozenset([
+            Comparison(lbound, "<=", ubound)])
+
+    prologue_insn = compute_insn.copy(
+            id=prologue_id,
+            expression=subst_pipeline_iname(compute_insn.expression, lbound),
+            predicates=prologue_predicates,
+            depends_on=frozenset(
+                dep_id for dep_id in compute_insn.depends_on
+                if pipeline_iname not in kernel.id_to_insn[dep_id].within_inames),
+            within_inames=compute_insn.within_inames - frozenset([pipeline_iname]))
+
+    # }}}
+
+    # {{{ fetch for the next iteration within the loop
+
+    new_insns = []
+    barrier_ids = frozenset()
+
+    if address_space == AddressSpace.LOCAL:
+        # A single barrier at the start of each iteration orders both the
+        # fetch in the previous iteration before the uses in this one and
+        # the uses in the previous iteration before the fetch in this one.
+        # The fetch and the uses both depend on it, so that neither is
+        # scheduled ahead of it within an iteration.
+        barrier_id = kernel.make_unique_instruction_id(
+                based_on=compute_insn_id+"_barrier")
+        barrier_ids = frozenset([barrier_id])
+        new_insns.append(BarrierInstruction(
+                id=barrier_id,
+                depends_on=frozenset(),
+                within_inames=compute_insn.within_inames - frozenset(
+                    storage_inames),
+                synchronization_kind="local",
+                mem_kind="local"))
+
+    using_insn_ids = frozenset(insn.id for insn in using_insns)
+
+    compute_insn = compute_insn.copy(
+            expression=subst_pipeline_iname(compute_insn.expression, p+1),
+            predicates=(
+                frozenset(
+                    subst_pipeline_iname(pred, p+1)
+                    for pred in compute_insn.predicates)
+                | frozenset([Comparison(p+1, "<=", ubound)])),
+            depends_on=(
+                compute_insn.depends_on
+                | frozenset([prologue_id]) | barrier_ids),
+            no_sync_with=(
+                compute_insn.no_sync_with
+                | frozenset(
+                    (insn_id, "any")
+                    for insn_id in using_insn_ids | frozenset([prologue_id]))))
+
+    for insn in kernel.instructions:
+        if insn.id == compute_insn_id:
+            new_insns.append(compute_insn)
+            new_insns.append(prologue_insn)
+        elif insn.id in using_insn_ids:
+            new_insns.append(insn.copy(
+                depends_on=(
+                    insn.depends_on | frozenset([prologue_id]) | barrier_ids),
+                no_sync_with=(
+                    insn.no_sync_with
+                    | frozenset([(compute_insn_id, "any")]))))
+        else:
+            new_insns.append(insn)
+
+    kernel = kernel.copy(instructions=new_insns)
+
+    # }}}
+
+    # {{{ add the slot axis to the temporary
+
+    rule_mapping_context = SubstitutionRuleMappingContext(
+            kernel.substitutions, kernel.get_var_name_generator())
+    slot_inserter = _BufferSlotInserter(rule_mapping_context, temporary_name,
+            insn_id_to_slot={
+                prologue_id: 0,
+                compute_insn_id: (p + 1 - lbound) % 2,
+                },
+            default_slot=(p - lbound) % 2)
+    kernel = rule_mapping_context.finish_kernel(
+            slot_inserter.map_kernel(kernel))
+
+    temp_var = temp_var.copy(
+            shape=(2,) + temp_var.shape,
+            base_indices=(0,) + temp_var.base_indices,
+            dim_names=(
+                (temporary_name+"_slot",) + temp_var.dim_names
+                if temp_var.dim_names is not None
+                else None),
+            address_space=address_space)
+
+    new_temporary_variables = kernel.temporary_variables.copy()
+    new_temporary_variables[temporary_name] = temp_var
+    kernel = kernel.copy(temporary_variables=new_temporary_variables)
+
+    # }}}
+
+    # {{{ give the prologue its own copies of the storage inames
+
+    new_iname_to_tag = new_iname_to_tag.copy()
+
+    if storage_inames:
+        name_gen = kernel.get_var_name_generator()
+        prologue_inames = [
+                name_gen(iname+"_prologue") for iname in storage_inames]
+
+        from loopy.transform.iname import duplicate_inames
+        kernel = duplicate_inames(kernel, storage_inames,
+                within="id:"+prologue_id, new_inames=prologue_inames)
+
+        from loopy.transform.iname import tag_inames
+        for iname, prologue_iname in zip(storage_inames, prologue_inames):
+            if iname in new_iname_to_tag:
+                new_iname_to_tag[prologue_iname] = new_iname_to_tag[iname]
+            else:
+                for tag in kernel.iname_tags(iname):
+                    kernel = tag_inames(kernel, {prologue_iname: tag})
+
+    # }}}
+
+    return kernel, new_iname_to_tag
+
+# }}}
+
+
 class _not_provided(object):  # noqa: N801
     pass
 
@@ -271,6 +563,7 @@ def precompute(kernel, subst_use, sweep_inames=[], within=None,
         fetch_bounding_box=False,
         temporary_address_space=None,
         compute_insn_id=None,
+        double_buffer_iname=None,
         **kwargs):
     """Precompute the expression described in the substitution rule determined by
     *subst_use* and store it in a temporary array. A precomputation needs two
@@ -349,6 +642,20 @@ def precompute(kernel, subst_use, sweep_inames=[], within=None,
     :arg compute_insn_id: The ID of the instruction generated to perform the
         precomputation.
 
+    :arg double_buffer_iname: If not *None*, the name of a sequential iname
+        around the precomputation across whose iterations to double-buffer
+        the temporary. The temporary gets a leading axis of length two. The
+        values for the first iteration are computed ahead of the loop, and
+        each iteration computes the values for the next iteration into one
+        slot while the uses read the other, so that fetching overlaps with
+        computation. For a local temporary, a single local barrier at the
+        start of each iteration then suffices. If no address space is given,
+        the temporary is made local if any precompute iname is tagged as a
+        local axis, and private otherwise. The extent of the precomputation
+        and the bounds of *double_buffer_iname* must not depend on other
+        inames, and the precomputed values must not be written within the
+        loop.
+
     If `storage_axes` is not specified, it defaults to the arrangement
     `<direct sweep axes><arguments>` with the direct sweep axes being the
     slower-varying indices.
@@ -966,6 +1273,11 @@ def precompute(kernel, subst_use, sweep_inames=[], within=None,
     new_temp_shape = tuple(abm.non1_storage_shape)
 
     new_temporary_variables = kernel.temporary_variables.copy()
+    if (double_buffer_iname is not None
+            and temporary_name in new_temporary_variables):
+        raise LoopyError("cannot double-buffer existing temporary '%s'"
+                % temporary_name)
+
     if temporary_name not in new_temporary_variables:
         temp_var = lp.TemporaryVariable(
                 name=temporary_name,
@@ -1034,6 +1346,11 @@ def precompute(kernel, subst_use, sweep_inames=[], within=None,
 
     # }}}
 
+    if double_buffer_iname is not None:
+        kernel, new_iname_to_tag = _add_double_buffering(
+                kernel, double_buffer_iname, temporary_name, compute_insn_id,
+                non1_storage_axis_names, new_iname_to_tag)
+
     from loopy import tag_inames
     kernel = tag_inames(kernel, new_iname_to_tag)
 
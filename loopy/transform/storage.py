@@ -0,0 +1,321 @@
+from __future__ import division, absolute_import
+
+__copyright__ = "Copyright (C) 2020 University of Illinois Board of Trustees"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import six
+
+from loopy.diagnostic import LoopyError
+from loopy.kernel.data import AddressSpace
+from loopy.schedule import (
+        EnterLoop, LeaveLoop, RunInstruction, CallKernel, ReturnFromKernel,
+        Barrier)
+from pytools import Record
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+__doc__ = """
+.. currentmodule:: loopy
+
+.. autofunction:: share_temporary_storage
+"""
+
+
+# {{{ live ranges
+
+def get_temporary_live_ranges(kernel):
+    """
+    :returns: a mapping from names of temporaries accessed in the schedule
+        of *kernel* to tuples ``(start, end)`` of schedule indices,
+        such that the temporary is not live outside of the items
+        ``kernel.schedule[start:end+1]``.
+    """
+    from loopy.schedule.tools import get_block_boundaries
+    block_bounds = get_block_boundaries(kernel.schedule)
+
+    access_indices = {}
+    for sched_idx, sched_item in enumerate(kernel.schedule):
+        if not isinstance(sched_item, RunInstruction):
+            continue
+
+        insn = kernel.id_to_insn[sched_item.insn_id]
+        for var_name in insn.dependency_names():
+            if var_name in kernel.temporary_variables:
+                access_indices.setdefault(var_name, []).append(sched_idx)
+
+    loops = [
+            (sched_idx, block_bounds[sched_idx])
+            for sched_idx, sched_item in enumerate(kernel.schedule)
+            if isinstance(sched_item, EnterLoop)]
+
+    result = {}
+    for var_name, indices in six.iteritems(access_indices):
+        start = min(indices)
+        end = max(indices)
+
+        for loop_start, loop_end in loops:
+            if any(loop_start < idx < loop_end for idx in indices):
+                start = min(start, loop_start)
+                end = max(end, loop_end)
+
+        result[var_name] = (start, end)
+
+    return result
+
+# }}}
+
+
+# {{{ share temporary storage
+
+class _StorageSlot(Record):
+    """
+    .. attribute:: address_space
+    .. attribute:: temporary_names
+    .. attribute:: nbytes
+    .. attribute:: end
+    """
+
+
+def _get_enclosing_loops(schedule):
+    result = []
+    active_loops = []
+
+    for sched_idx, sched_item in enumerate(schedule):
+        if isinstance(sched_item, EnterLoop):
+            active_loops.append(sched_idx)
+        result.append(frozenset(active_loops))
+        if isinstance(sched_item, LeaveLoop):
+            active_loops.pop()
+
+    return result
+
+
+def _is_synchronizing(sched_item, address_space):
+    if isinstance(sched_item, (CallKernel, ReturnFromKernel)):
+        return True
+
+    if address_space == AddressSpace.LOCAL:
+        return (isinstance(sched_item, Barrier)
+                and sched_item.mem_kind == "local")
+
+    return False
+
+
+def share_temporary_storage(kernel):
+    """Lets array temporaries whose live ranges do not overlap share storage.
+    The live range of a temporary spans all its accesses in the schedule,
+    widened to include every loop in which it is accessed, since, with
+    partial writes to arrays, values may be carried from one iteration of
+    the loop to the next.
+
+    Unlike :func:`alias_temporaries`, this finds the temporaries to alias
+    automatically and does not constrain the schedule. Instead, it requires
+    a linearized kernel and only lets temporaries share storage if the
+    schedule already orders their uses:
+
+    * Private temporaries may share storage with any temporary of the same
+      work item whose live range ends before theirs starts.
+
+    * Local temporaries additionally require a local barrier (or a kernel
+      boundary) between the two live ranges.
+
+    * Global temporaries require a kernel boundary between the two live
+      ranges. Since global temporaries are allocated individually, they
+      can only share storage with temporaries of identical type and shape,
+      by which they are then replaced.
+
+    Storage is assigned by greedily coloring the interval graph of the live
+    ranges, reusing the best-fitting storage area whose previous users are
+    no longer live. Private and local temporaries sharing storage are
+    backed by a common :attr:`loopy.TemporaryVariable.base_storage`.
+
+    This is applied automatically after scheduling if
+    :attr:`loopy.Options.share_temporary_storage` is set.
+
+    :returns: The resulting kernel
+    """
+    from loopy.kernel import KernelState
+    if kernel.state != KernelState.LINEARIZED:
+        raise LoopyError("share_temporary_storage requires a linearized kernel")
+
+    live_ranges = get_temporary_live_ranges(kernel)
+    enclosing_loops = _get_enclosing_loops(kernel.schedule)
+
+    def is_shareable(tv):
+        return (
+                tv.name in live_ranges
+                and tv.address_space in (
+                    AddressSpace.PRIVATE, AddressSpace.LOCAL,
+                    AddressSpace.GLOBAL)
+                and tv.base_storage is None
+                and tv.initializer is None
+                and not tv.read_only
+                and isinstance(tv.shape, tuple)
+                and len(tv.shape) > 0
+                and isinstance(tv.nbytes, int))
+
+    def is_ordered(slot, start):
+        if slot.end >= start:
+            return False
+
+        if slot.address_space == AddressSpace.PRIVATE:
+            return True
+
+        # The synchronizing item must be executed whenever both live ranges
+        # are, i.e. it may not be part of a loop entered after the first one.
+        return any(
+                _is_synchronizing(kernel.schedule[sched_idx], slot.address_space)
+                and enclosing_loops[sched_idx] <= enclosing_loops[slot.end]
+                for sched_idx in range(slot.end + 1, start))
+
+    def is_compatible(slot, tv):
+        if slot.address_space != tv.address_space:
+            return False
+
+        if tv.address_space == AddressSpace.GLOBAL:
+            representative = kernel.temporary_variables[slot.temporary_names[0]]
+            return tv.copy(name=representative.name) == representative
+
+        return True
+
+    def growth_and_waste(slot, tv):
+        return (max(0, tv.nbytes - slot.nbytes), abs(slot.nbytes - tv.nbytes))
+
+    slots = []
+
+    for tv in sorted(
+            (tv for tv in six.itervalues(kernel.temporary_variables)
+                if is_shareable(tv)),
+            key=lambda tv: (live_ranges[tv.name], tv.name)):
+        start, end = live_ranges[tv.name]
+
+        candidates = [
+                slot for slot in slots
+                if is_compatible(slot, tv) and is_ordered(slot, start)]
+
+        if candidates:
+            slot = min(candidates, key=lambda slot: growth_and_waste(slot, tv))
+            slot.temporary_names.append(tv.name)
+            slot.nbytes = max(slot.nbytes, tv.nbytes)
+            slot.end = end
+        else:
+            slots.append(_StorageSlot(
+                address_space=tv.address_space,
+                temporary_names=[tv.name],
+                nbytes=tv.nbytes,
+                end=end))
+
+    slots = [slot for slot in slots if len(slot.temporary_names) > 1]
+
+    if not slots:
+        return kernel
+
+    vng = kernel.get_var_name_generator()
+
+    new_temporary_variables = kernel.temporary_variables.copy()
+    renames = {}
+
+    for slot in slots:
+        logger.info("%s: sharing storage among %s" % (
+            kernel.name, ", ".join(slot.temporary_names)))
+
+        if slot.address_space == AddressSpace.GLOBAL:
+            representative_name = slot.temporary_names[0]
+            for name in slot.temporary_names[1:]:
+                renames[name] = representative_name
+                del new_temporary_variables[name]
+
+        else:
+            base_storage = vng("shared_temp_storage")
+            for name in slot.temporary_names:
+                new_temporary_variables[name] = new_temporary_variables[name].copy(
+                        base_storage=base_storage,
+                        # Accesses to temporaries sharing storage may not be
+                        # reordered across each other.
+                        _base_storage_access_may_be_aliasing=True)
+
+    # Order the uses of temporaries sharing storage by dependencies, so that
+    # they remain ordered if the kernel is scheduled again.
+    readers = kernel.reader_map()
+    writers = kernel.writer_map()
+
+    def get_accessors(name):
+        return readers.get(name, frozenset()) | writers.get(name, frozenset())
+
+    new_insn_deps = {}
+    for slot in slots:
+        for prev_name, name in zip(
+                slot.temporary_names, slot.temporary_names[1:]):
+            prev_accessors = get_accessors(prev_name)
+            for insn_id in get_accessors(name):
+                new_insn_deps[insn_id] = (
+                        new_insn_deps.get(insn_id, frozenset())
+                        | prev_accessors)
+
+    new_instructions = [
+            insn.copy(depends_on=insn.depends_on | new_insn_deps[insn.id])
+            if insn.id in new_insn_deps else insn
+            for insn in kernel.instructions]
+
+    kernel = kernel.copy(
+            instructions=new_instructions,
+            temporary_variables=new_temporary_variables)
+
+    if renames:
+        from pymbolic import var
+        from pymbolic.mapper.substitutor import make_subst_func
+        from loopy.symbolic import (
+                RuleAwareSubstitutionMapper,
+                SubstitutionRuleMappingContext)
+
+        rule_mapping_context = SubstitutionRuleMappingContext(
+                kernel.substitutions, vng)
+        smap = RuleAwareSubstitutionMapper(rule_mapping_context,
+                make_subst_func(dict(
+                    (old_name, var(new_name))
+                    for old_name, new_name in six.iteritems(renames))),
+                within=lambda knl, insn, stack: True)
+
+        kernel = smap.map_kernel(kernel)
+
+        new_schedule = []
+        for sched_item in kernel.schedule:
+            if isinstance(sched_item, CallKernel):
+                extra_args = []
+                for arg_name in sched_item.extra_args:
+                    arg_name = renames.get(arg_name, arg_name)
+                    if arg_name not in extra_args:
+                        extra_args.append(arg_name)
+
+                sched_item = sched_item.copy(extra_args=extra_args)
+
+            new_schedule.append(sched_item)
+
+        kernel = kernel.copy(schedule=new_schedule)
+
+    return kernel
+
+# }}}
+
+# vim: foldmethod=marker
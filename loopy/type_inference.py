@@ -404,7 +404,15 @@ class TypeInferenceMapper(CombineMapper):
 
 # {{{ infer single variable
 
-def _infer_var_type(kernel, var_name, type_inf_mapper, subst_expander):
+def _infer_var_type(kernel, var_name, type_inf_mapper, subst_expander,
+        writer_result_cache=None):
+    """
+    :arg writer_result_cache: if not *None*, a :class:`dict` used to memoize
+        the type inference result for each writer instruction. Entries are
+        keyed by the writer's instruction ID along with the currently known
+        types of the variables that it reads, so they remain valid while
+        those types remain unchanged.
+    """
     if var_name in kernel.all_params():
         return [kernel.index_dtype], []
 
@@ -412,23 +420,39 @@ def _infer_var_type(kernel, var_name, type_inf_mapper, subst_expander):
     debug = partial(_debug, kernel)
 
     dtype_sets = []
+    symbols_with_unknown_types = set()
 
     import loopy as lp
 
-    type_inf_mapper = type_inf_mapper.copy()
-
     for writer_insn_id in kernel.writer_map().get(var_name, []):
         writer_insn = kernel.id_to_insn[writer_insn_id]
         if not isinstance(writer_insn, lp.MultiAssignmentBase):
             continue
 
+        cache_key = None
+        if writer_result_cache is not None:
+            cache_key = (writer_insn_id, var_name, tuple(
+                    (dep_name, _get_known_dtype(type_inf_mapper, dep_name))
+                    for dep_name in sorted(writer_insn.read_dependency_names())))
+
+            try:
+                result, insn_unknown_symbols = writer_result_cache[cache_key]
+            except KeyError:
+                pass
+            else:
+                debug("             via cached result for %s", writer_insn_id)
+                dtype_sets.append(result)
+                symbols_with_unknown_types.update(insn_unknown_symbols)
+                continue
+
+        insn_type_inf_mapper = type_inf_mapper.copy()
         expr = subst_expander(writer_insn.expression)
 
         debug("             via expr %s", expr)
         if isinstance(writer_insn, lp.Assignment):
-            result = type_inf_mapper(expr, return_dtype_set=True)
+            result = insn_type_inf_mapper(expr, return_dtype_set=True)
         elif isinstance(writer_insn, lp.CallInstruction):
-            return_dtype_sets = type_inf_mapper(expr, return_tuple=True,
+            return_dtype_sets = insn_type_inf_mapper(expr, return_tuple=True,
                     return_dtype_set=True)
 
             result = []
@@ -448,14 +472,29 @@ def _infer_var_type(kernel, var_name, type_inf_mapper, subst_expander):
 
         debug("             result: %s", result)
 
+        if cache_key is not None:
+            writer_result_cache[cache_key] = (
+                    result,
+                    frozenset(insn_type_inf_mapper.symbols_with_unknown_types))
+
         dtype_sets.append(result)
+        symbols_with_unknown_types.update(
+                insn_type_inf_mapper.symbols_with_unknown_types)
 
     if not dtype_sets:
-        return None, type_inf_mapper.symbols_with_unknown_types
+        return None, symbols_with_unknown_types
 
     result = type_inf_mapper.combine(dtype_sets)
 
-    return result, type_inf_mapper.symbols_with_unknown_types
+    return result, symbols_with_unknown_types
+
+
+def _get_known_dtype(type_inf_mapper, name):
+    item = type_inf_mapper.new_assignments.get(name)
+    if item is None:
+        return None
+
+    return item.dtype
 
 # }}}
 
@@ -483,7 +522,12 @@ class _DictUnionView:
 # {{{ infer_unknown_types
 
 def infer_unknown_types(kernel, expect_completion=False):
-    """Infer types on temporaries and arguments."""
+    """Infer types on temporaries and arguments.
+
+    Inferred types are recorded on the returned kernel's temporaries and
+    arguments, so that subsequent calls on a kernel without unknown types
+    return immediately.
+    """
 
     logger.debug("%s: infer types" % kernel.name)
 
@@ -493,14 +537,6 @@ def infer_unknown_types(kernel, expect_completion=False):
     import time
     start_time = time.time()
 
-    unexpanded_kernel = kernel
-    if kernel.substitutions:
-        from loopy.transform.subst import expand_subst
-        kernel = expand_subst(kernel)
-
-    new_temp_vars = kernel.temporary_variables.copy()
-    new_arg_dict = kernel.arg_dict.copy()
-
     # {{{ find names_with_unknown_types
 
     # contains both arguments and temporaries
@@ -519,6 +555,19 @@ def infer_unknown_types(kernel, expect_completion=False):
 
     # }}}
 
+    if not names_for_type_inference:
+        logger.debug("%s: all types known, skipping type inference"
+                % kernel.name)
+        return kernel
+
+    unexpanded_kernel = kernel
+    if kernel.substitutions:
+        from loopy.transform.subst import expand_subst
+        kernel = expand_subst(kernel)
+
+    new_temp_vars = kernel.temporary_variables.copy()
+    new_arg_dict = kernel.arg_dict.copy()
+
     logger.debug("finding types for {count:d} names".format(
             count=len(names_for_type_inference)))
 
@@ -532,6 +581,13 @@ def infer_unknown_types(kernel, expect_completion=False):
                 if read_var in names_for_type_inference))
             for written_var in names_for_type_inference)
 
+    # maps a variable to the variables whose type depends on it
+    reverse_dep_graph = dict(
+            (name, set()) for name in names_for_type_inference)
+    for written_var, read_vars in six.iteritems(dep_graph):
+        for read_var in read_vars:
+            reverse_dep_graph[read_var].add(written_var)
+
     from pytools.graph import compute_sccs
 
     # To speed up processing, we sort the variables by computing the SCCs of the
@@ -549,36 +605,34 @@ def infer_unknown_types(kernel, expect_completion=False):
     from loopy.symbolic import SubstitutionRuleExpander
     subst_expander = SubstitutionRuleExpander(kernel.substitutions)
 
+    writer_result_cache = {}
+
     # {{{ work on type inference queue
 
+    from collections import deque
     from loopy.kernel.data import TemporaryVariable, KernelArgument
 
     for var_chain in sccs:
-        changed_during_last_queue_run = False
-        queue = var_chain[:]
-        failed_names = set()
+        scc_names = frozenset(var_chain)
 
-        while queue or changed_during_last_queue_run:
-            if not queue and changed_during_last_queue_run:
-                changed_during_last_queue_run = False
-                # Optimization: If there's a single variable in the SCC without
-                # a self-referential dependency, then the type is known after a
-                # single iteration (we don't need to look at the expressions
-                # again).
-                if len(var_chain) == 1:
-                    single_var, = var_chain
-                    if single_var not in dep_graph[single_var]:
-                        break
-                queue = var_chain[:]
+        # Only variables whose writers may have changed their types are
+        # (re-)queued: initially all of them, then only the dependents of
+        # variables whose type changed.
+        queue = deque(var_chain)
+        queued_names = set(var_chain)
+        failed_names = set()
 
-            name = queue.pop(0)
+        while queue:
+            name = queue.popleft()
+            queued_names.remove(name)
             item = item_lookup[name]
 
             debug("inferring type for %s %s", type(item).__name__, item.name)
 
             result, symbols_with_unavailable_types = (
                     _infer_var_type(
-                            kernel, item.name, type_inf_mapper, subst_expander))
+                            kernel, item.name, type_inf_mapper, subst_expander,
+                            writer_result_cache))
 
             failed = not result
             if not failed:
@@ -589,7 +643,6 @@ def infer_unknown_types(kernel, expect_completion=False):
                 debug("     success: %s", new_dtype)
                 if new_dtype != item.dtype:
                     debug("     changed from: %s", item.dtype)
-                    changed_during_last_queue_run = True
 
                     if isinstance(item, TemporaryVariable):
                         new_temp_vars[name] = item.copy(dtype=new_dtype)
@@ -597,10 +650,18 @@ def infer_unknown_types(kernel, expect_completion=False):
                         new_arg_dict[name] = item.copy(dtype=new_dtype)
                     else:
                         raise LoopyError("unexpected item type in type inference")
+
+                    # we've made progress, reset failure markers
+                    failed_names = set()
+
+                    for dep_name in reverse_dep_graph[name] & scc_names:
+                        if dep_name not in queued_names:
+                            queue.append(dep_name)
+                            queued_names.add(dep_name)
+
             else:
                 debug("     failure")
 
-            if failed:
                 if item.name in failed_names:
                     # this item has failed before, give up.
                     advice = ""
@@ -621,17 +682,9 @@ def infer_unknown_types(kernel, expect_completion=False):
                 # remember that this item failed
                 failed_names.add(item.name)
 
-                if set(queue) == failed_names:
-                    # We did what we could...
-                    print(queue, failed_names, item.name)
-                    assert not expect_completion
-                    break
-
                 # can't infer type yet, put back into queue
                 queue.append(name)
-            else:
-                # we've made progress, reset failure markers
-                failed_names = set()
+                queued_names.add(name)
 
     # }}}
 
@@ -353,6 +353,410 @@ def test_missing_compilers():
         __test(eval_tester, ExecutableCTarget, compiler=ccomp)
 
 
+def test_c_stream_code_to_disk():
+    from loopy.target.c import ExecutableCTarget
+    from loopy.codegen.result import write_code_to_store
+    import os
+
+    knl = lp.make_kernel(
+            "{ [i, j]: 0<=i, j<n }",
+            "out[i, j] = 2*a[i, j]",
+            [
+                lp.GlobalArg("out", np.float32, shape=lp.auto),
+                lp.GlobalArg("a", np.float32, shape=lp.auto),
+                "..."
+                ],
+            target=ExecutableCTarget())
+    knl = lp.split_iname(knl, "j", 4, inner_tag="unr")
+
+    codegen_result = lp.generate_code_v2(knl)
+
+    from six import StringIO
+    for method in ["host_code", "device_code", "all_code"]:
+        outf = StringIO()
+        getattr(codegen_result, "write_" + method)(outf)
+        assert outf.getvalue() == getattr(codegen_result, method)()
+
+    # stored by content
+    store_dir = knl.target.compiler.tempdir
+    path = write_code_to_store(codegen_result.write_device_code, store_dir, "c")
+    assert write_code_to_store(
+            codegen_result.write_device_code, store_dir, "c") == path
+    with open(path) as inf:
+        assert inf.read() == codegen_result.device_code()
+    os.unlink(path)
+
+    knl = lp.set_options(knl, stream_code_to_disk=True)
+    a = np.random.rand(10, 10).astype(np.float32)
+    _, (out,) = knl(a=a)
+    assert np.allclose(out, 2*a)
+
+    kex = knl.target.get_kernel_executor(knl)
+    c_kernel, = kex.kernel_info(kex.arg_to_dtype_set(dict(a=a))).c_kernels
+    assert c_kernel.code is None
+    assert os.path.exists(c_kernel.source_path)
+
+    # code streamed to disk is written from the ASTs, not from a compact
+    # copy of the code text
+    from loopy.codegen import generate_code_for_execution
+    from loopy.codegen.result import CodeGenerationResult
+    assert isinstance(
+            generate_code_for_execution(
+                kex.get_typed_and_scheduled_kernel(
+                    kex.arg_to_dtype_set(dict(a=a))),
+                keep_ast=True),
+            CodeGenerationResult)
+
+
+def test_c_kernel_bundle(tmpdir, monkeypatch):
+    from loopy.target.c import ExecutableCTarget
+    from loopy.target.c.c_execution import CCompiler, CKernelExecutor
+
+    knl = lp.make_kernel(
+            "{ [i]: 0<=i<n }",
+            "out[i] = 2*a[i]",
+            target=ExecutableCTarget())
+
+    a = np.random.rand(10)
+    path = str(tmpdir.join("kernels.bundle"))
+    lp.export_bundle([
+        (knl.target.get_kernel_executor(knl), dict(a=a.dtype))
+        ], path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("kernel not taken from bundle")
+
+    monkeypatch.setattr(lp, "CACHING_ENABLED", False)
+    monkeypatch.setattr(CCompiler, "build", fail)
+    monkeypatch.setattr(CKernelExecutor, "get_invoker_uncached", fail)
+    monkeypatch.setattr(
+            CKernelExecutor, "get_typed_and_scheduled_kernel_uncached", fail)
+    monkeypatch.setattr("loopy.codegen.generate_code_v2", fail)
+
+    with lp.load_bundle(path):
+        _, (out,) = knl.target.get_kernel_executor(knl)(a=a)
+    assert np.allclose(out, 2*a)
+
+    with pytest.raises(AssertionError):
+        knl.target.get_kernel_executor(knl)(a=a)
+
+
+def test_c_invoker_sharing():
+    from loopy.target.c import ExecutableCTarget
+    from loopy.codegen import generate_code_for_execution
+    from loopy.tools import LoopyKeyBuilder
+    from pickle import loads, dumps
+
+    knl = lp.make_kernel(
+            "{ [i]: 0<=i<n }",
+            "out[i] = 2*a[i]",
+            [
+                lp.GlobalArg("out", np.float64, shape=lp.auto),
+                lp.GlobalArg("a", np.float64, shape=lp.auto),
+                "..."
+                ],
+            target=ExecutableCTarget())
+
+    def get_invoker_cache_key(knl):
+        kex = knl.target.get_kernel_executor(knl)
+        sched_knl = kex.get_typed_and_scheduled_kernel(None)
+        return LoopyKeyBuilder()(kex.get_invoker_cache_key(
+            sched_knl, generate_code_for_execution(sched_knl)))
+
+    # the invoker does not depend on the loop structure
+    assert (get_invoker_cache_key(knl)
+            == get_invoker_cache_key(lp.split_iname(knl, "i", 4)))
+    assert (get_invoker_cache_key(knl)
+            != get_invoker_cache_key(lp.set_options(knl, return_dict=True)))
+
+    kex = knl.target.get_kernel_executor(knl)
+    kernel_info = kex.kernel_info(None)
+    invoker = loads(dumps(kernel_info.invoker))
+
+    a = np.random.rand(10)
+    _, (out,) = invoker(kernel_info.c_kernels, a=a)
+    assert np.allclose(out, 2*a)
+
+
+def test_c_integer_arg_caching():
+    from loopy.target.c import ExecutableCTarget
+
+    knl = lp.make_kernel(
+            "{ [i, j]: 0<=i<n and 0<=j<m }",
+            "out[i, j] = 2*a[i, j]",
+            [
+                lp.GlobalArg("out", np.float64, shape=lp.auto),
+                lp.GlobalArg("a", np.float64, shape=("n", "m")),
+                "..."
+                ],
+            target=ExecutableCTarget())
+
+    kex = knl.target.get_kernel_executor(knl)
+    kernel_info = kex.kernel_info(None)
+    integer_arg_cache = kernel_info.invoker.func.__globals__[
+            "_lpy_integer_arg_cache"]
+
+    for shape in [(3, 4), (5, 2), (3, 4)]:
+        a = np.random.rand(*shape)
+        _, (out,) = kernel_info.invoker(kernel_info.c_kernels, a=a)
+        assert out.shape == shape
+        assert np.allclose(out, 2*a)
+
+    # each shape signature is only solved for once
+    assert len(integer_arg_cache) == 2
+
+    # explicitly passed integer arguments take part in the key
+    a = np.random.rand(2, 4)
+    _, (out,) = kernel_info.invoker(kernel_info.c_kernels, a=a, n=2)
+    assert np.allclose(out, 2*a)
+    assert len(integer_arg_cache) == 3
+
+    # value arguments that cannot be found from arrays are not part of the key
+    knl = lp.make_kernel(
+            "{ [i]: 0<=i<n }",
+            "out[i] = alpha*a[i]",
+            [
+                lp.GlobalArg("out", np.float64, shape=lp.auto),
+                lp.GlobalArg("a", np.float64, shape="n"),
+                lp.ValueArg("alpha", np.float64),
+                "..."
+                ],
+            target=ExecutableCTarget())
+
+    kex = knl.target.get_kernel_executor(knl)
+    kernel_info = kex.kernel_info(None)
+    integer_arg_cache = kernel_info.invoker.func.__globals__[
+            "_lpy_integer_arg_cache"]
+
+    a = np.random.rand(10)
+    for alpha in [1.0, 2.0, 3.0]:
+        _, (out,) = kernel_info.invoker(kernel_info.c_kernels, a=a, alpha=alpha)
+        assert np.allclose(out, alpha*a)
+
+    assert len(integer_arg_cache) == 1
+
+
+def test_c_autotune():
+    from loopy.target.c import ExecutableCTarget
+    from loopy.autotune import SearchSpace, autotune, get_tuned_kernel
+
+    knl = lp.make_kernel(
+            "{ [i]: 0<=i<n }",
+            "out[i] = 2*a[i]",
+            [
+                lp.GlobalArg("out", np.float64, shape="n"),
+                lp.GlobalArg("a", np.float64, shape="n"),
+                "..."
+                ],
+            target=ExecutableCTarget())
+
+    def transform(knl, chunk, unroll):
+        knl = lp.split_iname(knl, "i", chunk)
+        if unroll:
+            knl = lp.tag_inames(knl, {"i_inner": "unr"})
+        return knl
+
+    space = SearchSpace(transform, {"chunk": [1, 4, 16], "unroll": [False, True]},
+            constraint=lambda chunk, unroll: not (unroll and chunk == 1))
+    assert len(space) == 5
+
+    database = {}
+    result = autotune(knl, space, {"n": 1000}, database=database, ntrials=2)
+    assert not result.from_database
+    assert len(result.candidates) == 5
+    assert all(cand.times for cand in result.candidates)
+    assert result.time == min(cand.time for cand in result.candidates)
+
+    a = np.random.rand(1000)
+    _, (out,) = result.kernel(a=a)
+    assert np.allclose(out, 2*a)
+
+    # sizes in the same bucket reuse the result
+    result2 = autotune(knl, space, {"n": 900}, database=database)
+    assert result2.from_database
+    assert result2.config == result.config
+
+    assert get_tuned_kernel(knl, space, {"n": 1000}, database=database) \
+            is not None
+    assert get_tuned_kernel(knl, space, {"n": 3000}, database=database) is None
+
+    # a different transform over the same parameters has its own results
+    other_space = SearchSpace(
+            lambda knl, chunk, unroll: transform(knl, 2*chunk, unroll),
+            space.parameters, name="other_transform")
+    assert get_tuned_kernel(
+            knl, other_space, {"n": 1000}, database=database) is None
+
+    result = autotune(knl, space, {"n": 1000}, database=database,
+            strategy="random", max_candidates=2, ntrials=2, force=True)
+    assert len(result.candidates) == 2
+
+    def model(knl, parameters):
+        # predicts unrolled candidates to be fastest
+        return 0 if knl.iname_tags("i_inner") else 1
+
+    result = autotune(knl, space, {"n": 1000}, database=database,
+            strategy="model", max_candidates=1, ntrials=2, force=True,
+            model=model)
+    timed = [cand for cand in result.candidates if cand.times]
+    assert len(timed) == 1
+    assert result.config["unroll"]
+
+    # arguments are created for the layout of each candidate
+    mat_knl = lp.make_kernel(
+            "{ [i, j]: 0<=i,j<n }",
+            "out[i, j] = 2*a[i, j]",
+            [
+                lp.GlobalArg("out", np.float64, shape=("n", "n")),
+                lp.GlobalArg("a", np.float64, shape=("n", "n")),
+                "..."
+                ],
+            target=ExecutableCTarget())
+
+    layout_space = SearchSpace(
+            lambda knl, order: lp.tag_array_axes(knl, "a", order),
+            {"order": ["c,c", "f,f"]})
+    result = autotune(mat_knl, layout_space, {"n": 64}, database={},
+            ntrials=2)
+    assert all(cand.times for cand in result.candidates)
+
+
+def test_c_multiversioned_kernel():
+    from loopy.target.c import ExecutableCTarget
+    from loopy.multiversion import MultiVersionedKernel
+
+    knl = lp.make_kernel(
+            "{ [i]: 0<=i<n }",
+            "out[i] = 2*a[i]",
+            [
+                lp.GlobalArg("out", np.float64, shape="n"),
+                lp.GlobalArg("a", np.float64, shape="n"),
+                "..."
+                ],
+            target=ExecutableCTarget())
+
+    mv_knl = MultiVersionedKernel(knl, [
+        ("n mod 16 = 0", lambda knl: lp.split_iname(
+            knl, "i", 16, inner_tag="unr")),
+        ("n < 64", None),
+        ])
+    assert len(mv_knl.versions) == 3
+    assert mv_knl.param_names == frozenset(["n"])
+
+    for n, expected_version in [(128, 0), (48, 0), (30, 1), (100, 2)]:
+        a = np.random.rand(n)
+
+        assert mv_knl.get_version(a=a) is mv_knl.versions[expected_version]
+        assert mv_knl.get_version(n=n) is mv_knl.versions[expected_version]
+
+        _, (out,) = mv_knl(a=a)
+        assert np.allclose(out, 2*a)
+
+    # n cannot be found
+    assert mv_knl.get_version() is mv_knl.versions[-1]
+
+    # the chosen versions are only remembered for recent parameter values
+    mv_knl = MultiVersionedKernel(knl, [("n mod 16 = 0", None)],
+            max_memo_size=2)
+    for n in range(1, 40):
+        assert (mv_knl.get_version(n=n) is mv_knl.versions[0]) == (n % 16 == 0)
+    assert len(mv_knl._param_values_to_version) == 2
+
+    # a model overrides the order of the versions
+    mv_knl = MultiVersionedKernel(knl, [("n mod 16 = 0", None)],
+            model=lambda version_knl, parameters: int(version_knl is not knl))
+    assert mv_knl.get_version(n=32) is mv_knl.versions[-1]
+
+
+def test_c_calibrate_machine_model():
+    from loopy.target.c import ExecutableCTarget
+    from loopy.perfmodel import calibrate_machine_model, get_time_predictor
+    from loopy.autotune import SearchSpace, autotune
+
+    database = {}
+    machine = calibrate_machine_model(cache_size=2**18, dtypes=(np.float64,),
+            ntrials=2, min_trial_time=1e-4, database=database)
+
+    assert machine.cache_size == 2**18
+    assert machine.memory_bandwidth > 0
+    assert machine.cache_bandwidth > 0
+    assert machine.flop_rates["float64"] > 0
+    assert machine.launch_latency > 0
+
+    assert calibrate_machine_model(cache_size=2**18, dtypes=(np.float64,),
+            database=database) is machine
+
+    knl = lp.make_kernel(
+            "{ [i]: 0<=i<n }",
+            "out[i] = 2*a[i]",
+            [
+                lp.GlobalArg("out", np.float64, shape="n"),
+                lp.GlobalArg("a", np.float64, shape="n"),
+                "..."
+                ],
+            target=ExecutableCTarget())
+
+    predict = get_time_predictor(machine, subgroup_size=1)
+    assert predict(knl, {"n": 2**20}) > predict(knl, {"n": 2**10}) > 0
+
+    def transform(knl, chunk):
+        return lp.split_iname(knl, "i", chunk)
+
+    space = SearchSpace(transform, {"chunk": [4, 16]})
+    result = autotune(knl, space, {"n": 2**14}, database={},
+            strategy="model", max_candidates=1, ntrials=2, model=predict)
+    assert len([cand for cand in result.candidates if cand.times]) == 1
+
+
+def test_c_auto_test_vs_ref():
+    from loopy.diagnostic import AutomaticTestFailure
+
+    ref_knl = lp.make_kernel(
+            "{ [i, j]: 0<=i<n and 0<=j<n }",
+            "out[i] = sum(j, a[i, j]*x[j])",
+            [
+                lp.GlobalArg("out", np.float64, shape="n"),
+                lp.GlobalArg("a", np.float64, shape=("n", "n")),
+                lp.GlobalArg("x", np.float64, shape="n"),
+                "..."
+                ],
+            name="matvec")
+
+    knl = lp.split_iname(ref_knl, "i", 4)
+    knl = lp.tag_array_axes(knl, "a", "f,f")
+
+    results = lp.auto_test_vs_ref_on_cpu(ref_knl, knl, parameters={"n": 64},
+            ntrials=3, min_trial_time=1e-4)
+
+    result, = results
+    assert len(result.times) == 3
+    assert result.nwarmup_rounds >= 1
+    assert result.iqr >= 0
+    assert result.min <= result.median
+    assert result.flops == 2*64*64
+    assert result.nbytes == 8*(2*64*64 + 64)
+    assert result.flop_rate > 0
+    assert result.byte_rate > 0
+
+    # the autotuner times kernels the same way
+    from loopy.target.c import ExecutableCTarget
+    from loopy.autotune import time_kernel, make_arguments
+    exec_knl = knl.copy(target=ExecutableCTarget())
+    timing = time_kernel(exec_knl, make_arguments(exec_knl, {"n": 64}),
+            ntrials=3, min_trial_time=1e-4)
+    assert len(timing.times) == 3
+    assert timing.nwarmup_rounds >= 1
+
+    bad_knl = lp.make_kernel(
+            "{ [i, j]: 0<=i<n and 0<=j<n }",
+            "out[i] = sum(j, a[j, i]*x[j])",
+            ref_knl.args, name="matvec")
+
+    with pytest.raises(AutomaticTestFailure):
+        lp.auto_test_vs_ref_on_cpu(ref_knl, bad_knl, parameters={"n": 64},
+                ntrials=1, min_trial_time=0)
+
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         exec(sys.argv[1])
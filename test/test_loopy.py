@@ -149,6 +149,98 @@ def test_type_inference_with_type_dependencies():
     assert knl.temporary_variables["c"].dtype == to_loopy_type(np.float32)
     assert knl.temporary_variables["d"].dtype == to_loopy_type(np.complex128)
 
+    # all types are known, nothing left to infer
+    assert lp.infer_unknown_types(knl) is knl
+
+
+def _record_type_inferences(monkeypatch):
+    """Make calls of :func:`loopy.infer_unknown_types` record the variables
+    whose types are inferred, and the writer result cache used.
+    """
+    import loopy.type_inference as type_inference
+    orig_infer_var_type = type_inference._infer_var_type
+
+    inferred_names = []
+    writer_result_caches = []
+
+    def infer_var_type(kernel, var_name, type_inf_mapper, subst_expander,
+            writer_result_cache=None):
+        inferred_names.append(var_name)
+        writer_result_caches.append(writer_result_cache)
+        return orig_infer_var_type(kernel, var_name, type_inf_mapper,
+                subst_expander, writer_result_cache)
+
+    monkeypatch.setattr(type_inference, "_infer_var_type", infer_var_type)
+    return inferred_names, writer_result_caches
+
+
+def test_type_inference_requeues_only_dependents(monkeypatch):
+    knl = lp.make_kernel(
+            "{[i]: i=0}",
+            """
+            <>x = 1.5
+            <>y = 2  {id=y_def}
+            <>b = 0
+            b = b + y + 1.0
+            <>z = x + 1
+            """,
+            "...")
+
+    inferred_names, writer_result_caches = _record_type_inferences(monkeypatch)
+
+    knl = lp.infer_unknown_types(knl)
+
+    # b depends on its own type, so it is inferred again after that changed.
+    # None of the other types is inferred more than once.
+    assert inferred_names.count("x") == 1
+    assert inferred_names.count("y") == 1
+    assert inferred_names.count("z") == 1
+    assert inferred_names.count("b") > 1
+
+    # a changed writer: only the types that were reset are inferred again
+    del inferred_names[:]
+    knl = knl.copy(
+            instructions=[
+                insn.copy(expression=2.5) if insn.id == "y_def" else insn
+                for insn in knl.instructions],
+            temporary_variables=dict(
+                (name, tv.copy(dtype=None) if name in ["y", "b"] else tv)
+                for name, tv in six.iteritems(knl.temporary_variables)))
+
+    new_knl = lp.infer_unknown_types(knl)
+
+    assert set(inferred_names) == set(["y", "b"])
+    assert new_knl.temporary_variables["y"].dtype.numpy_dtype.kind == "f"
+    assert new_knl.temporary_variables["b"].dtype.numpy_dtype.kind == "f"
+    for name in ["x", "z"]:
+        assert (new_knl.temporary_variables[name]
+                is knl.temporary_variables[name])
+
+
+def test_type_inference_writer_result_cache(monkeypatch):
+    knl = lp.make_kernel(
+            "{[i]: i=0}",
+            """
+            <>y = 2
+            <>b = 0
+            b = b + y + 1.0
+            """,
+            "...")
+
+    inferred_names, writer_result_caches = _record_type_inferences(monkeypatch)
+
+    lp.infer_unknown_types(knl)
+
+    writer_result_cache = writer_result_caches[-1]
+    assert all(cache is writer_result_cache for cache in writer_result_caches)
+
+    # each inference of b looks at both of its writers, but the result of
+    # 'b = 0' does not depend on any type and is only computed once
+    nb_inferences = inferred_names.count("b")
+    assert nb_inferences > 1
+    b_entries = [key for key in writer_result_cache if key[1] == "b"]
+    assert len(b_entries) < 2*nb_inferences
+
 
 def test_sized_and_complex_literals(ctx_factory):
     ctx = ctx_factory()
@@ -2886,6 +2978,128 @@ def test_empty_domain(ctx_factory, tag):
     assert (c.get() == 0).all()
 
 
+def test_box_bounds_checks(ctx_factory):
+    import islpy as isl
+    from loopy.isl_helpers import is_box_set
+    from loopy.codegen.bounds import (
+            get_box_bounds_checks, get_approximate_convex_bounds_checks)
+
+    dom = isl.BasicSet("[n, m] -> {[i, j]: 0<=i<n and 0<=j<m}")
+    impl_dom = isl.BasicSet("[n, m] -> {[j]: 0<=j<m}")
+    assert is_box_set(dom)
+    assert not is_box_set(
+            isl.BasicSet("[n] -> {[i, j]: 0<=i<n and 0<=j<i}"))
+
+    def as_set(constraints):
+        result = isl.BasicSet.universe(dom.space)
+        for cns in constraints:
+            result = result.add_constraint(cns)
+        return result
+
+    # the second domain has a constraint involving only parameters
+    param_dom = isl.BasicSet("[n, m] -> {[i, j]: 0<=i<n and 0<=j<m and n>=3}")
+    assert is_box_set(param_dom)
+
+    for box_dom in [dom, param_dom]:
+        for check_inames in [frozenset(["i"]), frozenset(["i", "j"])]:
+            assert as_set(get_box_bounds_checks(
+                box_dom, check_inames, impl_dom)) == as_set(
+                        get_approximate_convex_bounds_checks(
+                            box_dom, check_inames, impl_dom))
+
+    ctx = ctx_factory()
+
+    knl = lp.make_kernel(
+            "{[i, j]: 0<=i<n and 0<=j<m}",
+            "out[i, j] = 2*a[i, j]")
+    knl = lp.add_and_infer_dtypes(knl, {"a": np.float32})
+    knl = lp.tag_inames(knl, "i:g.0, j:l.0")
+
+    box_knl = lp.set_options(knl, box_bounds_checks=True)
+    assert (lp.generate_code_v2(box_knl).device_code()
+            == lp.generate_code_v2(knl).device_code())
+
+    lp.auto_test_vs_ref(knl, ctx, box_knl, parameters=dict(n=5, m=7))
+
+
+def test_box_domain_bounds():
+    knl = lp.make_kernel(
+            ["{[i, j]: 0<=i<n and 1<=j<=m and j>=n-5}",
+                "{[k]: 0<=k<=i}"],
+            "out[i, j, k] = 1",
+            assumptions="n>=1")
+
+    box_bound_affs = knl._get_box_iname_bound_affs()
+    assert set(box_bound_affs) == set(["i", "j"])
+
+    dom = knl.domains[0] & knl.assumptions.align_params(knl.domains[0].space)
+    for iname in ["i", "j"]:
+        idx = dom.get_var_dict()[iname][1]
+        bounds = knl.get_iname_bounds(iname)
+        assert bounds.lower_bound_pw_aff.is_equal(dom.dim_min(idx))
+        assert bounds.upper_bound_pw_aff.is_equal(dom.dim_max(idx))
+
+    knl = lp.fix_parameters(knl, n=5, m=4)
+    assert knl.get_constant_iname_length("i") == 5
+    assert knl.get_constant_iname_length("j") == 4
+
+    from loopy.statistics import _count_box_set
+    count = _count_box_set(knl.domains[0])
+    assert count.eval_with_dict({}) == 20
+
+    # constraints involving only parameters restrict the domain as a whole
+    import islpy as isl
+    param_dom = isl.BasicSet("[n, m] -> {[i]: 0<=i<n and m>=3}")
+    count = _count_box_set(param_dom)
+    assert count.eval_with_dict(dict(n=5, m=2)) == 0
+    assert count.eval_with_dict(dict(n=5, m=3)) == 5
+
+    knl = lp.make_kernel(
+            "{[i]: 0<=i<n and m>=3}",
+            "out[i] = 1")
+    dom = knl.domains[0] & knl.assumptions.align_params(knl.domains[0].space)
+    bounds = knl.get_iname_bounds("i")
+    assert bounds.lower_bound_pw_aff.is_equal(dom.dim_min(0))
+    assert bounds.upper_bound_pw_aff.is_equal(dom.dim_max(0))
+
+
+def test_parallel_subkernel_codegen(monkeypatch):
+    knl = lp.make_kernel(
+            "{[i, j, k]: 0<=i, j, k<n}",
+            """
+            a[i] = 2*b[i] {id=first}
+            ... gbarrier {id=gb1, dep=first}
+            c[j] = a[j] + 1 {id=second, dep=gb1}
+            ... gbarrier {id=gb2, dep=second}
+            d[k] = c[k] * a[k] {dep=gb2}
+            """)
+    knl = lp.add_and_infer_dtypes(knl, {"b": np.float32})
+    for iname in ["i", "j", "k"]:
+        knl = lp.split_iname(knl, iname, 16, outer_tag="g.0", inner_tag="l.0")
+
+    monkeypatch.setattr(lp, "CACHING_ENABLED", False)
+
+    from loopy.codegen.control import PregeneratedSubkernels
+    used_pregenerated = []
+    orig_get = PregeneratedSubkernels.get
+
+    def get(self, codegen_state, sched_index):
+        result = orig_get(self, codegen_state, sched_index)
+        used_pregenerated.append(result is not None)
+        return result
+
+    monkeypatch.setattr(PregeneratedSubkernels, "get", get)
+
+    ref_result = lp.generate_code_v2(knl)
+    result = lp.generate_code_v2(
+            lp.set_options(knl, parallel_subkernel_codegen=2))
+
+    assert len(result.device_programs) == 3
+    assert used_pregenerated == [True, True, True]
+    assert result.device_code() == ref_result.device_code()
+    assert result.host_code() == ref_result.host_code()
+
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         exec(sys.argv[1])
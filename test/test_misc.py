@@ -26,6 +26,7 @@ import six  # noqa
 import pytest
 
 import sys
+import numpy as np
 
 import logging
 logger = logging.getLogger(__name__)
@@ -282,6 +283,171 @@ def test_Optional():  # noqa
     # }}}
 
 
+def test_instruction_set_interning():
+    import loopy as lp
+    from loopy.tools import intern_frozenset
+
+    knl = lp.make_kernel(
+            "{[i, j]: 0<=i,j<n}",
+            """
+            a[i, j] = 1 {groups=g}
+            b[i, j] = 2 {groups=g}
+            """)
+
+    insn_a, insn_b = knl.instructions
+    assert insn_a.within_inames is insn_b.within_inames
+    assert insn_a.groups is insn_b.groups
+
+    # copies keep sharing the interned sets
+    insn_a_copy = insn_a.copy(id="a_copy")
+    assert insn_a_copy.within_inames is insn_a.within_inames
+
+    from pickle import loads, dumps
+    assert loads(dumps(insn_a)).within_inames is insn_a.within_inames
+
+    assert intern_frozenset(["i", "j"]) is insn_a.within_inames
+
+    # equal predicates of different types are not shared
+    from pymbolic import var
+    from pymbolic.primitives import Comparison
+    pred_int = lp.Assignment("x", 1,
+            predicates=frozenset([Comparison(var("i"), ">", 1)]))
+    pred_float = lp.Assignment("x", 1,
+            predicates=frozenset([Comparison(var("i"), ">", 1.0)]))
+    pred, = pred_float.predicates
+    assert isinstance(pred.right, float)
+    assert pred_int.predicates is not pred_float.predicates
+
+
+def test_expression_hash_digest_caching():
+    import loopy as lp
+    from loopy.tools import LoopyKeyBuilder, PymbolicExpressionHashWrapper
+    from loopy.symbolic import parse
+
+    expr = parse("a[i] + 2*b[i, j]")
+    key = LoopyKeyBuilder()(PymbolicExpressionHashWrapper(expr))
+
+    # cached digest, stored on the expression
+    assert LoopyKeyBuilder()(PymbolicExpressionHashWrapper(expr)) == key
+    # equal, but separately created expression
+    assert LoopyKeyBuilder()(
+            PymbolicExpressionHashWrapper(parse("a[i] + 2*b[i, j]"))) == key
+    assert LoopyKeyBuilder()(
+            PymbolicExpressionHashWrapper(parse("a[i] + 3*b[i, j]"))) != key
+
+    knl = lp.make_kernel(
+            "{[i]: 0<=i<n}",
+            """
+            f(x) := 2*x
+            out[i] = f(a[i])
+            """)
+    knl_copy = knl.copy()
+    assert hash(knl) == hash(knl_copy)
+    assert LoopyKeyBuilder()(knl) == LoopyKeyBuilder()(knl_copy)
+    assert hash(knl) != hash(knl.copy(name="other_name"))
+
+
+def test_set_operation_cache():
+    import islpy as isl
+    from loopy.kernel.tools import (
+            SetOperationCacheManager, _SetOperationLRUCache)
+
+    dom = isl.BasicSet("[n] -> {[i]: 0<=i<n}")
+    # an equal, but separately created set
+    dom_copy = isl.BasicSet("[n] -> {[i]: 0<=i<n}")
+
+    # results are shared between cache managers (e.g. of kernel copies)
+    result = SetOperationCacheManager().dim_max(dom, 0)
+    assert SetOperationCacheManager().dim_max(dom_copy, 0) is result
+    assert SetOperationCacheManager().dim_min(dom, 0) is not result
+
+    # sets differing only in dimension names are not confused
+    dom_j = isl.BasicSet("[n] -> {[j]: 0<=j<n}")
+    combined = SetOperationCacheManager().combine((dom, dom))
+    combined_j = SetOperationCacheManager().combine((dom_j, dom_j))
+    assert "j" in combined_j.get_var_dict()
+    assert "j" not in combined.get_var_dict()
+
+    calls = []
+
+    def op(set, arg):
+        calls.append(arg)
+        return arg
+
+    cache = _SetOperationLRUCache(max_size=2)
+    cache.get_or_compute(dom, "op", op, (0,))
+    cache.get_or_compute(dom, "op", op, (1,))
+    cache.get_or_compute(dom_copy, "op", op, (0,))
+    assert calls == [0, 1]
+
+    # evicts the least recently used entry, i.e. (dom, 1)
+    cache.get_or_compute(dom, "op", op, (2,))
+    cache.get_or_compute(dom, "op", op, (0,))
+    cache.get_or_compute(dom, "op", op, (1,))
+    assert calls == [0, 1, 2, 1]
+
+
+def test_kernel_copy_carries_over_derived_data():
+    import loopy as lp
+
+    knl = lp.make_kernel(
+            "{[i]: 0<=i<n}",
+            "out[i] = 2*a[i]")
+
+    reader_map = knl.reader_map()
+    all_inames = knl.all_inames()
+    bounds = knl.get_iname_bounds("i")
+
+    # tagging does not touch domains or instructions
+    tagged_knl = lp.tag_inames(knl, "i:unr")
+    assert tagged_knl.reader_map() is reader_map
+    assert tagged_knl.all_inames() is all_inames
+    assert tagged_knl.get_iname_bounds("i") is bounds
+
+    # changing the instructions invalidates instruction-derived data only
+    new_knl = knl.copy(instructions=[
+        insn.copy(expression=3*insn.expression) for insn in knl.instructions])
+    assert new_knl.all_inames() is all_inames
+    assert new_knl.reader_map() is not reader_map
+    assert new_knl.reader_map() == reader_map
+
+    split_knl = lp.split_iname(knl, "i", 4)
+    assert split_knl.all_inames() == frozenset(["i_inner", "i_outer"])
+
+
+def test_compact_code_generation_result():
+    import loopy as lp
+    from pickle import loads, dumps
+    from loopy.codegen import generate_code_for_execution
+
+    knl = lp.make_kernel(
+            "{[i]: 0<=i<n}",
+            "out[i] = 2*a[i]")
+    knl = lp.add_dtypes(knl, {"a": np.float64})
+
+    cgr = lp.generate_code_v2(knl)
+    compact = generate_code_for_execution(knl)
+
+    assert compact.device_code() == cgr.device_code()
+    assert compact.host_code() == cgr.host_code()
+    assert compact.implemented_data_info == cgr.implemented_data_info
+    assert ([dp.name for dp in compact.device_programs]
+            == [dp.name for dp in cgr.device_programs])
+    assert not hasattr(compact.host_program, "ast")
+    assert not hasattr(compact, "implemented_domains")
+
+    assert loads(dumps(compact)).device_code() == cgr.device_code()
+
+    # only the compact result is cached for execution
+    from uuid import uuid4
+    from loopy.codegen import code_gen_cache, _get_linearized_kernel
+    exec_knl = _get_linearized_kernel(
+            knl.copy(name="compact_only_%s" % uuid4().hex))
+    generate_code_for_execution(exec_knl)
+    with pytest.raises(KeyError):
+        code_gen_cache[exec_knl]
+
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         exec(sys.argv[1])
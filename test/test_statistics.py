@@ -1322,6 +1322,55 @@ def test_strided_footprint():
     assert 2*num < denom
 
 
+def test_performance_prediction():
+    from loopy.perfmodel import MachineModel, predict_performance
+
+    knl = lp.make_kernel(
+            "{[i]: 0<=i<n}",
+            "out[i] = 2*a[i] + 1",
+            name="scale", assumptions="n>=1")
+    knl = lp.add_and_infer_dtypes(knl, dict(a=np.float64))
+
+    machine = MachineModel(
+            flop_rates={"float64": 1e9},
+            memory_bandwidth=1e9,
+            cache_bandwidth=1e10,
+            cache_size=2**20,
+            launch_latency=1e-6)
+
+    n = 1000
+    pred = predict_performance(knl, {"n": n}, machine, subgroup_size=SGS)
+
+    assert pred.ops == 2*n
+    assert pred.global_bytes == 16*n
+    assert pred.memory_bytes == 16*n
+    assert pred.bound == "memory"
+    assert np.isclose(pred.time, 16*n/1e9 + 1e-6)
+
+    # once the rate of operations limits, the kernel becomes compute-bound
+    slow_machine = machine.copy(flop_rates={"float64": 1e8})
+    pred = predict_performance(knl, {"n": n}, slow_machine, subgroup_size=SGS)
+    assert pred.bound == "compute"
+    assert np.isclose(pred.time, 2*n/1e8 + 1e-6)
+
+    # accesses to a footprint exceeding the cache go to memory
+    knl = lp.make_kernel(
+            "{[i, j]: 0<=i<n and 0<=j<4}",
+            "out[i] = out[i] + a[i] {inames=i:j}",
+            name="repeat", assumptions="n>=1")
+    knl = lp.add_and_infer_dtypes(knl, dict(a=np.float64, out=np.float64))
+
+    # out is both read and written
+    n = 2**10
+    pred = predict_performance(knl, {"n": n}, machine, subgroup_size=SGS)
+    assert pred.global_bytes == 4*24*n
+    assert pred.memory_bytes == 24*n
+
+    n = 2**20
+    pred = predict_performance(knl, {"n": n}, machine, subgroup_size=SGS)
+    assert 24*n < pred.memory_bytes < 4*24*n
+
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         exec(sys.argv[1])
@@ -410,6 +410,49 @@ def test_pyopencl_execution_numpy_handling(ctx_factory):
     assert x[0] == 5.
 
 
+def test_strength_reduce_indices(ctx_factory):
+    ctx = ctx_factory()
+
+    knl = lp.make_kernel(
+        "{[i, j, k]: 0<=i<n and 0<=j<m and 0<=k<l}",
+        """
+        out[i, j] = sum(k, a[i, k]*b[k, j] + a[i, k+1])
+        """,
+        [
+            lp.GlobalArg("a", np.float32, shape=("n", "l+1")),
+            lp.GlobalArg("b", np.float32, shape=("l", "m")),
+            "..."])
+    knl = lp.add_and_infer_dtypes(knl, {"out": np.float32})
+    knl = lp.split_iname(knl, "i", 16, outer_tag="g.0")
+    ref_knl = knl
+
+    knl = lp.set_options(knl, strength_reduce_indices=True)
+    code = lp.generate_code_v2(knl).device_code()
+    print(code)
+
+    # a[i, k] and a[i, k+1] share a pointer, advanced by 1 along k
+    assert "a_k_ptr[0]" in code
+    assert "a_k_ptr[1]" in code
+    assert "b_k_ptr += m" in code
+
+    lp.auto_test_vs_ref(ref_knl, ctx, knl, parameters=dict(n=50, m=20, l=30))
+
+    # loop bounds depending on outer inames
+    knl = lp.make_kernel(
+        "{[i, j]: 0<=i<n and i<=j<n}",
+        """
+        out[i, j] = 2*a[j, i] + a[i, j]
+        """)
+    knl = lp.add_and_infer_dtypes(knl, {"a": np.float64})
+    knl = lp.prioritize_loops(knl, "i,j")
+    ref_knl = knl
+
+    knl = lp.set_options(knl, strength_reduce_indices=True)
+    assert "a_j_ptr" in lp.generate_code_v2(knl).device_code()
+
+    lp.auto_test_vs_ref(ref_knl, ctx, knl, parameters=dict(n=37))
+
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         exec(sys.argv[1])
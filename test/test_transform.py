@@ -182,6 +182,47 @@ def test_add_barrier(ctx_factory):
     assert (np.linalg.norm(out-2*a.T) < 1e-16)
 
 
+def test_minimize_global_barriers(ctx_factory):
+    ctx = ctx_factory()
+
+    knl = lp.make_kernel(
+            "{[i, j, ii, jj]: 0<=i,j, ii, jj<n}",
+            """
+            out1[j, i] = a[i, j] {id=transpose1}
+            out2[j, i] = 3*a[i, j] {id=transpose2}
+            out1[ii, jj] = 2*out1[ii, jj] {id=double1}
+            out2[ii, jj] = 2*out2[ii, jj] {id=double2}
+            """)
+    knl = lp.add_and_infer_dtypes(knl, {"a": np.float64})
+    knl = lp.add_barrier(knl, "id:transpose1", "id:double1", "gb1")
+    knl = lp.add_barrier(knl, "id:transpose2", "id:double2", "gb2")
+
+    knl = lp.split_iname(knl, "i", 2, outer_tag="g.0", inner_tag="l.0")
+    knl = lp.split_iname(knl, "j", 2, outer_tag="g.1", inner_tag="l.1")
+    knl = lp.split_iname(knl, "ii", 2, outer_tag="g.0", inner_tag="l.0")
+    knl = lp.split_iname(knl, "jj", 2, outer_tag="g.1", inner_tag="l.1")
+    ref_knl = knl
+
+    knl = lp.minimize_global_barriers(knl)
+    barriers = [insn for insn in knl.instructions
+            if isinstance(insn, lp.BarrierInstruction)]
+    assert len(barriers) == 1
+    barrier, = barriers
+    assert barrier.depends_on == frozenset(["transpose1", "transpose2"])
+    assert barrier.id in knl.id_to_insn["double1"].depends_on
+    assert barrier.id in knl.id_to_insn["double2"].depends_on
+
+    sched_knl = lp.get_one_linearized_kernel(lp.preprocess_kernel(knl))
+    assert len(lp.get_subkernels(sched_knl)) == 2
+
+    # barriers on a dependency chain stay apart
+    assert lp.minimize_global_barriers(lp.add_barrier(
+        knl, "id:double1", "id:double2", "gb3")).id_to_insn["gb3"]
+
+    knl = lp.set_options(ref_knl, minimize_global_barriers=True)
+    lp.auto_test_vs_ref(ref_knl, ctx, knl, parameters=dict(n=16))
+
+
 def test_rename_argument(ctx_factory):
     ctx = ctx_factory()
     queue = cl.CommandQueue(ctx)
@@ -245,6 +286,138 @@ def test_alias_temporaries(ctx_factory):
             parameters=dict(n=30))
 
 
+def test_share_temporary_storage(ctx_factory):
+    ctx = ctx_factory()
+
+    knl = lp.make_kernel(
+        "{[i, j, k]: 0<=i,j,k<16}",
+        """
+        <> t1[i] = 2*a[i]  {id=w1}
+        <> u[j] = t1[15-j]  {id=w2, dep=w1}
+        <> t2[k] = 3*u[15-k]  {id=w3, dep=w2}
+        out[k] = t2[k]  {id=w4, dep=w3}
+        """, seq_dependencies=False)
+
+    knl = lp.add_and_infer_dtypes(knl, {"a": np.float32})
+    knl = lp.tag_inames(knl, {"i": "l.0", "j": "l.0", "k": "l.0"})
+    knl = lp.set_temporary_scope(knl, "t1,u,t2", "local")
+
+    ref_knl = knl
+
+    knl = lp.set_options(knl, share_temporary_storage=True)
+
+    lin_knl = lp.get_one_linearized_kernel(lp.preprocess_kernel(knl))
+    tvs = lin_knl.temporary_variables
+
+    # t1 is dead by the barrier for u, so t2 can reuse its storage
+    assert tvs["t1"].base_storage is not None
+    assert tvs["t1"].base_storage == tvs["t2"].base_storage
+    assert tvs["u"].base_storage is None
+
+    lp.auto_test_vs_ref(ref_knl, ctx, knl)
+
+
+def test_hoist_invariants(ctx_factory):
+    ctx = ctx_factory()
+
+    knl = lp.make_kernel(
+        "{[i, j, jj]: 0<=i<n and 0<=j,jj<m}",
+        """
+        <> t[jj] = 2*a[jj]  {id=init}
+        out[i, j] = t[j] * exp(c*b[i]) + i*k  {id=out, dep=init}
+        out2[i] = sum(j, a[j]*sqrt(b[i]))
+        out3[i, j] = a[j] + t[j]*b[i]  {id=out3, dep=init}
+        """)
+    knl = lp.add_and_infer_dtypes(knl, {"a,b,c": np.float64, "k": np.int32})
+    knl = lp.fix_parameters(knl, m=20)
+    knl = lp.prioritize_loops(knl, "i,j")
+    knl = lp.split_iname(knl, "i", 16, outer_tag="g.0")
+
+    hoisted_knl = lp.hoist_invariants(knl)
+
+    tvs = hoisted_knl.temporary_variables
+    hoisted_names = [name for name in tvs if name.startswith("hoisted")]
+    assert all(tvs[name].shape == () for name in hoisted_names)
+
+    hoisted_exprs = [
+            str(insn.expression) for insn in hoisted_knl.instructions
+            if insn.assignee_var_names()[0] in hoisted_names]
+    assert any(expr.startswith("exp(") for expr in hoisted_exprs)
+    assert any(expr.startswith("sqrt(") for expr in hoisted_exprs)
+    # t[j] changes with j, so t[j]*b[i] stays in the loop over j
+    assert not any("t[j]" in expr for expr in hoisted_exprs)
+
+    params = {"n": 32, "k": 3}
+    ops = lp.get_op_map(knl, subgroup_size="guess").eval_and_sum(params)
+    hoisted_ops = lp.get_op_map(hoisted_knl, subgroup_size="guess").eval_and_sum(
+            params)
+    assert hoisted_ops < ops
+
+    lp.auto_test_vs_ref(knl, ctx, hoisted_knl, parameters=dict(c=0.5, **params))
+
+    # as part of preprocessing
+    opt_knl = lp.set_options(knl, hoist_invariants=True)
+    pp_knl = lp.preprocess_kernel(opt_knl)
+    assert any(name.startswith("hoisted") for name in pp_knl.temporary_variables)
+
+    lp.auto_test_vs_ref(knl, ctx, opt_knl, parameters=dict(c=0.5, **params))
+
+    # calls returning several values are not hoisted, only their arguments
+    call_knl = lp.make_kernel(
+        "{[i, j]: 0<=i<n and 0<=j<m}",
+        """
+        u[i, j], v[i, j] = f(2*x[i])  {id=call}
+        """)
+    call_knl = lp.hoist_invariants(call_knl)
+
+    call_insn = call_knl.id_to_insn["call"]
+    assert isinstance(call_insn, lp.CallInstruction)
+    assert call_insn.expression.function.name == "f"
+    assert str(call_insn.expression.parameters[0]).startswith("hoisted")
+
+
+def test_unroll_and_jam(ctx_factory):
+    ctx = ctx_factory()
+
+    knl = lp.make_kernel(
+            "{[i,j,k]: 0<=i,j,k<n}",
+            "c[i, j] = sum(k, a[i, k]*b[k, j])",
+            [
+                lp.GlobalArg("a", np.float32, shape=("n", "n")),
+                lp.GlobalArg("b", np.float32, shape=("n", "n")),
+                lp.GlobalArg("c", np.float32, shape=("n", "n")),
+                lp.ValueArg("n", np.int32),
+                ])
+    knl = lp.split_iname(knl, "j", 16, outer_tag="g.0", inner_tag="l.0")
+    ref_knl = knl
+
+    knl = lp.unroll_and_jam(knl, "i", 4)
+    assert knl.iname_tags("i_inner")
+
+    code = lp.generate_code_v2(knl).device_code()
+    print(code)
+    # one load of b per iteration over k, shared by the four copies
+    assert code.count("b[") == 1
+
+    lp.auto_test_vs_ref(ref_knl, ctx, knl, parameters={"n": 50})
+
+    knl = lp.unroll_and_jam(ref_knl, "i", 4, share_loads=False)
+    assert "b_shared" not in knl.temporary_variables
+    lp.auto_test_vs_ref(ref_knl, ctx, knl, parameters={"n": 50})
+
+    # reductions are left to preprocessing, so types may be added later
+    untyped_knl = lp.make_kernel(
+            "{[i,j,k]: 0<=i,j,k<n}",
+            "c[i, j] = sum(k, a[i, k]*b[k, j])")
+    knl = lp.unroll_and_jam(untyped_knl, "i", 4)
+    assert "b_shared" in knl.temporary_variables
+    assert any(insn.reduction_inames() for insn in knl.instructions)
+
+    knl = lp.add_dtypes(knl, {"a": np.float64, "b": np.float64})
+    ref_knl = lp.add_dtypes(untyped_knl, {"a": np.float64, "b": np.float64})
+    lp.auto_test_vs_ref(ref_knl, ctx, knl, parameters={"n": 50})
+
+
 def test_vectorize(ctx_factory):
     ctx = ctx_factory()
 
@@ -479,6 +652,89 @@ def test_precompute_with_preexisting_inames_fail():
                 precompute_inames="ii,jj")
 
 
+def test_double_buffered_prefetch(ctx_factory):
+    ctx = ctx_factory()
+
+    knl = lp.make_kernel(
+            "{[i,j,k]: 0<=i,j,k<n}",
+            "c[i, j] = sum(k, a[i, k]*b[k, j])",
+            [
+                lp.GlobalArg("a", np.float32, shape=("n", "n")),
+                lp.GlobalArg("b", np.float32, shape=("n", "n")),
+                lp.GlobalArg("c", np.float32, shape=("n", "n")),
+                lp.ValueArg("n", np.int32),
+                ],
+            assumptions="n mod 16 = 0 and n >= 16")
+    ref_knl = knl
+
+    knl = lp.split_iname(knl, "i", 16, outer_tag="g.0", inner_tag="l.1")
+    knl = lp.split_iname(knl, "j", 16, outer_tag="g.1", inner_tag="l.0")
+    knl = lp.split_iname(knl, "k", 16)
+    knl = lp.add_prefetch(knl, "a", ["k_inner", "i_inner"],
+            fetch_outer_inames="i_outer, j_outer, k_outer",
+            default_tag="l.auto", double_buffer_iname="k_outer")
+    knl = lp.add_prefetch(knl, "b", ["j_inner", "k_inner"],
+            fetch_outer_inames="i_outer, j_outer, k_outer",
+            default_tag="l.auto", double_buffer_iname="k_outer")
+
+    for temp_var in knl.temporary_variables.values():
+        assert temp_var.shape == (2, 16, 16)
+        assert temp_var.address_space == lp.AddressSpace.LOCAL
+
+    code = lp.generate_code_v2(knl).device_code()
+    print(code)
+    # at most one barrier after the fetches ahead of the loop, one per
+    # iteration
+    assert code.count("barrier(") <= 2
+
+    lp.auto_test_vs_ref(ref_knl, ctx, knl, parameters={"n": 64})
+
+    # uses directly within the pipelined loop
+    knl = lp.make_kernel(
+            "{[t,i]: 0<=t<nt and 0<=i<16}",
+            "out[t, i] = 2*a[t, 15-i]  {id=use}",
+            [
+                lp.GlobalArg("a", np.float32, shape=("nt", 16)),
+                lp.GlobalArg("out", np.float32, shape=("nt", 16)),
+                "..."])
+    ref_knl = knl
+
+    knl = lp.tag_inames(knl, "i:l.0")
+    knl = lp.add_prefetch(knl, "a", ["i"], fetch_outer_inames="t",
+            default_tag="l.auto", double_buffer_iname="t")
+
+    barrier_ids = set(
+            insn.id for insn in knl.instructions
+            if isinstance(insn, lp.BarrierInstruction))
+    assert barrier_ids
+    assert barrier_ids <= knl.id_to_insn["use"].depends_on
+
+    lp.auto_test_vs_ref(ref_knl, ctx, knl, parameters={"nt": 10})
+
+    # private temporaries on the C target
+    from loopy.target.c import ExecutableCTarget
+    stencil_knl = lp.make_kernel(
+            "{[i,j]: 0<=i<n and 0<=j<3}",
+            "out[i] = sum(j, a[i+j])",
+            [
+                lp.GlobalArg("a", np.float64, shape=("n+2",)),
+                "..."],
+            target=ExecutableCTarget())
+    knl = lp.add_prefetch(stencil_knl, "a", ["j"], default_tag=None,
+            double_buffer_iname="i")
+    assert not any(
+            isinstance(insn, lp.BarrierInstruction)
+            for insn in knl.instructions)
+
+    a = np.random.rand(20)
+    _, (out,) = knl(a=a)
+    assert np.allclose(out, a[:-2] + a[1:-1] + a[2:])
+
+    with pytest.raises(lp.LoopyError):
+        lp.add_prefetch(stencil_knl, "a", ["j"], default_tag=None,
+                double_buffer_iname="j")
+
+
 def test_add_nosync():
     orig_knl = lp.make_kernel("{[i]: 0<=i<10}",
         """
@@ -550,6 +806,53 @@ def test_split_iname_only_if_in_within():
             assert insn.within_inames == frozenset({'i'})
 
 
+def test_rule_aware_mapper_preserves_unchanged_exprs():
+    knl = lp.make_kernel(
+            "{[i, j]: 0<=i,j<10}",
+            """
+            geo(i) := 2*x[i] + x[i]**2
+            c[i, j] = geo(i) * d[j] + geo(i) {id=use_subst}
+            a[j] = 2*b[j] + 1 {id=no_i}
+            """)
+
+    split_knl = lp.split_iname(knl, "i", 2)
+    assert split_knl.id_to_insn["no_i"].expression is (
+            knl.id_to_insn["no_i"].expression)
+
+    expanded_knl = lp.expand_subst(knl)
+    assert expanded_knl.id_to_insn["no_i"] is knl.id_to_insn["no_i"]
+    assert expanded_knl.id_to_insn["use_subst"] is not (
+            knl.id_to_insn["use_subst"])
+
+
+def test_rule_aware_mapper_memoizes_rule_invocations():
+    from loopy.symbolic import (
+            RuleAwareIdentityMapper, SubstitutionRuleMappingContext)
+
+    knl = lp.make_kernel(
+            "{[i, j]: 0<=i,j<10}",
+            """
+            geo(i) := 2*x[i] + x[i]**2
+            c[i, j] = geo(i) * d[j] + geo(i) + 3*geo(i)
+            """)
+
+    class PowerCounter(RuleAwareIdentityMapper):
+        memoize_subexpressions = True
+        npowers = 0
+
+        def map_power(self, expr, expn_state):
+            self.npowers += 1
+            return super(PowerCounter, self).map_power(expr, expn_state)
+
+    mapper = PowerCounter(SubstitutionRuleMappingContext(
+            knl.substitutions, knl.get_var_name_generator()))
+    mapper.map_kernel(knl)
+
+    # the rule body is traversed once for all invocations with the same
+    # arguments
+    assert mapper.npowers == 1
+
+
 def test_nested_substs_in_insns(ctx_factory):
     ctx = ctx_factory()
     import loopy as lp